@@ -1,50 +1,19 @@
 # accounts/context_processors.py
-from attendance.models import AttendanceSession
+from attendance.active_sessions import active_sessions_for
 
 def active_session(request):
-    """Make active session available to all templates"""
-    context = {
-        'active_session': None,
-        'active_sessions_count': 0,
-        'recent_sessions': []
-    }
-    
-    if request.user.is_authenticated:
-        # INSTRUCTOR: Get their ongoing sessions
-        if request.user.user_type == 'instructor':
-            active_sessions = AttendanceSession.objects.filter(
-                instructor=request.user,
-                status='ongoing'
-            ).order_by('-session_date', '-start_time')
-            
-            context['active_sessions_count'] = active_sessions.count()
-            context['active_session'] = active_sessions.first()
-            context['recent_sessions'] = active_sessions[:3]
-        
-        # STUDENT: Get their class's ongoing sessions
-        elif request.user.user_type == 'student':
-            try:
-                student = request.user.student
-                if student.current_class:
-                    active_sessions = AttendanceSession.objects.filter(
-                        class_session=student.current_class,
-                        status='ongoing'
-                    ).order_by('-session_date', '-start_time')
-                    
-                    context['active_sessions_count'] = active_sessions.count()
-                    context['active_session'] = active_sessions.first()
-                    context['recent_sessions'] = active_sessions[:3]
-            except:
-                pass
-        
-        # ADMIN/STAFF: Get all ongoing sessions
-        elif request.user.is_staff or request.user.user_type == 'admin':
-            active_sessions = AttendanceSession.objects.filter(
-                status='ongoing'
-            ).order_by('-session_date', '-start_time')
-            
-            context['active_sessions_count'] = active_sessions.count()
-            context['active_session'] = active_sessions.first()
-            context['recent_sessions'] = active_sessions[:3]
+    """
+    Make active sessions available to all templates.
+
+    The values are callables, which templates call when they are used, so
+    pages that never show active sessions run no queries.
+    """
+    def first_session():
+        sessions = active_sessions_for(request)
+        return sessions[0] if sessions else None
     
-    return context
\ No newline at end of file
+    return {
+        'active_session': first_session,
+        'active_sessions_count': lambda: len(active_sessions_for(request)),
+        'recent_sessions': lambda: active_sessions_for(request)[:3],
+    }
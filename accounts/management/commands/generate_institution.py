@@ -0,0 +1,288 @@
+import math
+import random
+import time as timer
+from datetime import date, datetime, time, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import User
+from attendance.models import AttendanceSession, AttendanceRecord
+from attendance.rollups import rebuild_rollups_for_range
+from attendance.stats import refresh_last_attendance_dates
+from attendance.summaries import rebuild_summaries_for_range
+from courses.models import Course, Class
+from students.models import Student, Enrollment
+
+FIRST_NAMES = [
+    'Brian', 'Faith', 'Kevin', 'Mercy', 'Dennis', 'Grace', 'Collins', 'Esther', 'Victor', 'Ann',
+    'Peter', 'Joy', 'Samuel', 'Ruth', 'Daniel', 'Lucy', 'Emmanuel', 'Mary', 'Felix', 'Caroline',
+]
+LAST_NAMES = [
+    'Mutua', 'Kamau', 'Wanjiru', 'Otieno', 'Musyoka', 'Mwangi', 'Kilonzo', 'Achieng', 'Kiptoo', 'Ndunda',
+    'Wambua', 'Njeri', 'Omondi', 'Mutiso', 'Chebet', 'Maweu', 'Kariuki', 'Nduku', 'Kioko', 'Muthoni',
+]
+DEPARTMENTS = [
+    'Computer Science', 'Electrical Engineering', 'Mechanical Engineering', 'Business Studies',
+    'Hospitality', 'Building and Civil', 'Agriculture', 'Fashion and Design', 'Automotive', 'Liberal Studies',
+]
+SUB_COUNTIES = ['Kitui Central', 'Kitui West', 'Kitui Rural', 'Mwingi Central', 'Kitui South', 'Kitui East']
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']
+SLOTS = [(time(8), time(10)), (time(10, 30), time(12, 30)), (time(14), time(16))]
+
+
+class Command(BaseCommand):
+    help = 'Generate a large synthetic institution for load tests and benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--departments', type=int, default=5)
+        parser.add_argument('--courses-per-department', type=int, default=4)
+        parser.add_argument('--students', type=int, default=25000)
+        parser.add_argument('--class-size', type=int, default=40)
+        parser.add_argument('--instructors-per-department', type=int, default=12)
+        parser.add_argument('--weeks', type=int, default=14, help='Length of the term in weeks (default: 14)')
+        parser.add_argument('--end-date', help='Last day of the term (YYYY-MM-DD). Defaults to today.')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed; the same seed gives the same data')
+        parser.add_argument('--prefix', default='GEN', help='Prefix for generated codes and usernames')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--skip-derived', action='store_true',
+                            help='Do not rebuild rollups, summaries and last attendance dates')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.prefix = options['prefix'].upper()
+
+        if len(self.prefix) > 6:
+            raise CommandError('--prefix must be at most 6 characters')
+        if User.objects.filter(username__startswith=f'{self.prefix.lower()}_').exists():
+            raise CommandError(f'Data with prefix {self.prefix} already exists; choose another --prefix')
+
+        try:
+            end_date = (datetime.strptime(options['end_date'], '%Y-%m-%d').date()
+                        if options['end_date'] else timezone.now().date())
+        except ValueError:
+            raise CommandError('--end-date must be in YYYY-MM-DD format')
+        start_date = end_date - timedelta(weeks=options['weeks']) + timedelta(days=1)
+
+        # Hashing is deliberately slow; every generated account shares one hash
+        self.password = make_password('password123')
+
+        started = timer.monotonic()
+        with transaction.atomic():
+            instructors = self._step('instructors', self.create_instructors,
+                                     options['departments'], options['instructors_per_department'])
+            courses = self._step('courses', self.create_courses,
+                                 options['departments'], options['courses_per_department'])
+            classes = self._step('classes', self.create_classes, courses, instructors,
+                                 options['students'], options['class_size'], start_date, end_date)
+            students = self._step('students', self.create_students, classes, options['students'])
+            self._step('enrollments', self.create_enrollments, students)
+            self._step('attendance records', self.create_attendance, classes, students, start_date, end_date)
+
+        if not options['skip_derived']:
+            self._step('rollup rows', rebuild_rollups_for_range, start_date, end_date)
+            self._step('summary rows', rebuild_summaries_for_range, start_date, end_date)
+            self._step('last attendance dates', self.refresh_students, students)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated institution {self.prefix} ({start_date} to {end_date}) '
+            f'in {timer.monotonic() - started:.1f}s'
+        ))
+
+    def _step(self, label, func, *args):
+        started = timer.monotonic()
+        result = func(*args)
+        count = result if isinstance(result, int) else len(result)
+        self.stdout.write(f'  {count} {label} in {timer.monotonic() - started:.1f}s')
+        return result
+
+    def _name(self):
+        return self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+
+    def create_instructors(self, departments, per_department):
+        instructors = []
+        for d in range(departments):
+            for i in range(per_department):
+                first_name, last_name = self._name()
+                instructors.append(User(
+                    username=f'{self.prefix.lower()}_inst_{d}_{i}',
+                    password=self.password,
+                    first_name=first_name,
+                    last_name=last_name,
+                    email=f'{self.prefix.lower()}.inst{d}.{i}@tvet.ac.ke',
+                    user_type='instructor',
+                    account_status='approved',
+                    department=DEPARTMENTS[d % len(DEPARTMENTS)],
+                ))
+        return User.objects.bulk_create(instructors, batch_size=self.batch_size)
+
+    def create_courses(self, departments, per_department):
+        courses = []
+        for d in range(departments):
+            for c in range(per_department):
+                department = DEPARTMENTS[d % len(DEPARTMENTS)]
+                courses.append(Course(
+                    code=f'{self.prefix}-D{d}C{c}',
+                    name=f'{department} Course {c + 1}',
+                    level=self.rng.choice(['certificate', 'diploma', 'artisan', 'craft']),
+                    department=department,
+                ))
+        return Course.objects.bulk_create(courses)
+
+    def create_classes(self, courses, instructors, n_students, class_size, start_date, end_date):
+        by_department = {}
+        for instructor in instructors:
+            by_department.setdefault(instructor.department, []).append(instructor)
+
+        n_classes = max(1, math.ceil(n_students / class_size))
+        classes = []
+        for index in range(n_classes):
+            course = courses[index % len(courses)]
+            days = sorted(self.rng.sample(range(len(WEEKDAYS)), 3))
+            start, end = self.rng.choice(SLOTS)
+            class_obj = Class(
+                course=course,
+                class_code=f'{self.prefix}-K{index:05d}',
+                name=f'{course.name} Group {index // len(courses) + 1}',
+                instructor=self.rng.choice(by_department[course.department]),
+                academic_year=str(end_date.year),
+                semester=1,
+                start_date=start_date,
+                end_date=end_date,
+                meeting_days=', '.join(WEEKDAYS[day] for day in days),
+                meeting_time=f'{start:%I:%M %p} - {end:%I:%M %p}',
+                venue=f'Room {self.rng.randint(1, 60)}',
+                max_students=class_size,
+            )
+            class_obj.slot = (start, end)
+            classes.append(class_obj)
+        return Class.objects.bulk_create(classes, batch_size=self.batch_size)
+
+    def create_students(self, classes, n_students):
+        users = []
+        for i in range(n_students):
+            first_name, last_name = self._name()
+            users.append(User(
+                username=f'{self.prefix.lower()}_stu_{i}',
+                password=self.password,
+                first_name=first_name,
+                last_name=last_name,
+                email=f'{self.prefix.lower()}.stu{i}@students.tvet.ac.ke',
+                user_type='student',
+                account_status='approved',
+            ))
+        users = User.objects.bulk_create(users, batch_size=self.batch_size)
+
+        students = []
+        for i, user in enumerate(users):
+            class_obj = classes[i % len(classes)]
+            students.append(Student(
+                user=user,
+                admission_number=f'{self.prefix}{i:07d}',
+                date_of_birth=date(2000, 1, 1) + timedelta(days=self.rng.randint(0, 3650)),
+                gender=self.rng.choice('MF'),
+                address='P.O. Box 1, Kitui',
+                sub_county=self.rng.choice(SUB_COUNTIES),
+                emergency_contact_name=' '.join(self._name()),
+                emergency_contact_phone=f'07{self.rng.randint(0, 99999999):08d}',
+                emergency_contact_relationship='Parent',
+                year_of_admission=class_obj.start_date.year,
+                current_class=class_obj,
+                course_id=class_obj.course_id,
+            ))
+        return Student.objects.bulk_create(students, batch_size=self.batch_size)
+
+    def create_enrollments(self, students):
+        return Enrollment.objects.bulk_create([
+            Enrollment(student=student, course_id=student.course_id, class_enrolled_id=student.current_class_id)
+            for student in students
+        ], batch_size=self.batch_size)
+
+    def create_attendance(self, classes, students, start_date, end_date):
+        roster = {}
+        for student in students:
+            roster.setdefault(student.current_class_id, []).append(student.id)
+
+        # Each student keeps the same habits for the whole term
+        habits = {student.id: self.rng.uniform(0.55, 0.98) for student in students}
+
+        records = []
+        created = 0
+        days = [start_date + timedelta(days=n) for n in range((end_date - start_date).days + 1)]
+
+        for class_obj in classes:
+            start, end = class_obj.slot
+            sessions = []
+            statuses = []
+            for day in days:
+                if day.strftime('%A') not in class_obj.meeting_days:
+                    continue
+                session_statuses = [
+                    (student_id, self._status(habits[student_id])) for student_id in roster.get(class_obj.id, [])
+                ]
+                counts = {status: 0 for status in ('present', 'absent', 'late')}
+                for _, status in session_statuses:
+                    if status in counts:
+                        counts[status] += 1
+                sessions.append(AttendanceSession(
+                    class_session=class_obj,
+                    instructor_id=class_obj.instructor_id,
+                    session_date=day,
+                    start_time=start,
+                    end_time=end,
+                    topic_covered=f'Week {(day - start_date).days // 7 + 1} session',
+                    venue=class_obj.venue,
+                    status='completed',
+                    total_present=counts['present'],
+                    total_absent=counts['absent'],
+                    total_late=counts['late'],
+                ))
+                statuses.append(session_statuses)
+
+            AttendanceSession.objects.bulk_create(sessions, batch_size=self.batch_size)
+
+            for session, session_statuses in zip(sessions, statuses):
+                session_start = timezone.make_aware(datetime.combine(session.session_date, session.start_time))
+                for student_id, status in session_statuses:
+                    late_minutes = self.rng.randint(5, 45) if status == 'late' else 0
+                    check_in = None
+                    if status in ('present', 'late', 'half_day'):
+                        check_in = session_start + timedelta(minutes=late_minutes or self.rng.randint(-10, 0))
+                    records.append(AttendanceRecord(
+                        session=session,
+                        student_id=student_id,
+                        session_date=session.session_date,
+                        class_session_id=session.class_session_id,
+                        status=status,
+                        check_in_time=check_in,
+                        late_minutes=late_minutes,
+                        marked_by_id=session.instructor_id,
+                    ))
+
+            if len(records) >= self.batch_size:
+                AttendanceRecord.objects.bulk_create(records, batch_size=self.batch_size)
+                created += len(records)
+                records = []
+
+        AttendanceRecord.objects.bulk_create(records, batch_size=self.batch_size)
+        return created + len(records)
+
+    def _status(self, habit):
+        draw = self.rng.random()
+        if draw < habit:
+            return 'late' if self.rng.random() < 0.12 else 'present'
+        if draw < habit + 0.02:
+            return 'excused'
+        if draw < habit + 0.03:
+            return 'half_day'
+        return 'absent'
+
+    def refresh_students(self, students):
+        student_ids = [student.id for student in students]
+        for i in range(0, len(student_ids), self.batch_size):
+            refresh_last_attendance_dates(student_ids[i:i + self.batch_size])
+        return len(student_ids)
+
@@ -0,0 +1,261 @@
+import json
+import statistics
+import time as timer
+import tracemalloc
+from collections import namedtuple
+from datetime import timedelta
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User
+from attendance.models import AttendanceRecord, AttendanceSession
+from reports.cache import report_cache_enabled
+from students.models import Enrollment
+
+GROUP_BY_CHOICES = ('day', 'week', 'month', 'class', 'instructor', 'student')
+MODES = ('cold', 'warm')
+
+Scenario = namedtuple('Scenario', 'name method url data login expected_status ajax', defaults=(True, 200, False))
+
+
+def clear_caches():
+    for alias in caches:
+        caches[alias].clear()
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the attendance and reports hot paths against the current database. '
+        'Write scenarios commit, re-marking the benchmarked session with its current statuses.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--instructor', help='Username of the instructor to benchmark as. '
+                                                 'Defaults to the instructor with the most sessions.')
+        parser.add_argument('--password', default='password123',
+                            help='Password of the instructor, used by the login scenario')
+        parser.add_argument('--scenario', action='append', default=[],
+                            help='Only run scenarios whose name starts with this value (repeatable)')
+        parser.add_argument('--output', default='benchmark_results.json')
+        parser.add_argument('--baseline', help='Previous results file to compare against')
+        parser.add_argument('--threshold', type=float, default=10.0,
+                            help='Percentage slowdown of p50 reported as a regression (default: 10)')
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        instructor = self._instructor(options['instructor'])
+        session = AttendanceSession.objects.filter(
+            instructor=instructor
+        ).order_by('-session_date', '-start_time').first()
+        student_ids = list(Enrollment.objects.filter(
+            class_enrolled_id=session.class_session_id, is_active=True
+        ).values_list('student_id', flat=True))
+
+        scenarios = self._scenarios(instructor, session, student_ids, options['password'])
+        if options['scenario']:
+            scenarios = [
+                scenario for scenario in scenarios
+                if any(scenario.name.startswith(prefix) for prefix in options['scenario'])
+            ]
+
+        results = {
+            'meta': {
+                'created_at': timezone.now().isoformat(),
+                'iterations': options['iterations'],
+                'instructor': instructor.username,
+                'class_size': len(student_ids),
+                'sessions': AttendanceSession.objects.count(),
+                # Warm report results are only cached with shared version stamps
+                'report_cache': report_cache_enabled(),
+            },
+            'scenarios': {},
+        }
+
+        # Exports are rendered inline so the benchmark measures generation, not enqueueing
+        with override_settings(ALLOWED_HOSTS=['testserver'], QUERY_COUNT_ENABLED=True,
+                               REPORT_EXPORTS_IN_BACKGROUND=False):
+            for scenario in scenarios:
+                results['scenarios'][scenario.name] = {
+                    mode: self._run(instructor, scenario, mode, options['iterations'], options['warmup'])
+                    for mode in MODES
+                }
+                self._report(scenario.name, results['scenarios'][scenario.name])
+
+        with open(options['output'], 'w') as output:
+            json.dump(results, output, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Results written to {options["output"]}'))
+
+        failed = [
+            f'{scenario.name} ({", ".join(map(str, result["status"]))})'
+            for scenario in scenarios
+            for result in results['scenarios'][scenario.name].values()
+            if result['status'] != [scenario.expected_status]
+        ]
+        if failed:
+            raise CommandError(f'Unexpected response status: {", ".join(dict.fromkeys(failed))}')
+
+        if options['baseline']:
+            regressions = self._compare(options['baseline'], results, options['threshold'])
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f'{len(regressions)} scenarios regressed: {", ".join(regressions)}')
+
+    def _instructor(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username, user_type='instructor')
+            except User.DoesNotExist:
+                raise CommandError(f'Instructor {username} not found')
+
+        instructor = User.objects.filter(user_type='instructor').annotate(
+            session_count=Count('attendancesession')
+        ).filter(session_count__gt=0).order_by('-session_count').first()
+        if instructor is None:
+            raise CommandError('No instructor with attendance sessions; run generate_institution first')
+        return instructor
+
+    def _scenarios(self, instructor, session, student_ids, password):
+        today = timezone.now().date()
+        report_range = {
+            'date_range': 'custom',
+            'start_date': (today - timedelta(days=30)).isoformat(),
+            'end_date': today.isoformat(),
+            'report_type': 'summary',
+        }
+        # Writes commit, so they re-mark the session with the statuses it already has;
+        # every iteration then does the same work and the database does not drift
+        current = dict(AttendanceRecord.objects.filter(session=session).values_list('student_id', 'status'))
+        attendance_data = {str(student_id): current.get(student_id, 'absent') for student_id in student_ids}
+        first_student = student_ids[0] if student_ids else ''
+
+        scenarios = [
+            Scenario('login', 'post', reverse('login'),
+                     {'username': instructor.username, 'password': password}, login=False, expected_status=302),
+            Scenario('dashboard', 'get', reverse('dashboard'), None),
+            Scenario('mark_attendance_get', 'get', reverse('attendance:mark_attendance', args=[session.id]), None),
+            Scenario('mark_attendance_post', 'post', reverse('attendance:mark_attendance', args=[session.id]), {
+                'student_id': first_student,
+                'status': current.get(first_student, 'absent'),
+            }, ajax=True),
+            Scenario('bulk_mark', 'post', reverse('attendance:bulk_mark', args=[session.id]), {
+                'attendance_data': json.dumps(attendance_data),
+            }, ajax=True),
+        ]
+        for group_by in GROUP_BY_CHOICES:
+            scenarios.append(Scenario(
+                f'attendance_report_{group_by}', 'get', reverse('reports:attendance_report'),
+                dict(report_range, group_by=group_by)
+            ))
+        scenarios += [
+            Scenario('export_report_csv', 'post', reverse('reports:export_report', args=['attendance']),
+                     dict(report_range, group_by='class', export_format='csv')),
+            Scenario('export_attendance_csv', 'get', reverse('attendance:export_report'), {
+                'start_date': report_range['start_date'],
+                'end_date': report_range['end_date'],
+            }),
+            Scenario('students_by_class', 'get',
+                     reverse('students:students_by_class', args=[session.class_session_id]), None),
+        ]
+        return scenarios
+
+    def _run(self, instructor, scenario, mode, iterations, warmup):
+        """
+        Time a scenario. Cold runs clear every cache before each request;
+        warm runs reuse what the warmup requests cached. Memory is the
+        tracemalloc peak of one extra request, so tracing does not slow the
+        timed ones.
+        """
+        client = Client(raise_request_exception=False)
+        if scenario.login:
+            client.force_login(instructor)
+        headers = {'X-Requested-With': 'XMLHttpRequest'} if scenario.ajax else {}
+
+        def request():
+            if mode == 'cold':
+                clear_caches()
+            started = timer.perf_counter()
+            response = getattr(client, scenario.method)(scenario.url, scenario.data, headers=headers)
+            if getattr(response, 'streaming', False):
+                for _ in response.streaming_content:
+                    pass
+            return response, (timer.perf_counter() - started) * 1000
+
+        timings = []
+        queries = []
+        status_codes = set()
+        for iteration in range(iterations if mode == 'cold' else warmup + iterations):
+            response, elapsed = request()
+            if mode == 'cold' or iteration >= warmup:
+                timings.append(elapsed)
+                queries.append(getattr(response, 'query_count', None))
+                status_codes.add(response.status_code)
+
+        tracemalloc.start()
+        try:
+            request()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'url': scenario.url,
+            'method': scenario.method.upper(),
+            'status': sorted(status_codes),
+            'p50_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(percentile(timings, 0.95), 2),
+            'mean_ms': round(statistics.mean(timings), 2),
+            'queries': max((count for count in queries if count is not None), default=None),
+            'peak_alloc_kb': peak // 1024,
+        }
+
+    def _report(self, name, results):
+        for mode, result in results.items():
+            self.stdout.write(
+                f'{f"{name} ({mode})":40} p50 {result["p50_ms"]:9.2f}ms  p95 {result["p95_ms"]:9.2f}ms  '
+                f'queries {result["queries"]!s:>5}  peak {result["peak_alloc_kb"]:>7}KB  '
+                f'status {",".join(map(str, result["status"]))}'
+            )
+
+    def _compare(self, baseline_path, results, threshold):
+        try:
+            with open(baseline_path) as baseline_file:
+                baseline = json.load(baseline_file)['scenarios']
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f'Cannot read baseline {baseline_path}: {e}')
+
+        self.stdout.write(f'\nComparison with {baseline_path}:')
+        regressions = []
+        for name, modes in results['scenarios'].items():
+            for mode, result in modes.items():
+                label = f'{name} ({mode})'
+                previous = baseline.get(name, {}).get(mode)
+                if previous is None:
+                    self.stdout.write(f'{label:40} (new scenario)')
+                    continue
+
+                change = (
+                    (result['p50_ms'] - previous['p50_ms']) / previous['p50_ms'] * 100 if previous['p50_ms'] else 0
+                )
+                query_change = (result['queries'] or 0) - (previous['queries'] or 0)
+                line = f'{label:40} p50 {change:+7.1f}%  queries {query_change:+d}'
+
+                if change > threshold or query_change > 0:
+                    regressions.append(label)
+                    self.stdout.write(self.style.ERROR(line + '  REGRESSION'))
+                elif change < -threshold or query_change < 0:
+                    self.stdout.write(self.style.SUCCESS(line))
+                else:
+                    self.stdout.write(line)
+        return regressions
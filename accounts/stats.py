@@ -0,0 +1,75 @@
+# accounts/stats.py
+"""
+Institution-wide figures for the home dashboard.
+
+Each table is read once with conditional aggregates, and attendance totals
+come from the DailyAttendanceRollup fact table rather than the raw records.
+The figures are the same for every user, so they are cached for a short
+time and shared by all requests.
+"""
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+
+from attendance.models import DailyAttendanceRollup
+from courses.models import Course, Class
+from students.models import Student
+from .models import User
+
+DASHBOARD_METRICS_TIMEOUT = 60
+
+
+def _attendance_rate(present, total):
+    return round(present / total * 100, 1) if total else 0
+
+
+def compute_dashboard_metrics(today):
+    """Compute the dashboard figures for a date"""
+    students = Student.objects.filter(status='active').aggregate(
+        total_students=Count('id'),
+        male_students=Count('id', filter=Q(gender='M')),
+        female_students=Count('id', filter=Q(gender='F')),
+    )
+
+    attendance = DailyAttendanceRollup.objects.aggregate(
+        total_attendance_records=Coalesce(Sum('count'), 0),
+        total_present=Coalesce(Sum('count', filter=Q(status='present')), 0),
+        today_attendance=Coalesce(Sum('count', filter=Q(date=today)), 0),
+        today_present=Coalesce(Sum('count', filter=Q(date=today, status='present')), 0),
+        today_absent=Coalesce(Sum('count', filter=Q(date=today, status='absent')), 0),
+        today_late=Coalesce(Sum('count', filter=Q(date=today, status='late')), 0),
+    )
+
+    departments = Course.objects.values('department').annotate(
+        count=Count('id')
+    ).filter(department__isnull=False).exclude(department='').order_by('-count')[:5]
+
+    return {
+        **students,
+        **attendance,
+        'total_courses': Course.objects.filter(is_active=True).count(),
+        'total_classes': Class.objects.filter(is_active=True).count(),
+        'total_instructors': User.objects.filter(user_type='instructor', is_active=True).count(),
+        'attendance_rate': _attendance_rate(attendance['today_present'], attendance['today_attendance']),
+        'top_departments': list(departments),
+    }
+
+
+def dashboard_metrics(today):
+    """Dashboard figures for a date, cached for DASHBOARD_METRICS_TIMEOUT seconds"""
+    key = f'dashboard-metrics:{today.isoformat()}'
+    metrics = cache.get(key)
+    if metrics is None:
+        metrics = compute_dashboard_metrics(today)
+        cache.set(key, metrics, DASHBOARD_METRICS_TIMEOUT)
+    return metrics
+
+
+def student_attendance_metrics(student):
+    """A student's own attendance counts and rate"""
+    counts = DailyAttendanceRollup.objects.filter(student=student).aggregate(
+        my_attendance=Coalesce(Sum('count'), 0),
+        my_present=Coalesce(Sum('count', filter=Q(status='present')), 0),
+    )
+    counts['my_attendance_rate'] = _attendance_rate(counts['my_present'], counts['my_attendance'])
+    return counts
@@ -1,3 +1,155 @@
-from django.test import TestCase
+import json
+import tempfile
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import Count, Q, Sum
+from django.test import TestCase, TransactionTestCase
+
+from attendance import stats
+from attendance.models import AttendanceRecord, AttendanceSession, AttendanceSummary, DailyAttendanceRollup
+from courses.models import Class
+from students.models import Enrollment, Student
+from tvet_attendance.testing import create_class, create_course, create_session, create_student, create_user
+from .stats import compute_dashboard_metrics, dashboard_metrics, student_attendance_metrics
+
+
+class GenerateInstitutionTests(TestCase):
+    """generate_institution builds a small, consistent and reproducible institution"""
+
+    def generate(self, prefix, **options):
+        # 12 students in classes of 5 (3 classes) over two full weeks ending on a Friday
+        call_command(
+            'generate_institution', prefix=prefix, departments=1, courses_per_department=2,
+            instructors_per_department=2, students=12, class_size=5, weeks=2,
+            end_date='2026-03-13', seed=7, stdout=StringIO(), **options
+        )
+
+    def statuses(self, prefix):
+        return list(AttendanceRecord.objects.filter(
+            student__admission_number__startswith=prefix
+        ).order_by('session_date', 'student__admission_number').values_list('session_date', 'status'))
+
+    def test_generates_consistent_data(self):
+        self.generate('AAA')
+
+        self.assertEqual(Class.objects.count(), 3)
+        self.assertEqual(Student.objects.count(), 12)
+        self.assertEqual(Enrollment.objects.count(), 12)
+        # Every class meets three days a week and every student has a record per session
+        self.assertEqual(AttendanceSession.objects.count(), 3 * 6)
+        self.assertEqual(AttendanceRecord.objects.count(), 12 * 6)
+
+        sessions = AttendanceSession.objects.annotate(
+            present=Count('attendance_records', filter=Q(attendance_records__status='present')),
+            late=Count('attendance_records', filter=Q(attendance_records__status='late')),
+        )
+        for session in sessions:
+            self.assertEqual((session.total_present, session.total_late), (session.present, session.late))
+
+        # Derived tables are rebuilt from the raw records
+        self.assertEqual(DailyAttendanceRollup.objects.aggregate(total=Sum('count'))['total'], 12 * 6)
+        self.assertEqual(
+            AttendanceSummary.objects.filter(period_type='monthly').values('student').distinct().count(), 12
+        )
+        self.assertFalse(Student.objects.filter(
+            attendance_records__status='present', last_attendance_date__isnull=True
+        ).exists())
+
+    def test_same_seed_gives_the_same_attendance(self):
+        self.generate('AAA', skip_derived=True)
+        self.generate('BBB', skip_derived=True)
+
+        self.assertEqual(self.statuses('AAA'), self.statuses('BBB'))
+        self.assertFalse(DailyAttendanceRollup.objects.exists())
+
+    def test_existing_prefix_is_rejected(self):
+        self.generate('AAA', skip_derived=True)
+
+        with self.assertRaisesMessage(CommandError, 'prefix AAA already exists'):
+            self.generate('AAA')
+
+
+class RunBenchmarksTests(TransactionTestCase):
+    """run_benchmarks times committed writes, cold and warm reports, and fails on bad responses"""
+
+    def setUp(self):
+        call_command(
+            'generate_institution', prefix='BEN', departments=1, courses_per_department=1,
+            instructors_per_department=1, students=6, class_size=6, weeks=2, stdout=StringIO()
+        )
+        self.output = self.enterContext(tempfile.NamedTemporaryFile(suffix='.json'))
+
+    def benchmark(self, *scenarios, **options):
+        call_command(
+            'run_benchmarks', *[f'--scenario={scenario}' for scenario in scenarios],
+            iterations=2, warmup=1, output=self.output.name, stdout=StringIO(), **options
+        )
+        with open(self.output.name) as output:
+            results = json.load(output)
+        self.assertTrue(results['meta']['report_cache'])
+        return results['scenarios']
+
+    def test_writes_commit_and_reports_run_cold_and_warm(self):
+        with mock.patch.object(stats, 'recalculate_session_stats', wraps=stats.recalculate_session_stats) as recount:
+            results = self.benchmark('login', 'bulk_mark', 'attendance_report_day')
+
+        # The on-commit statistics work of bulk marking runs as in production
+        recount.assert_called()
+        self.assertEqual(results['login']['cold']['status'], [302])
+        self.assertEqual(results['bulk_mark']['warm']['status'], [200])
+        report = results['attendance_report_day']
+        self.assertGreater(report['cold']['queries'], report['warm']['queries'])
+        self.assertGreater(report['cold']['peak_alloc_kb'], 0)
+
+    def test_unexpected_status_fails(self):
+        with self.assertRaisesMessage(CommandError, 'Unexpected response status: login (200)'):
+            self.benchmark('login', password='wrong')
+
+
+class DashboardMetricsTests(TestCase):
+    """Dashboard figures come from the rollups, match the raw records and are cached"""
+
+    def setUp(self):
+        cache.clear()
+        self.today = date.today()
+        class_obj = create_class(create_course(), create_user('instructor', 'instructor'))
+        self.students = [
+            create_student(class_obj.course, f'ADM{index:03}', class_obj, gender=gender)
+            for index, gender in enumerate('FFM')
+        ]
+        earlier = create_session(class_obj, self.today - timedelta(days=1))
+        session = create_session(class_obj, self.today)
+        with self.captureOnCommitCallbacks(execute=True):
+            for student, status in zip(self.students, ['present', 'late', 'absent']):
+                AttendanceRecord.objects.create(session=session, student=student, status=status)
+            AttendanceRecord.objects.create(session=earlier, student=self.students[0], status='present')
+
+    def test_metrics(self):
+        metrics = compute_dashboard_metrics(self.today)
+
+        self.assertEqual(
+            (metrics['total_students'], metrics['female_students'], metrics['male_students']), (3, 2, 1)
+        )
+        self.assertEqual((metrics['total_attendance_records'], metrics['total_present']), (4, 2))
+        self.assertEqual(
+            (metrics['today_attendance'], metrics['today_present'], metrics['today_absent'], metrics['today_late']),
+            (3, 1, 1, 1)
+        )
+        self.assertEqual(metrics['attendance_rate'], 33.3)
+        self.assertEqual(metrics['top_departments'], [{'department': 'ICT', 'count': 1}])
+        self.assertEqual(
+            student_attendance_metrics(self.students[0]),
+            {'my_attendance': 2, 'my_present': 2, 'my_attendance_rate': 100.0}
+        )
+
+    def test_metrics_are_cached_per_date(self):
+        metrics = dashboard_metrics(self.today)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(dashboard_metrics(self.today), metrics)
+        self.assertEqual(dashboard_metrics(self.today + timedelta(days=1))['today_attendance'], 0)
@@ -0,0 +1,93 @@
+# attendance/active_sessions.py
+"""
+Ongoing sessions visible to the current user.
+
+Instructors see the sessions they run or that belong to their classes,
+students the sessions of their current class and everyone else all ongoing
+sessions. The list is loaded the first time it is needed during a request
+and kept on the request, so the context processor and the dashboards share
+it.
+
+Across requests the lists are cached per instructor, per class and for
+everyone. Session saves and deletes (attendance.signals), session total
+recounts and class reassignments evict the lists the session appears in;
+CACHE_TIMEOUT bounds the staleness of anything not covered.
+"""
+from django.core.cache import cache
+from django.db.models import Q
+
+from courses.models import Class
+from students.models import Student
+from .models import AttendanceSession
+
+CACHE_TIMEOUT = 5 * 60
+
+ALL_SESSIONS_KEY = 'ongoing-sessions:all'
+
+
+def _instructor_key(instructor_id):
+    return f'ongoing-sessions:instructor:{instructor_id}'
+
+
+def _class_key(class_id):
+    return f'ongoing-sessions:class:{class_id}'
+
+
+def _cached(key, condition=Q()):
+    sessions = cache.get(key)
+    if sessions is None:
+        sessions = list(AttendanceSession.objects.filter(condition, status='ongoing').select_related(
+            'class_session', 'class_session__course', 'instructor'
+        ).order_by('-session_date', '-start_time'))
+        cache.set(key, sessions, CACHE_TIMEOUT)
+    return sessions
+
+
+def _ongoing_sessions(user):
+    if user.user_type == 'instructor':
+        return _cached(_instructor_key(user.id), Q(instructor=user) | Q(class_session__instructor=user))
+    if user.user_type == 'student':
+        class_id = Student.objects.filter(user=user).values_list('current_class_id', flat=True).first()
+        return _cached(_class_key(class_id), Q(class_session_id=class_id)) if class_id else []
+    return _cached(ALL_SESSIONS_KEY)
+
+
+def active_sessions_for(request):
+    """The user's ongoing sessions, most recent first, loaded once per request"""
+    if not hasattr(request, '_active_sessions'):
+        user = request.user
+        request._active_sessions = _ongoing_sessions(user) if user.is_authenticated else []
+    return request._active_sessions
+
+
+def session_cache_keys(class_id, instructor_id):
+    """Cache keys of every list a session of this class and instructor can appear in"""
+    class_instructor_id = Class.objects.filter(id=class_id).values_list('instructor_id', flat=True).first()
+    return {ALL_SESSIONS_KEY, _class_key(class_id), _instructor_key(instructor_id), _instructor_key(class_instructor_id)}
+
+
+def invalidate_session_keys(keys):
+    cache.delete_many(list(keys))
+
+
+def invalidate_instructor_sessions(instructor_id):
+    cache.delete(_instructor_key(instructor_id))
+
+
+def invalidate_ongoing_sessions(session_ids):
+    """Evict the cached lists containing any of the given sessions that are ongoing"""
+    keys = set()
+    for class_id, instructor_id, class_instructor_id in AttendanceSession.objects.filter(
+        id__in=session_ids, status='ongoing'
+    ).values_list('class_session_id', 'instructor_id', 'class_session__instructor_id'):
+        keys |= {ALL_SESSIONS_KEY, _class_key(class_id), _instructor_key(instructor_id),
+                 _instructor_key(class_instructor_id)}
+    invalidate_session_keys(keys)
+
+
+def invalidate_class_sessions(class_ids, instructor_ids):
+    """Evict the lists holding sessions of the given classes, for their previous and new instructors"""
+    keys = {ALL_SESSIONS_KEY}
+    keys |= {_class_key(class_id) for class_id in class_ids}
+    keys |= {_instructor_key(instructor_id) for instructor_id in instructor_ids}
+    invalidate_session_keys(keys)
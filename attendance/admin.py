@@ -1,6 +1,9 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import AttendanceSession, AttendanceRecord, AttendanceSummary, ExcuseApplication
+from .models import (
+    AttendanceSession, AttendanceRecord, AttendanceSummary, ExcuseApplication, DailyAttendanceRollup
+)
+from .stats import mark_session_dirty, mark_student_dirty
 
 @admin.register(AttendanceSession)
 class AttendanceSessionAdmin(admin.ModelAdmin):
@@ -44,9 +47,9 @@ class AttendanceSessionAdmin(admin.ModelAdmin):
 @admin.register(AttendanceRecord)
 class AttendanceRecordAdmin(admin.ModelAdmin):
     list_display = ['student', 'session', 'status', 'check_in_time', 'marked_by', 'is_excused']
-    list_filter = ['status', 'is_excused', 'session__session_date', 'session__class_session']
+    list_filter = ['status', 'is_excused', 'session_date', 'class_session']
     search_fields = ['student__admission_number', 'student__user__first_name', 
-                     'student__user__last_name', 'session__class_session__class_code']
+                     'student__user__last_name', 'class_session__class_code']
     readonly_fields = ['created_at', 'updated_at', 'mark_time']
     list_per_page = 30
     
@@ -68,6 +71,13 @@ class AttendanceRecordAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
+    
+    def delete_queryset(self, request, queryset):
+        affected = list(queryset.values_list('session_id', 'session_date', 'class_session_id', 'student_id'))
+        super().delete_queryset(request, queryset)
+        for session_id, session_date, class_id, student_id in affected:
+            mark_session_dirty(session_id, (session_date, class_id), [student_id])
+            mark_student_dirty(student_id)
 
 @admin.register(AttendanceSummary)
 class AttendanceSummaryAdmin(admin.ModelAdmin):
@@ -79,6 +89,17 @@ class AttendanceSummaryAdmin(admin.ModelAdmin):
     readonly_fields = ['created_at', 'updated_at']
     list_per_page = 20
 
+@admin.register(DailyAttendanceRollup)
+class DailyAttendanceRollupAdmin(admin.ModelAdmin):
+    list_display = ['date', 'class_session', 'instructor', 'student', 'status', 'count']
+    list_filter = ['status', 'date', 'class_session']
+    search_fields = ['student__admission_number', 'class_session__class_code']
+    readonly_fields = ['date', 'class_session', 'instructor', 'student', 'status', 'count']
+    list_per_page = 50
+    
+    def has_add_permission(self, request):
+        return False
+
 @admin.register(ExcuseApplication)
 class ExcuseApplicationAdmin(admin.ModelAdmin):
     list_display = ['student', 'class_session', 'start_date', 'end_date', 'status', 'applied_at']
@@ -32,7 +32,7 @@ class AttendanceSessionForm(forms.ModelForm):
 class ManualAttendanceForm(forms.Form):
     """Form for manual attendance marking"""
     student = forms.ModelChoiceField(
-        queryset=Student.objects.filter(status='active'),
+        queryset=Student.objects.filter(status='active').select_related('user'),
         widget=forms.Select(attrs={'class': 'form-control select2'})
     )
     status = forms.ChoiceField(
@@ -137,7 +137,7 @@ class AttendanceReportFilterForm(forms.Form):
     )
     
     student = forms.ModelChoiceField(
-        queryset=Student.objects.filter(status='active'),
+        queryset=Student.objects.filter(status='active').select_related('user'),
         required=False,
         empty_label="All Students",
         widget=forms.Select(attrs={'class': 'form-control'})
@@ -0,0 +1,36 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+
+from attendance.models import AttendanceSession
+from attendance.summaries import rebuild_summaries_for_range
+
+
+class Command(BaseCommand):
+    help = 'Build the weekly and monthly AttendanceSummary rows from attendance records'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First date to backfill (YYYY-MM-DD). Defaults to the earliest session.')
+        parser.add_argument('--end', help='Last date to backfill (YYYY-MM-DD). Defaults to the latest session.')
+
+    def handle(self, *args, **options):
+        bounds = AttendanceSession.objects.aggregate(first=Min('session_date'), last=Max('session_date'))
+
+        try:
+            start_date = self._parse_date(options['start']) or bounds['first']
+            end_date = self._parse_date(options['end']) or bounds['last']
+        except ValueError:
+            raise CommandError('Dates must be in YYYY-MM-DD format')
+
+        if not start_date or not end_date:
+            self.stdout.write(self.style.WARNING('No attendance sessions found.'))
+            return
+
+        built = rebuild_summaries_for_range(start_date, end_date)
+        self.stdout.write(self.style.SUCCESS(
+            f'Built {built} summary rows from {start_date} to {end_date}'
+        ))
+
+    def _parse_date(self, value):
+        return datetime.strptime(value, '%Y-%m-%d').date() if value else None
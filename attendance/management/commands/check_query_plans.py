@@ -0,0 +1,113 @@
+import re
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from attendance.models import AttendanceRecord, AttendanceSession, DailyAttendanceRollup
+from reports.exports import RECORD_COLUMNS, RECORD_EXPORT_ORDERING, record_fields
+
+# Tables that grow with every session; a full scan of these is a failure
+WATCHED_TABLES = {
+    AttendanceRecord._meta.db_table,
+    AttendanceSession._meta.db_table,
+    DailyAttendanceRollup._meta.db_table,
+}
+
+# Plan lines reporting a full table (or whole index) scan, per database vendor
+FULL_SCAN_PATTERNS = {
+    'sqlite': re.compile(r'\bSCAN (\w+)'),
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+}
+
+# Plan lines reporting a sort of the result rows, per database vendor
+SORT_PATTERNS = {
+    'sqlite': re.compile(r'USE TEMP B-TREE FOR (?:RIGHT PART OF )?ORDER BY'),
+    'postgresql': re.compile(r'^\s*(?:->\s+)?(?:Incremental )?Sort\b', re.MULTILINE),
+}
+
+
+def hot_queries(today):
+    """(name, queryset) pairs for the filters the attendance views and reports run most"""
+    month_ago = today - timedelta(days=30)
+    return [
+        ('records by student and status',
+         AttendanceRecord.objects.filter(student_id=1, status='present')),
+        ('records for a date',
+         AttendanceRecord.objects.filter(session_date=today)),
+        ('records for a class and date range',
+         AttendanceRecord.objects.filter(class_session_id=1, session_date__range=(month_ago, today))),
+        ('records for a student and date range',
+         AttendanceRecord.objects.filter(student_id=1, session_date__range=(month_ago, today))),
+        ('records of a session',
+         AttendanceRecord.objects.filter(session_id=1)),
+        ('sessions by instructor and status',
+         AttendanceSession.objects.filter(instructor_id=1, status='ongoing')),
+        ('ongoing sessions of an instructor',
+         AttendanceSession.objects.filter(Q(instructor_id=1) | Q(class_session__instructor_id=1), status='ongoing')),
+        ('sessions by class, status and date',
+         AttendanceSession.objects.filter(class_session_id=1, status='scheduled', session_date__gte=today)),
+        ('ongoing sessions',
+         AttendanceSession.objects.filter(status='ongoing')),
+        ('sessions for a date',
+         AttendanceSession.objects.filter(session_date=today)),
+        ('rollups for a date range',
+         DailyAttendanceRollup.objects.filter(date__range=(month_ago, today))),
+        ('rollups for a class and date range',
+         DailyAttendanceRollup.objects.filter(class_session_id=1, date__range=(month_ago, today))),
+        ('rollups for a student',
+         DailyAttendanceRollup.objects.filter(student_id=1)),
+    ]
+
+
+def export_queries(today):
+    """(name, queryset) pairs for the streamed record exports, which must also be read without a sort"""
+    month_ago = today - timedelta(days=30)
+    records = AttendanceRecord.objects.order_by(*RECORD_EXPORT_ORDERING).values_list(*record_fields(RECORD_COLUMNS))
+    return [
+        ('export records for a date range',
+         records.filter(session_date__range=(month_ago, today))),
+        ('export records of a class for a date range',
+         records.filter(class_session_id=1, session_date__range=(month_ago, today))),
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Run EXPLAIN for the hot attendance queries and fail if any does a full scan or an export sorts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--show-plans', action='store_true', help='Print the full plan of every query')
+
+    def handle(self, *args, **options):
+        pattern = FULL_SCAN_PATTERNS.get(connection.vendor)
+        if pattern is None:
+            raise CommandError(f'Query plans cannot be checked on {connection.vendor}')
+
+        today = timezone.now().date()
+        queries = [(name, queryset, False) for name, queryset in hot_queries(today)]
+        queries += [(name, queryset, True) for name, queryset in export_queries(today)]
+
+        failures = []
+        for name, queryset, unsorted in queries:
+            plan = queryset.explain()
+            problems = []
+            scanned = sorted({table for table in pattern.findall(plan) if table in WATCHED_TABLES})
+            if scanned:
+                problems.append(f'FULL SCAN  {name}: {", ".join(scanned)}')
+            if unsorted and SORT_PATTERNS[connection.vendor].search(plan):
+                problems.append(f'SORT       {name}')
+
+            if problems:
+                failures.append(name)
+                for problem in problems:
+                    self.stdout.write(self.style.ERROR(problem))
+            else:
+                self.stdout.write(f'ok         {name}')
+            if options['show_plans'] or problems:
+                self.stdout.write('    ' + plan.replace('\n', '\n    '))
+
+        if failures:
+            raise CommandError(f'{len(failures)} of the hot queries do a full scan or a sort')
+        self.stdout.write(self.style.SUCCESS('No hot query does a full scan or a sort'))
@@ -0,0 +1,105 @@
+import re
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from attendance.models import AttendanceSession
+from attendance.services import materialise_roster
+from courses.models import Class
+
+TIME_RANGE_RE = re.compile(
+    r'(\d{1,2}(?::\d{2})?\s*(?:[AaPp][Mm])?)\s*(?:-|–|to)\s*(\d{1,2}(?::\d{2})?\s*(?:[AaPp][Mm])?)'
+)
+
+
+def parse_meeting_time(meeting_time):
+    """Parse a Class.meeting_time string such as '10:00 AM - 12:00 PM'"""
+    match = TIME_RANGE_RE.search(meeting_time or '')
+    if not match:
+        return None
+    times = []
+    for value in match.groups():
+        value = value.strip().upper().replace(' ', '')
+        for fmt in ('%I:%M%p', '%I%p', '%H:%M', '%H'):
+            try:
+                times.append(datetime.strptime(value, fmt).time())
+                break
+            except ValueError:
+                continue
+        else:
+            return None
+    return tuple(times)
+
+
+def meets_on(class_obj, day):
+    """Check whether a class meets on the given date according to meeting_days"""
+    meeting_days = (class_obj.meeting_days or '').lower()
+    day_name = day.strftime('%A').lower()
+    return day_name in meeting_days or day_name[:3] in re.split(r'[\s,/]+', meeting_days)
+
+
+class Command(BaseCommand):
+    help = "Pre-create attendance sessions and rosters for every active class meeting on a given day"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Session date (YYYY-MM-DD). Defaults to tomorrow.')
+        parser.add_argument('--ignore-meeting-days', action='store_true',
+                            help='Create a session for every active class regardless of meeting_days')
+
+    def handle(self, *args, **options):
+        if options['date']:
+            try:
+                session_date = datetime.strptime(options['date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--date must be in YYYY-MM-DD format')
+        else:
+            session_date = timezone.now().date() + timedelta(days=1)
+
+        classes = Class.objects.filter(
+            is_active=True,
+            instructor__isnull=False,
+            start_date__lte=session_date,
+            end_date__gte=session_date
+        )
+
+        existing = set(AttendanceSession.objects.filter(
+            session_date=session_date,
+            class_session__in=classes
+        ).values_list('class_session_id', 'start_time'))
+
+        created = 0
+        roster_size = 0
+
+        for class_obj in classes:
+            if not options['ignore_meeting_days'] and not meets_on(class_obj, session_date):
+                continue
+
+            times = parse_meeting_time(class_obj.meeting_time)
+            if not times:
+                self.stdout.write(self.style.WARNING(
+                    f'Skipping {class_obj.class_code}: cannot parse meeting time "{class_obj.meeting_time}"'
+                ))
+                continue
+
+            start_time, end_time = times
+            if (class_obj.id, start_time) in existing:
+                continue
+
+            with transaction.atomic():
+                session = AttendanceSession.objects.create(
+                    class_session=class_obj,
+                    instructor_id=class_obj.instructor_id,
+                    session_date=session_date,
+                    start_time=start_time,
+                    end_time=end_time,
+                    topic_covered='Scheduled session',
+                    venue=class_obj.venue,
+                )
+                roster_size += materialise_roster(session)
+            created += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {created} sessions for {session_date} with {roster_size} attendance records'
+        ))
@@ -0,0 +1,38 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+
+from attendance.models import AttendanceSession
+from attendance.rollups import rebuild_rollups_for_range
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the DailyAttendanceRollup table from attendance records'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First date to rebuild (YYYY-MM-DD). Defaults to the earliest session.')
+        parser.add_argument('--end', help='Last date to rebuild (YYYY-MM-DD). Defaults to the latest session.')
+        parser.add_argument('--chunk-days', type=int, default=31,
+                            help='Number of days rebuilt per transaction (default: 31)')
+
+    def handle(self, *args, **options):
+        bounds = AttendanceSession.objects.aggregate(first=Min('session_date'), last=Max('session_date'))
+
+        try:
+            start_date = self._parse_date(options['start']) or bounds['first']
+            end_date = self._parse_date(options['end']) or bounds['last']
+        except ValueError:
+            raise CommandError('Dates must be in YYYY-MM-DD format')
+
+        if not start_date or not end_date:
+            self.stdout.write(self.style.WARNING('No attendance sessions found.'))
+            return
+
+        created = rebuild_rollups_for_range(start_date, end_date, chunk_days=options['chunk_days'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {created} rollup rows from {start_date} to {end_date}'
+        ))
+
+    def _parse_date(self, value):
+        return datetime.strptime(value, '%Y-%m-%d').date() if value else None
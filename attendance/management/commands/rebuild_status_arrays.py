@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from attendance.models import AttendanceSession
+from attendance.status_arrays import rebuild_status_arrays
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the packed attendance status arrays from attendance records'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--class', dest='class_ids', type=int, action='append', default=[],
+                            help='Only rebuild this class id (repeatable). Defaults to every class with sessions.')
+
+    def handle(self, *args, **options):
+        if not settings.ATTENDANCE_STATUS_ARRAYS:
+            self.stdout.write(self.style.WARNING(
+                'ATTENDANCE_STATUS_ARRAYS is disabled; the arrays will not be kept up to date.'
+            ))
+
+        class_ids = options['class_ids'] or list(
+            AttendanceSession.objects.order_by().values_list('class_session_id', flat=True).distinct()
+        )
+        for class_id in class_ids:
+            rebuild_status_arrays([class_id])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt status arrays for {len(class_ids)} classes'))
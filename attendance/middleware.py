@@ -0,0 +1,15 @@
+# attendance/middleware.py
+from .stats import deferred_stats
+
+
+class SessionStatsMiddleware:
+    """
+    Recompute attendance statistics once per request instead of on every
+    AttendanceRecord save
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with deferred_stats():
+            return self.get_response(request)
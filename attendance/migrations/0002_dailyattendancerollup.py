@@ -0,0 +1,64 @@
+# Generated by Django 6.0.2 on 2026-10-17 09:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def build_rollups(apps, schema_editor):
+    AttendanceRecord = apps.get_model('attendance', 'AttendanceRecord')
+    DailyAttendanceRollup = apps.get_model('attendance', 'DailyAttendanceRollup')
+
+    rows = AttendanceRecord.objects.order_by().values(
+        'session__session_date',
+        'session__class_session_id',
+        'session__instructor_id',
+        'student_id',
+        'status',
+    ).annotate(total=Count('id'))
+
+    batch = []
+    for row in rows.iterator(chunk_size=1000):
+        batch.append(DailyAttendanceRollup(
+            date=row['session__session_date'],
+            class_session_id=row['session__class_session_id'],
+            instructor_id=row['session__instructor_id'],
+            student_id=row['student_id'],
+            status=row['status'],
+            count=row['total'],
+        ))
+        if len(batch) >= 1000:
+            DailyAttendanceRollup.objects.bulk_create(batch)
+            batch = []
+    DailyAttendanceRollup.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0001_initial'),
+        ('courses', '0001_initial'),
+        ('students', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyAttendanceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('status', models.CharField(choices=[('present', 'Present'), ('absent', 'Absent'), ('late', 'Late'), ('excused', 'Excused'), ('half_day', 'Half Day')], max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('class_session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_rollups', to='courses.class')),
+                ('instructor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='attendance_rollups', to=settings.AUTH_USER_MODEL)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_rollups', to='students.student')),
+            ],
+            options={
+                'ordering': ['-date'],
+                'unique_together': {('date', 'class_session', 'instructor', 'student', 'status')},
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
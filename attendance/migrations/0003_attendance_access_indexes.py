@@ -0,0 +1,37 @@
+# Generated by Django 6.0.2 on 2026-10-17 14:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0002_dailyattendancerollup'),
+        ('courses', '0001_initial'),
+        ('students', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['student', 'status'], name='att_record_student_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancesession',
+            index=models.Index(fields=['session_date', 'class_session'], name='att_session_date_class_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancesession',
+            index=models.Index(fields=['instructor', 'status'], name='att_session_instr_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancesession',
+            index=models.Index(fields=['class_session', 'status', 'session_date'], name='att_session_class_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancesession',
+            index=models.Index(fields=['status', 'session_date'], name='att_session_status_date_idx'),
+        ),
+    ]
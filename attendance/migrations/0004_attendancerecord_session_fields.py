@@ -0,0 +1,59 @@
+# Generated by Django 6.0.2 on 2026-10-17 15:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_session_fields(apps, schema_editor):
+    AttendanceRecord = apps.get_model('attendance', 'AttendanceRecord')
+    AttendanceSession = apps.get_model('attendance', 'AttendanceSession')
+    session = AttendanceSession.objects.filter(pk=OuterRef('session_id'))
+    AttendanceRecord.objects.update(
+        session_date=Subquery(session.values('session_date')[:1]),
+        class_session_id=Subquery(session.values('class_session_id')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0003_attendance_access_indexes'),
+        ('courses', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendancerecord',
+            name='session_date',
+            field=models.DateField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='attendancerecord',
+            name='class_session',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='attendance_records', to='courses.class'),
+        ),
+        migrations.RunPython(copy_session_fields, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='attendancerecord',
+            name='session_date',
+            field=models.DateField(editable=False),
+        ),
+        migrations.AlterField(
+            model_name='attendancerecord',
+            name='class_session',
+            field=models.ForeignKey(db_index=False, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='attendance_records', to='courses.class'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['session_date', 'class_session'], name='att_record_date_class_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['class_session', 'session_date'], name='att_record_class_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['student', 'session_date'], name='att_record_student_date_idx'),
+        ),
+    ]
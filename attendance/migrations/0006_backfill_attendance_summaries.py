@@ -0,0 +1,97 @@
+# Generated by Django 6.0.2 on 2026-10-17 17:00
+
+import calendar
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Count, Q
+from django.db.models.functions import TruncMonth, TruncWeek
+
+
+def _rate(part, whole):
+    if not whole:
+        return Decimal('0.00')
+    return Decimal(min(part, whole) * 100 / whole).quantize(Decimal('0.01'))
+
+
+def _period_end(period_start, period_type):
+    if period_type == 'weekly':
+        return period_start + timedelta(days=6)
+    return period_start.replace(day=calendar.monthrange(period_start.year, period_start.month)[1])
+
+
+def _previous_start(period_start, period_type):
+    if period_type == 'weekly':
+        return period_start - timedelta(days=7)
+    return (period_start - timedelta(days=1)).replace(day=1)
+
+
+def build_summaries(apps, schema_editor):
+    AttendanceRecord = apps.get_model('attendance', 'AttendanceRecord')
+    AttendanceSummary = apps.get_model('attendance', 'AttendanceSummary')
+
+    # Rebuilt from scratch, so rows built with the old punctuality formula are replaced too
+    AttendanceSummary.objects.all().delete()
+
+    class_ids = AttendanceRecord.objects.order_by('class_session_id').values_list(
+        'class_session_id', flat=True
+    ).distinct()
+
+    # One class at a time keeps the previous-period rates to a single class
+    batch = []
+    for class_id in list(class_ids):
+        for period_type, trunc in (('weekly', TruncWeek), ('monthly', TruncMonth)):
+            rows = AttendanceRecord.objects.filter(class_session_id=class_id).order_by().values(
+                'student_id', period_start=trunc('session_date')
+            ).annotate(
+                total=Count('id'),
+                present=Count('id', filter=Q(status='present')),
+                absent=Count('id', filter=Q(status='absent')),
+                late=Count('id', filter=Q(status='late')),
+                excused=Count('id', filter=Q(status='excused')),
+            ).order_by('period_start')
+
+            rates = {}
+            for row in rows.iterator(chunk_size=1000):
+                period_start = row['period_start']
+                attendance_rate = _rate(row['present'], row['total'])
+                previous = rates.get((row['student_id'], _previous_start(period_start, period_type)))
+                rates[(row['student_id'], period_start)] = attendance_rate
+
+                if previous is None or attendance_rate == previous:
+                    trend = 'stable'
+                else:
+                    trend = 'up' if attendance_rate > previous else 'down'
+
+                batch.append(AttendanceSummary(
+                    student_id=row['student_id'],
+                    class_session_id=class_id,
+                    period_type=period_type,
+                    period_start=period_start,
+                    period_end=_period_end(period_start, period_type),
+                    total_sessions=row['total'],
+                    present_count=row['present'],
+                    absent_count=row['absent'],
+                    late_count=row['late'],
+                    excused_count=row['excused'],
+                    attendance_rate=attendance_rate,
+                    punctuality_rate=_rate(row['present'], row['present'] + row['late']),
+                    previous_period_rate=previous if previous is not None else Decimal('0.00'),
+                    trend=trend,
+                ))
+                if len(batch) >= 1000:
+                    AttendanceSummary.objects.bulk_create(batch)
+                    batch = []
+    AttendanceSummary.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0005_attendancestatusarray'),
+    ]
+
+    operations = [
+        migrations.RunPython(build_summaries, migrations.RunPython.noop),
+    ]
@@ -4,6 +4,10 @@ from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 
+from .stats import (
+    mark_class_sessions_changed, mark_scope_dirty, mark_session_added, mark_session_dirty, mark_student_dirty
+)
+
 class AttendanceSession(models.Model):
     STATUS_CHOICES = (
         ('scheduled', 'Scheduled'),
@@ -50,6 +54,19 @@ class AttendanceSession(models.Model):
     class Meta:
         ordering = ['-session_date', '-start_time']
         unique_together = ['class_session', 'session_date', 'start_time']
+        indexes = [
+            models.Index(fields=['session_date', 'class_session'], name='att_session_date_class_idx'),
+            models.Index(fields=['instructor', 'status'], name='att_session_instr_status_idx'),
+            models.Index(fields=['class_session', 'status', 'session_date'], name='att_session_class_status_idx'),
+            models.Index(fields=['status', 'session_date'], name='att_session_status_date_idx'),
+        ]
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the persisted values so save() can tell what changed
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
     
     def save(self, *args, **kwargs):
         # Generate QR code data if using QR attendance
@@ -58,15 +75,50 @@ class AttendanceSession(models.Model):
             self.qr_code_data = f"ATTENDANCE_{self.class_session.id}_{secrets.token_hex(16)}"
             self.qr_code_expiry = timezone.now() + timezone.timedelta(hours=2)
         
+        adding = self._state.adding
         super().save(*args, **kwargs)
-    
-    def calculate_stats(self):
+        if adding:
+            mark_session_added(self)
+        
+        # Moving a session to another day or class invalidates both scopes
+        loaded = getattr(self, '_loaded_values', {})
+        old_scope = (loaded.get('session_date'), loaded.get('class_session_id'))
+        if None not in old_scope and old_scope != (self.session_date, self.class_session_id):
+            self.attendance_records.update(session_date=self.session_date, class_session_id=self.class_session_id)
+            mark_scope_dirty(*old_scope)
+            mark_session_dirty(self.pk)
+            mark_class_sessions_changed(old_scope[1])
+            mark_class_sessions_changed(self.class_session_id)
+        elif loaded.get('instructor_id', self.instructor_id) != self.instructor_id:
+            # Rollups are attributed to the session's instructor
+            mark_scope_dirty(self.session_date, self.class_session_id)
+        self._loaded_values = {
+            **loaded,
+            'session_date': self.session_date,
+            'class_session_id': self.class_session_id,
+            'instructor_id': self.instructor_id,
+        }
+    
+    def delete(self, *args, **kwargs):
+        scope = (self.session_date, self.class_session_id)
+        result = super().delete(*args, **kwargs)
+        mark_scope_dirty(*scope)
+        mark_class_sessions_changed(scope[1])
+        return result
+    
+    def calculate_stats(self, commit=True):
         """Calculate attendance statistics for this session"""
-        records = self.attendance_records.all()
-        self.total_present = records.filter(status='present').count()
-        self.total_absent = records.filter(status='absent').count()
-        self.total_late = records.filter(status='late').count()
-        self.save()
+        from django.db.models import Count, Q
+        stats = self.attendance_records.aggregate(
+            present=Count('id', filter=Q(status='present')),
+            absent=Count('id', filter=Q(status='absent')),
+            late=Count('id', filter=Q(status='late')),
+        )
+        self.total_present = stats['present']
+        self.total_absent = stats['absent']
+        self.total_late = stats['late']
+        if commit:
+            self.save(update_fields=['total_present', 'total_absent', 'total_late', 'updated_at'])
     
     def is_active(self):
         """Check if attendance session is currently active"""
@@ -83,7 +135,7 @@ class AttendanceSession(models.Model):
         """Close the attendance session"""
         self.status = 'completed'
         self.closed_at = timezone.now()
-        self.calculate_stats()
+        self.calculate_stats(commit=False)
         self.save()
 
 
@@ -99,6 +151,11 @@ class AttendanceRecord(models.Model):
     session = models.ForeignKey(AttendanceSession, on_delete=models.CASCADE, related_name='attendance_records')
     student = models.ForeignKey('students.Student', on_delete=models.CASCADE, related_name='attendance_records')
     
+    # Copied from the session so records can be range-scanned without a join
+    session_date = models.DateField(editable=False)
+    class_session = models.ForeignKey('courses.Class', on_delete=models.CASCADE, related_name='attendance_records',
+                                      editable=False, db_index=False)
+    
     # Attendance details
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='absent')
     check_in_time = models.DateTimeField(null=True, blank=True)
@@ -123,29 +180,69 @@ class AttendanceRecord(models.Model):
     class Meta:
         ordering = ['-mark_time']
         unique_together = ['session', 'student']
+        indexes = [
+            models.Index(fields=['student', 'status'], name='att_record_student_status_idx'),
+            models.Index(fields=['session_date', 'class_session'], name='att_record_date_class_idx'),
+            models.Index(fields=['class_session', 'session_date'], name='att_record_class_date_idx'),
+            models.Index(fields=['student', 'session_date'], name='att_record_student_date_idx'),
+        ]
     
     def __str__(self):
         return f"{self.student.admission_number} - {self.session} - {self.status}"
     
     def save(self, *args, **kwargs):
-        # Update student's last attendance date
-        if self.status == 'present' and self.check_in_time:
-            self.student.last_attendance_date = self.check_in_time.date()
-            self.student.save()
+        self.copy_session_fields()
         
         # Calculate late minutes if status is late
-        if self.status == 'late' and self.check_in_time and self.session.start_time:
-            from datetime import datetime, date
-            session_start = datetime.combine(self.session.session_date, self.session.start_time)
+        self.calculate_late_minutes()
+        
+        super().save(*args, **kwargs)
+        
+        # Session statistics and the student's last attendance date are
+        # recomputed once per request/transaction
+        mark_session_dirty(self.session_id, (self.session_date, self.class_session_id), [self.student_id])
+        mark_student_dirty(self.student_id)
+    
+    def copy_session_fields(self, session=None):
+        """Copy the denormalised session_date and class_session from the session"""
+        session = session or self.session
+        self.session_date = session.session_date
+        self.class_session_id = session.class_session_id
+    
+    def calculate_late_minutes(self, session=None):
+        """Set late_minutes from the check-in time if the student was late"""
+        session = session or self.session
+        if self.status == 'late' and self.check_in_time and session.start_time:
+            from datetime import datetime
+            session_start = datetime.combine(session.session_date, session.start_time)
             check_in = self.check_in_time
             if check_in.tzinfo:
                 session_start = timezone.make_aware(session_start)
             self.late_minutes = max(0, int((check_in - session_start).total_seconds() / 60))
-        
-        super().save(*args, **kwargs)
-        
-        # Update session statistics
-        self.session.calculate_stats()
+    
+    def delete(self, *args, **kwargs):
+        session_id, student_id = self.session_id, self.student_id
+        result = super().delete(*args, **kwargs)
+        mark_session_dirty(session_id, (self.session_date, self.class_session_id), [student_id])
+        mark_student_dirty(student_id)
+        return result
+
+class DailyAttendanceRollup(models.Model):
+    """Pre-aggregated daily attendance counts for reporting"""
+    date = models.DateField()
+    class_session = models.ForeignKey('courses.Class', on_delete=models.CASCADE, related_name='attendance_rollups')
+    instructor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL,
+                                   null=True, blank=True, related_name='attendance_rollups')
+    student = models.ForeignKey('students.Student', on_delete=models.CASCADE, related_name='attendance_rollups')
+    status = models.CharField(max_length=20, choices=AttendanceRecord.STATUS_CHOICES)
+    count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['-date']
+        unique_together = ['date', 'class_session', 'instructor', 'student', 'status']
+    
+    def __str__(self):
+        return f"{self.date} - {self.class_session_id} - {self.student_id} - {self.status}: {self.count}"
 
 class AttendanceSummary(models.Model):
     """Monthly/Weekly attendance summary for reporting"""
@@ -188,12 +285,31 @@ class AttendanceSummary(models.Model):
         """Calculate attendance and punctuality rates"""
         if self.total_sessions > 0:
             self.attendance_rate = (self.present_count / self.total_sessions) * 100
-            if self.present_count > 0:
-                self.punctuality_rate = ((self.present_count - self.late_count) / self.present_count) * 100
+            if self.present_count + self.late_count > 0:
+                self.punctuality_rate = (self.present_count / (self.present_count + self.late_count)) * 100
             else:
                 self.punctuality_rate = 0
         self.save()
 
+class AttendanceStatusArray(models.Model):
+    """
+    Packed attendance history of a student in a class.
+    
+    statuses holds one byte per session of the class, in session order, with
+    the code of the student's status (see attendance.status_arrays).
+    Only maintained when settings.ATTENDANCE_STATUS_ARRAYS is enabled.
+    """
+    student = models.ForeignKey('students.Student', on_delete=models.CASCADE, related_name='attendance_status_arrays')
+    class_session = models.ForeignKey('courses.Class', on_delete=models.CASCADE, related_name='attendance_status_arrays')
+    statuses = models.BinaryField(default=bytes)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['class_session', 'student']
+    
+    def __str__(self):
+        return f"{self.student_id} - {self.class_session_id}: {len(self.statuses)} sessions"
+
 class ExcuseApplication(models.Model):
     STATUS_CHOICES = (
         ('pending', 'Pending Review'),
@@ -242,8 +358,8 @@ class ExcuseApplication(models.Model):
         from django.db.models import Q
         records = AttendanceRecord.objects.filter(
             student=self.student,
-            session__class_session=self.class_session,
-            session__session_date__range=[self.start_date, self.end_date]
+            class_session=self.class_session,
+            session_date__range=[self.start_date, self.end_date]
         )
         
         for record in records:
@@ -0,0 +1,148 @@
+# attendance/rollups.py
+"""
+Maintenance of the DailyAttendanceRollup fact table.
+
+When a record changes, its student's rows for the (date, class) are compared
+with a grouped aggregate over that student's records and only the rows whose
+count changed are written. Moved or deleted sessions rebuild whole (date,
+class) scopes: the scope's rows are deleted and re-inserted from a single
+grouped aggregate over its attendance records.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Q
+
+ROLLUP_BATCH_SIZE = 1000
+
+
+def _scope_filter(scopes, date_field, class_field):
+    condition = Q()
+    for session_date, class_id in scopes:
+        condition |= Q(**{date_field: session_date, class_field: class_id})
+    return condition
+
+
+def _student_filter(keys, date_field, class_field):
+    students = defaultdict(set)
+    for session_date, class_id, student_id in keys:
+        students[(session_date, class_id)].add(student_id)
+
+    condition = Q()
+    for (session_date, class_id), student_ids in students.items():
+        condition |= Q(**{date_field: session_date, class_field: class_id, 'student_id__in': student_ids})
+    return condition
+
+
+def _insert_rollups(records):
+    from .models import DailyAttendanceRollup
+
+    rows = records.order_by().values(
+        'session_date',
+        'class_session_id',
+        'session__instructor_id',
+        'student_id',
+        'status',
+    ).annotate(total=Count('id'))
+
+    batch = []
+    created = 0
+    for row in rows.iterator(chunk_size=ROLLUP_BATCH_SIZE):
+        batch.append(DailyAttendanceRollup(
+            date=row['session_date'],
+            class_session_id=row['class_session_id'],
+            instructor_id=row['session__instructor_id'],
+            student_id=row['student_id'],
+            status=row['status'],
+            count=row['total'],
+        ))
+        if len(batch) >= ROLLUP_BATCH_SIZE:
+            DailyAttendanceRollup.objects.bulk_create(batch)
+            created += len(batch)
+            batch = []
+
+    DailyAttendanceRollup.objects.bulk_create(batch)
+    return created + len(batch)
+
+
+def rebuild_daily_rollups(scopes):
+    """Rebuild the rollup rows of the given (date, class_id) scopes"""
+    from .models import AttendanceRecord, DailyAttendanceRollup
+
+    scopes = list(scopes)
+    if not scopes:
+        return 0
+
+    with transaction.atomic():
+        DailyAttendanceRollup.objects.filter(
+            _scope_filter(scopes, 'date', 'class_session_id')
+        ).delete()
+        return _insert_rollups(AttendanceRecord.objects.filter(
+            _scope_filter(scopes, 'session_date', 'class_session_id')
+        ))
+
+
+def refresh_student_rollups(keys):
+    """Bring the rollup rows of (date, class_id, student_id) keys in line with their records, writing only changed rows"""
+    from .models import AttendanceRecord, DailyAttendanceRollup
+
+    keys = list(keys)
+    if not keys:
+        return 0
+
+    counts = {
+        (row['session_date'], row['class_session_id'], row['session__instructor_id'], row['student_id'], row['status']): row['total']
+        for row in AttendanceRecord.objects.filter(
+            _student_filter(keys, 'session_date', 'class_session_id')
+        ).order_by().values(
+            'session_date', 'class_session_id', 'session__instructor_id', 'student_id', 'status'
+        ).annotate(total=Count('id'))
+    }
+    existing = {
+        (rollup.date, rollup.class_session_id, rollup.instructor_id, rollup.student_id, rollup.status): rollup
+        for rollup in DailyAttendanceRollup.objects.filter(
+            _student_filter(keys, 'date', 'class_session_id')
+        ).only('id', 'date', 'class_session_id', 'instructor_id', 'student_id', 'status', 'count')
+    }
+
+    stale = [rollup.id for key, rollup in existing.items() if key not in counts]
+    changed = []
+    for key, total in counts.items():
+        if key in existing and existing[key].count == total:
+            continue
+        date, class_id, instructor_id, student_id, status = key
+        changed.append(DailyAttendanceRollup(
+            date=date, class_session_id=class_id, instructor_id=instructor_id,
+            student_id=student_id, status=status, count=total,
+        ))
+
+    with transaction.atomic():
+        if stale:
+            DailyAttendanceRollup.objects.filter(id__in=stale).delete()
+        DailyAttendanceRollup.objects.bulk_create(
+            changed,
+            update_conflicts=True,
+            unique_fields=['date', 'class_session', 'instructor', 'student', 'status'],
+            update_fields=['count'],
+        )
+    return len(stale) + len(changed)
+
+
+def rebuild_rollups_for_range(start_date, end_date, chunk_days=31):
+    """Rebuild every rollup row between two dates, one chunk of days at a time"""
+    from .models import AttendanceRecord, DailyAttendanceRollup
+
+    created = 0
+    chunk_start = start_date
+    while chunk_start <= end_date:
+        chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), end_date)
+        with transaction.atomic():
+            DailyAttendanceRollup.objects.filter(
+                date__range=[chunk_start, chunk_end]
+            ).delete()
+            created += _insert_rollups(AttendanceRecord.objects.filter(
+                session_date__range=[chunk_start, chunk_end]
+            ))
+        chunk_start = chunk_end + timedelta(days=1)
+    return created
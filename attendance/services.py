@@ -0,0 +1,148 @@
+# attendance/services.py
+"""
+Set-based write paths for attendance marking.
+
+These bypass AttendanceRecord.save() so that a whole class can be written
+with a fixed number of queries; the save() side effects are applied once per
+batch instead of once per student.
+"""
+from functools import partial
+
+from django.db import transaction
+from django.utils import timezone
+
+from .active_sessions import invalidate_ongoing_sessions
+from .models import AttendanceSession, AttendanceRecord
+from .stats import (
+    deferred_stats, mark_session_dirty, mark_session_statuses_changed, mark_student_dirty, mark_scope_dirty
+)
+from students.models import Enrollment
+
+CHECK_IN_STATUSES = ('present', 'late')
+
+
+def materialise_roster(session, marked_by=None):
+    """
+    Create a default 'absent' record for every actively enrolled student.
+
+    Intended for a freshly created session: the records are written with a
+    single bulk_create and the session totals are set from the roster size
+    instead of being recounted. Returns the number of records created.
+    """
+    student_ids = list(Enrollment.objects.filter(
+        class_enrolled_id=session.class_session_id,
+        is_active=True
+    ).values_list('student_id', flat=True))
+
+    AttendanceRecord.objects.bulk_create([
+        AttendanceRecord(
+            session=session,
+            student_id=student_id,
+            session_date=session.session_date,
+            class_session_id=session.class_session_id,
+            status='absent',
+            marked_by=marked_by,
+        )
+        for student_id in student_ids
+    ], batch_size=500)
+
+    session.total_present = 0
+    session.total_absent = len(student_ids)
+    session.total_late = 0
+    AttendanceSession.objects.filter(pk=session.pk).update(
+        total_present=0,
+        total_absent=len(student_ids),
+        total_late=0,
+    )
+    transaction.on_commit(partial(invalidate_ongoing_sessions, [session.pk]))
+    mark_scope_dirty(session.session_date, session.class_session_id)
+    # Queued after the rows exist; a class rebuild queued when the session was saved runs first
+    mark_session_statuses_changed(session.pk)
+    return len(student_ids)
+
+
+def bulk_mark_attendance(session, attendance_data, marked_by):
+    """
+    Apply a {student_id: status} mapping to a session.
+
+    All student ids are validated against the class's active enrollments in
+    one query, then written with one bulk_create and one bulk_update.
+    Returns a dict with the created/updated counts and a {student_id: reason}
+    mapping of rejected entries.
+    """
+    valid_statuses = dict(AttendanceRecord.STATUS_CHOICES)
+    rejected = {}
+    statuses = {}
+
+    for raw_id, status in attendance_data.items():
+        try:
+            student_id = int(raw_id)
+        except (TypeError, ValueError):
+            rejected[str(raw_id)] = 'Invalid student id'
+            continue
+        if status not in valid_statuses:
+            rejected[str(raw_id)] = 'Invalid status'
+            continue
+        statuses[student_id] = status
+
+    enrolled = set(Enrollment.objects.filter(
+        class_enrolled_id=session.class_session_id,
+        student_id__in=statuses,
+        is_active=True
+    ).values_list('student_id', flat=True))
+
+    for student_id in set(statuses) - enrolled:
+        rejected[str(student_id)] = 'Not enrolled in this class'
+        del statuses[student_id]
+
+    now = timezone.now()
+    to_create = []
+    to_update = []
+
+    with transaction.atomic():
+        existing = {
+            record.student_id: record
+            for record in AttendanceRecord.objects.filter(
+                session=session,
+                student_id__in=statuses
+            ).only('id', 'student_id', 'status', 'check_in_time', 'late_minutes')
+        }
+
+        for student_id, status in statuses.items():
+            record = existing.get(student_id)
+            if record is None:
+                record = AttendanceRecord(
+                    session=session,
+                    student_id=student_id,
+                    session_date=session.session_date,
+                    class_session_id=session.class_session_id,
+                    status=status,
+                    marked_by=marked_by,
+                    check_in_time=now if status in CHECK_IN_STATUSES else None,
+                )
+                to_create.append(record)
+            else:
+                record.status = status
+                record.marked_by = marked_by
+                record.updated_at = now
+                if status in CHECK_IN_STATUSES and not record.check_in_time:
+                    record.check_in_time = now
+                to_update.append(record)
+            record.calculate_late_minutes(session)
+
+        AttendanceRecord.objects.bulk_create(to_create)
+        AttendanceRecord.objects.bulk_update(
+            to_update,
+            ['status', 'marked_by', 'check_in_time', 'late_minutes', 'updated_at']
+        )
+
+    with deferred_stats():
+        mark_session_dirty(session.id, (session.session_date, session.class_session_id), statuses)
+        for student_id in statuses:
+            mark_student_dirty(student_id)
+
+    return {
+        'created': len(to_create),
+        'updated': len(to_update),
+        'rejected': rejected,
+    }
@@ -0,0 +1,40 @@
+# attendance/signals.py
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from courses.models import Class
+from .active_sessions import invalidate_instructor_sessions, invalidate_session_keys, session_cache_keys
+from .models import AttendanceSession
+from .stats import mark_classes_reassigned
+
+
+@receiver(post_save, sender=AttendanceSession)
+@receiver(post_delete, sender=AttendanceSession)
+def attendance_session_changed(sender, instance, **kwargs):
+    # Keys are resolved now, while a deleted session's class still exists
+    keys = session_cache_keys(instance.class_session_id, instance.instructor_id)
+    transaction.on_commit(partial(invalidate_session_keys, keys))
+
+    # A reassigned session also leaves its previous instructor's list
+    previous_instructor_id = getattr(instance, '_loaded_values', {}).get('instructor_id')
+    if previous_instructor_id not in (None, instance.instructor_id):
+        transaction.on_commit(partial(invalidate_instructor_sessions, previous_instructor_id))
+
+
+@receiver(pre_save, sender=Class)
+def remember_class_instructor(sender, instance, **kwargs):
+    instance._previous_instructor_id = sender.objects.filter(
+        pk=instance.pk
+    ).values_list('instructor_id', flat=True).first() if instance.pk else None
+
+
+@receiver(post_save, sender=Class)
+def class_changed(sender, instance, created, **kwargs):
+    previous_instructor_id = getattr(instance, '_previous_instructor_id', None)
+    if not created and previous_instructor_id != instance.instructor_id:
+        mark_classes_reassigned([instance.pk], {previous_instructor_id, instance.instructor_id})
+    else:
+        transaction.on_commit(partial(invalidate_instructor_sessions, instance.instructor_id))
@@ -0,0 +1,246 @@
+# attendance/stats.py
+"""
+Deferred attendance statistics.
+
+Saving an AttendanceRecord used to recount the whole session and rewrite the
+student row straight away. Records now only mark their session and student
+as dirty; the dirty sets (session totals, last attendance dates, the daily
+rollups and the attendance summaries) are recomputed once, with set-based
+queries, when the surrounding scope ends and the current transaction commits.
+Outside a scope, everything marked during one transaction is batched and
+recomputed together when it commits.
+Cached report results covering a refreshed (date, class) scope, and cached
+ongoing-session lists holding a recounted session, are evicted at the same
+time, and the optional status arrays of dirty sessions are updated.
+"""
+import threading
+from datetime import datetime
+from contextlib import contextmanager
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce, TruncDate
+
+from reports.cache import invalidate_report_scopes
+from .rollups import rebuild_daily_rollups, refresh_student_rollups
+from .status_arrays import rebuild_status_arrays, update_status_arrays
+from .summaries import rebuild_summaries, refresh_student_summaries
+
+_local = threading.local()
+
+
+def _scope():
+    if not hasattr(_local, 'depth'):
+        _local.depth = 0
+        _local.pending = {}
+    return _local
+
+
+def _transaction_batch():
+    """
+    {handler: keys} queued in the current transaction, flushed once when it commits.
+
+    The flush callback is dropped by Django when its transaction or savepoint
+    rolls back, in which case a new batch is started.
+    """
+    connection = transaction.get_connection()
+    batch, flush = getattr(_local, 'transaction_batch', (None, None))
+    if flush is None or not any(callback[1] is flush for callback in connection.run_on_commit):
+        batch = {}
+        flush = partial(_flush_transaction_batch, batch)
+        _local.transaction_batch = (batch, flush)
+        transaction.on_commit(flush)
+    return batch
+
+
+def _flush_transaction_batch(batch):
+    # Keys marked from here on belong to the next transaction
+    if getattr(_local, 'transaction_batch', (None,))[0] is batch:
+        del _local.transaction_batch
+    _run_handlers(batch)
+
+
+def _run_handlers(pending):
+    for handler, keys in pending.items():
+        handler(keys)
+
+
+def _queue(pending):
+    """Run the pending handlers when the current transaction commits (immediately in autocommit mode)"""
+    if not pending:
+        return
+    if not transaction.get_connection().in_atomic_block:
+        transaction.on_commit(partial(_run_handlers, pending))
+        return
+
+    batch = _transaction_batch()
+    for handler, keys in pending.items():
+        batch.setdefault(handler, set()).update(keys)
+
+
+def _defer(handler, key):
+    if key is None:
+        return
+
+    scope = _scope()
+    if scope.depth:
+        scope.pending.setdefault(handler, set()).add(key)
+    else:
+        # No deferred scope: keys saved in the same transaction are
+        # recomputed together when it commits
+        _queue({handler: {key}})
+
+
+def _day(value):
+    return value.date() if isinstance(value, datetime) else value
+
+
+def mark_session_dirty(session_id, scope=None, student_ids=None):
+    """
+    Queue a session for a statistics recount. Given the session's (date,
+    class) scope and the students whose records changed, only their rollups
+    and summaries are refreshed; otherwise the whole scope is.
+    """
+    _defer(recalculate_session_stats, session_id)
+    if scope is None or student_ids is None:
+        _defer(refresh_session_scopes, session_id)
+    else:
+        session_date, class_id = _day(scope[0]), scope[1]
+        for student_id in student_ids:
+            _defer(refresh_students, (session_date, class_id, student_id))
+    mark_session_statuses_changed(session_id)
+
+
+def mark_session_statuses_changed(session_id):
+    """Queue a rewrite of a session's byte in the status arrays of its class"""
+    if settings.ATTENDANCE_STATUS_ARRAYS:
+        _defer(update_status_arrays, session_id)
+
+
+def mark_class_sessions_changed(class_id):
+    """Queue a rebuild of a class's status arrays after the order of its sessions changed"""
+    if settings.ATTENDANCE_STATUS_ARRAYS:
+        _defer(rebuild_status_arrays, class_id)
+
+
+def mark_session_added(session):
+    """A new session shifts the status array positions unless it is the last of its class"""
+    if settings.ATTENDANCE_STATUS_ARRAYS and type(session).objects.filter(
+        class_session_id=session.class_session_id, session_date__gte=session.session_date
+    ).exclude(pk=session.pk).exists():
+        mark_class_sessions_changed(session.class_session_id)
+
+
+def mark_student_dirty(student_id):
+    """Queue a student for a last_attendance_date refresh"""
+    _defer(refresh_last_attendance_dates, student_id)
+
+
+def mark_scope_dirty(session_date, class_id):
+    """Queue a (date, class) scope for a rollup and summary rebuild"""
+    _defer(refresh_scopes, (_day(session_date), class_id))
+
+
+def mark_classes_reassigned(class_ids, instructor_ids):
+    """
+    Evict the cached reports and ongoing-session lists of classes whose
+    instructor changed, for their previous and new instructors. Rollups keep
+    the instructor recorded on each session and are not rebuilt.
+    """
+    from .active_sessions import invalidate_class_sessions
+    from .models import AttendanceSession
+
+    class_ids = set(class_ids)
+    scopes = set(AttendanceSession.objects.filter(
+        class_session_id__in=class_ids
+    ).values_list('session_date', 'class_session_id'))
+    transaction.on_commit(partial(invalidate_report_scopes, scopes))
+    transaction.on_commit(partial(invalidate_class_sessions, class_ids, set(instructor_ids)))
+
+
+@contextmanager
+def deferred_stats():
+    """Collect dirty sessions, students and (date, class) scopes and recompute them when the scope exits"""
+    scope = _scope()
+    scope.depth += 1
+    try:
+        yield
+    finally:
+        scope.depth -= 1
+        if not scope.depth:
+            flush_deferred_stats()
+
+
+def flush_deferred_stats():
+    """Recompute everything queued so far once the current transaction commits"""
+    scope = _scope()
+    pending, scope.pending = scope.pending, {}
+    _queue(pending)
+
+
+def recalculate_session_stats(session_ids):
+    """Recompute present/absent/late totals for the given sessions, in one UPDATE"""
+    from .active_sessions import invalidate_ongoing_sessions
+    from .models import AttendanceSession, AttendanceRecord
+
+    def total(status):
+        return Coalesce(Subquery(
+            AttendanceRecord.objects.filter(
+                session=OuterRef('pk'),
+                status=status
+            ).order_by().values('session').annotate(total=Count('id')).values('total')
+        ), 0)
+
+    AttendanceSession.objects.filter(id__in=session_ids).update(
+        total_present=total('present'),
+        total_absent=total('absent'),
+        total_late=total('late'),
+    )
+
+    # Cached ongoing-session lists carry these totals
+    invalidate_ongoing_sessions(session_ids)
+
+
+def refresh_last_attendance_dates(student_ids):
+    """Set Student.last_attendance_date to the latest present check-in, in one UPDATE"""
+    from .models import AttendanceRecord
+    from students.models import Student
+
+    last_present = AttendanceRecord.objects.filter(
+        student=OuterRef('pk'),
+        status='present',
+        check_in_time__isnull=False
+    ).order_by().values('student').annotate(
+        last_date=Max(TruncDate('check_in_time'))
+    ).values('last_date')
+
+    Student.objects.filter(id__in=student_ids).update(
+        last_attendance_date=Subquery(last_present)
+    )
+
+
+def refresh_session_scopes(session_ids):
+    """Refresh the (date, class) scopes touched by the given sessions"""
+    from .models import AttendanceSession
+
+    refresh_scopes(set(AttendanceSession.objects.filter(
+        id__in=session_ids
+    ).values_list('session_date', 'class_session_id')))
+
+
+def refresh_scopes(scopes):
+    """Rebuild the daily rollups and attendance summaries of (date, class) scopes and evict cached reports covering them"""
+    if scopes:
+        rebuild_daily_rollups(scopes)
+        rebuild_summaries(scopes)
+        invalidate_report_scopes(scopes)
+
+
+def refresh_students(keys):
+    """Refresh the rollups and summaries of the students in (date, class_id, student_id) keys and evict cached reports covering them"""
+    if keys:
+        refresh_student_rollups(keys)
+        refresh_student_summaries(keys)
+        invalidate_report_scopes({(session_date, class_id) for session_date, class_id, _ in keys})
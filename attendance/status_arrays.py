@@ -0,0 +1,213 @@
+# attendance/status_arrays.py
+"""
+Packed per-(student, class) attendance histories for analytics.
+
+Each AttendanceStatusArray holds one status code byte per session of the
+class, ordered by (session_date, start_time, id); 0 means the student has no
+record for that session, and trailing sessions without records may be left
+out. Rates, streaks and trends over a whole programme are then computed with
+bytes.count/translate/split, which run in C, instead of counting
+AttendanceRecord rows in SQL.
+
+Marking attendance updates the byte of each dirty session through the
+deferred stats flush. Creating a session before existing ones, deleting one
+or moving one to another date or class changes the positions, so the
+affected classes are rebuilt from their records instead.
+
+The store is only maintained when settings.ATTENDANCE_STATUS_ARRAYS is
+enabled; `manage.py rebuild_status_arrays` fills it for existing data.
+"""
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+STATUS_CODES = {
+    'present': 1,
+    'absent': 2,
+    'late': 3,
+    'excused': 4,
+    'half_day': 5,
+}
+
+ATTENDED_STATUSES = ('present', 'late', 'half_day')
+
+NO_RECORD = 0
+
+# Sessions per window of the rolling attendance trend
+TREND_WINDOW = 10
+
+
+def _translation(statuses):
+    """bytes.translate table mapping the codes of statuses to 1 and every other byte to 0"""
+    codes = {STATUS_CODES[status] for status in statuses}
+    return bytes(1 if byte in codes else 0 for byte in range(256))
+
+
+ATTENDED = _translation(ATTENDED_STATUSES)
+
+
+def class_sessions(class_id):
+    """(session_id, session_date) pairs of a class in array position order"""
+    from .models import AttendanceSession
+
+    return list(AttendanceSession.objects.filter(class_session_id=class_id).order_by(
+        'session_date', 'start_time', 'id'
+    ).values_list('id', 'session_date'))
+
+
+def rebuild_status_arrays(class_ids):
+    """Rebuild every status array of the given classes from their records"""
+    from .models import AttendanceRecord, AttendanceStatusArray
+
+    for class_id in class_ids:
+        positions = {session_id: index for index, (session_id, _) in enumerate(class_sessions(class_id))}
+        arrays = {}
+        for student_id, session_id, status in AttendanceRecord.objects.filter(
+            class_session_id=class_id
+        ).order_by().values_list('student_id', 'session_id', 'status').iterator():
+            statuses = arrays.setdefault(student_id, bytearray(len(positions)))
+            statuses[positions[session_id]] = STATUS_CODES.get(status, NO_RECORD)
+
+        with transaction.atomic():
+            AttendanceStatusArray.objects.filter(class_session_id=class_id).delete()
+            AttendanceStatusArray.objects.bulk_create([
+                AttendanceStatusArray(student_id=student_id, class_session_id=class_id, statuses=bytes(statuses))
+                for student_id, statuses in arrays.items()
+            ], batch_size=500)
+
+
+def update_status_arrays(session_ids):
+    """Rewrite the byte of each given session in the status arrays of its class"""
+    from .models import AttendanceRecord, AttendanceSession, AttendanceStatusArray
+
+    for session in AttendanceSession.objects.filter(id__in=session_ids):
+        date, start = session.session_date, session.start_time
+        position = AttendanceSession.objects.filter(class_session_id=session.class_session_id).filter(
+            Q(session_date__lt=date) |
+            Q(session_date=date, start_time__lt=start) |
+            Q(session_date=date, start_time=start, id__lt=session.id)
+        ).count()
+        codes = {
+            student_id: STATUS_CODES.get(status, NO_RECORD)
+            for student_id, status in AttendanceRecord.objects.filter(
+                session_id=session.id
+            ).values_list('student_id', 'status')
+        }
+
+        changed = []
+        now = timezone.now()
+        for array in AttendanceStatusArray.objects.filter(class_session_id=session.class_session_id):
+            code = codes.pop(array.student_id, NO_RECORD)
+            statuses = bytearray(array.statuses)
+            if position >= len(statuses):
+                if code == NO_RECORD:
+                    continue
+                statuses.extend(bytes(position + 1 - len(statuses)))
+            if statuses[position] != code:
+                statuses[position] = code
+                array.statuses = bytes(statuses)
+                array.updated_at = now
+                changed.append(array)
+
+        # Students marked in this class for the first time
+        created = []
+        for student_id, code in codes.items():
+            statuses = bytearray(position + 1)
+            statuses[position] = code
+            created.append(AttendanceStatusArray(
+                student_id=student_id, class_session_id=session.class_session_id, statuses=bytes(statuses)
+            ))
+
+        AttendanceStatusArray.objects.bulk_update(changed, ['statuses', 'updated_at'])
+        AttendanceStatusArray.objects.bulk_create(created)
+
+
+def class_status_arrays(class_id, student_ids=None):
+    """{student_id: statuses} for a class, optionally limited to some students"""
+    from .models import AttendanceStatusArray
+
+    arrays = AttendanceStatusArray.objects.filter(class_session_id=class_id)
+    if student_ids is not None:
+        arrays = arrays.filter(student_id__in=student_ids)
+    return {student_id: bytes(statuses) for student_id, statuses in arrays.values_list('student_id', 'statuses')}
+
+
+def status_counts(statuses):
+    """{status: count} for a status array or a slice of one"""
+    return {status: statuses.count(code) for status, code in STATUS_CODES.items()}
+
+
+def attendance_rate(statuses):
+    """Percentage of recorded sessions attended"""
+    recorded = len(statuses) - statuses.count(NO_RECORD)
+    attended = statuses.translate(ATTENDED).count(1)
+    return round(attended / recorded * 100, 1) if recorded else 0
+
+
+def longest_streak(statuses):
+    """Longest run of consecutive attended sessions"""
+    return max(map(len, statuses.translate(ATTENDED).split(b'\x00')), default=0)
+
+
+def current_streak(statuses):
+    """Attended sessions since the student last missed one, ignoring sessions not yet recorded"""
+    recorded = statuses.rstrip(b'\x00')
+    return len(recorded) - len(recorded.translate(ATTENDED).rstrip(b'\x01'))
+
+
+def rolling_rates(statuses, window):
+    """Attendance rate over each run of window consecutive sessions"""
+    if len(statuses) < window:
+        return []
+    attended = [0, *accumulate(statuses.translate(ATTENDED))]
+    recorded = [0, *accumulate(byte != NO_RECORD for byte in statuses)]
+    rates = []
+    for end in range(window, len(statuses) + 1):
+        total = recorded[end] - recorded[end - window]
+        rates.append(round((attended[end] - attended[end - window]) / total * 100, 1) if total else None)
+    return rates
+
+
+def programme_trend(statuses, window=TREND_WINDOW):
+    """
+    Streaks and rolling attendance rate over a student's whole programme.
+
+    recent_rate is the rate over the last window recorded sessions and trend
+    its change from the window before, in percentage points.
+    """
+    recorded = statuses.rstrip(bytes([NO_RECORD]))
+    rates = rolling_rates(recorded, window)
+    recent = rates[-1] if rates else None
+    previous = rates[-window - 1] if len(rates) > window else None
+    return {
+        'current_streak': current_streak(recorded),
+        'longest_streak': longest_streak(recorded),
+        'recent_rate': recent,
+        'trend': round(recent - previous, 1) if None not in (recent, previous) else None,
+    }
+
+
+def period_status_counts(class_id, start_date, end_date, student_ids=None):
+    """
+    {student_id: {'present_count': ..., 'last_attendance_date': ...}} for a period.
+
+    The counts match students.stats.annotate_enrollment_stats, read from the
+    slice of each array covering the period's sessions. The programme_trend
+    figures of the whole array are included as well.
+    """
+    sessions = class_sessions(class_id)
+    dates = [session_date for _, session_date in sessions]
+    first, last = bisect_left(dates, start_date), bisect_right(dates, end_date)
+
+    stats = {}
+    for student_id, statuses in class_status_arrays(class_id, student_ids).items():
+        period = statuses[first:last]
+        counts = {f'{status}_count': count for status, count in status_counts(period).items()}
+        attended_at = period.translate(ATTENDED).rfind(1)
+        counts['last_attendance_date'] = dates[first + attended_at] if attended_at >= 0 else None
+        counts.update(programme_trend(statuses))
+        stats[student_id] = counts
+    return stats
@@ -0,0 +1,206 @@
+# attendance/summaries.py
+"""
+Maintenance of the AttendanceSummary table.
+
+Summaries are recomputed per class from a single grouped aggregate over the
+affected periods' attendance records and upserted in one statement. When a
+record changes only its student's weekly and monthly rows are recomputed;
+moved or deleted sessions rebuild the rows of every student in their
+(date, class) scope. The period after a recomputed one gets its
+previous_period_rate and trend refreshed.
+"""
+import calendar
+from collections import Counter, defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Q
+
+PERIOD_TYPES = ('weekly', 'monthly')
+
+SUMMARY_FIELDS = [
+    'period_end', 'total_sessions', 'present_count', 'absent_count',
+    'late_count', 'excused_count', 'attendance_rate', 'punctuality_rate',
+    'previous_period_rate', 'trend', 'updated_at',
+]
+
+
+def period_bounds(day, period_type):
+    """Return the (start, end) dates of the weekly or monthly period containing a day"""
+    if period_type == 'weekly':
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=6)
+    start = day.replace(day=1)
+    return start, day.replace(day=calendar.monthrange(day.year, day.month)[1])
+
+
+def previous_period_start(period_start, period_type):
+    """Return the start date of the period before the one starting on period_start"""
+    return period_bounds(period_start - timedelta(days=1), period_type)[0]
+
+
+def _rate(part, whole):
+    if not whole:
+        return Decimal('0.00')
+    return Decimal(min(max(part, 0), whole) * 100 / whole).quantize(Decimal('0.01'))
+
+
+def punctuality_rate(present, late):
+    """Share of arrivals that were on time; late records are counted apart from present ones"""
+    return _rate(present, present + late)
+
+
+def _next_period_start(period_start, period_type):
+    return period_bounds(period_bounds(period_start, period_type)[1] + timedelta(days=1), period_type)[0]
+
+
+def _trend(rate, previous):
+    if previous is None or rate == previous:
+        return 'stable'
+    return 'up' if rate > previous else 'down'
+
+
+def refresh_class_summaries(class_id, periods, student_ids=None):
+    """
+    Recompute the summaries of one class for (period_type, period_start)
+    periods, limited to student_ids when given, and carry the new rates into
+    the previous_period_rate and trend of the period after each one.
+    Returns the number of rows written or deleted.
+    """
+    from .models import AttendanceRecord, AttendanceSummary
+
+    # Oldest periods first so that trends compare against fresh rates
+    periods = sorted({(period_bounds(start, period_type)[0], period_type) for period_type, start in periods})
+    students = Q() if student_ids is None else Q(student_id__in=student_ids)
+
+    ranges = Q()
+    neighbours = Q()
+    for start, period_type in periods:
+        ranges |= Q(session_date__range=period_bounds(start, period_type))
+        neighbours |= Q(period_type=period_type, period_start__in=[
+            previous_period_start(start, period_type), start, _next_period_start(start, period_type),
+        ])
+
+    counts = defaultdict(Counter)
+    rows = AttendanceRecord.objects.filter(students, ranges, class_session_id=class_id).order_by().values(
+        'student_id', 'session_date', 'status'
+    ).annotate(total=Count('id'))
+    for row in rows:
+        for period_type in PERIOD_TYPES:
+            key = (row['student_id'], period_type, period_bounds(row['session_date'], period_type)[0])
+            counts[key][row['status']] += row['total']
+
+    existing = {
+        (summary.student_id, summary.period_type, summary.period_start): summary
+        for summary in AttendanceSummary.objects.filter(students, neighbours, class_session_id=class_id)
+    }
+    rates = {key: summary.attendance_rate for key, summary in existing.items()}
+    if student_ids is None:
+        student_ids = {key[0] for key in counts} | {key[0] for key in existing}
+
+    summaries, stale = [], []
+    for start, period_type in periods:
+        end = period_bounds(start, period_type)[1]
+        for student_id in sorted(student_ids):
+            key = (student_id, period_type, start)
+            status_counts = counts.get(key)
+            if not status_counts:
+                # Students whose records in the period are all gone lose their row
+                if key in existing:
+                    stale.append(existing[key].id)
+                rates.pop(key, None)
+                continue
+
+            summary = AttendanceSummary(
+                student_id=student_id,
+                class_session_id=class_id,
+                period_type=period_type,
+                period_start=start,
+                period_end=end,
+                total_sessions=sum(status_counts.values()),
+                present_count=status_counts['present'],
+                absent_count=status_counts['absent'],
+                late_count=status_counts['late'],
+                excused_count=status_counts['excused'],
+            )
+            summary.attendance_rate = _rate(summary.present_count, summary.total_sessions)
+            summary.punctuality_rate = punctuality_rate(summary.present_count, summary.late_count)
+
+            previous = rates.get((student_id, period_type, previous_period_start(start, period_type)))
+            summary.previous_period_rate = previous if previous is not None else Decimal('0.00')
+            summary.trend = _trend(summary.attendance_rate, previous)
+            rates[key] = summary.attendance_rate
+            summaries.append(summary)
+
+    # The period after a recomputed one compares against its new rate; its
+    # rows join the same upsert
+    following = []
+    for start, period_type in periods:
+        next_start = _next_period_start(start, period_type)
+        if (next_start, period_type) in periods:
+            continue
+        for student_id in student_ids:
+            summary = existing.get((student_id, period_type, next_start))
+            if summary is None:
+                continue
+            previous = rates.get((student_id, period_type, start))
+            previous_rate = previous if previous is not None else Decimal('0.00')
+            trend = _trend(summary.attendance_rate, previous)
+            if (summary.previous_period_rate, summary.trend) != (previous_rate, trend):
+                summary.id, summary.previous_period_rate, summary.trend = None, previous_rate, trend
+                following.append(summary)
+
+    with transaction.atomic():
+        if stale:
+            AttendanceSummary.objects.filter(id__in=stale).delete()
+        AttendanceSummary.objects.bulk_create(
+            summaries + following,
+            update_conflicts=True,
+            unique_fields=['student', 'class_session', 'period_type', 'period_start'],
+            update_fields=SUMMARY_FIELDS,
+        )
+    return len(summaries) + len(stale) + len(following)
+
+
+def _periods_by_class(keys):
+    periods = defaultdict(set)
+    for session_date, class_id, *_ in keys:
+        for period_type in PERIOD_TYPES:
+            periods[class_id].add((period_type, period_bounds(session_date, period_type)[0]))
+    return periods
+
+
+def rebuild_summaries(scopes):
+    """Rebuild the weekly and monthly summaries of every student in the given (date, class_id) scopes"""
+    return sum(
+        refresh_class_summaries(class_id, periods)
+        for class_id, periods in _periods_by_class(scopes).items()
+    )
+
+
+def refresh_student_summaries(keys):
+    """Recompute only the weekly and monthly summaries of the students in (date, class_id, student_id) keys"""
+    students = defaultdict(set)
+    for _, class_id, student_id in keys:
+        students[class_id].add(student_id)
+    return sum(
+        refresh_class_summaries(class_id, periods, students[class_id])
+        for class_id, periods in _periods_by_class(keys).items()
+    )
+
+
+def rebuild_summaries_for_range(start_date, end_date):
+    """Rebuild every summary whose period overlaps two dates, one month at a time"""
+    from .models import AttendanceSession
+
+    built = 0
+    month_start = period_bounds(start_date, 'monthly')[0]
+    while month_start <= end_date:
+        month_end = period_bounds(month_start, 'monthly')[1]
+        scopes = AttendanceSession.objects.filter(
+            session_date__range=[month_start, month_end]
+        ).order_by().values_list('session_date', 'class_session_id').distinct()
+        built += rebuild_summaries(scopes)
+        month_start = month_end + timedelta(days=1)
+    return built
@@ -1,3 +1,733 @@
-from django.test import TestCase
+import csv
+import json
+from datetime import date, time, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import AnonymousUser, Permission
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.context_processors import active_session
+from students.models import Student
+from tvet_attendance.testing import QueryBudgetTestMixin, create_class, create_course, create_session, create_student, create_user
+from . import active_sessions, rollups, services, stats, status_arrays, summaries
+from .middleware import SessionStatsMiddleware
+from .models import AttendanceRecord, AttendanceSession, AttendanceSummary, DailyAttendanceRollup, ExcuseApplication
+
+
+class AttendanceFixture:
+    """A class of three enrolled students with one session yesterday"""
+
+    def setUp(self):
+        for alias in caches:
+            caches[alias].clear()
+        self.today = date.today()
+        self.instructor = create_user('instructor', 'instructor')
+        self.course = create_course()
+        self.class_obj = create_class(self.course, self.instructor)
+        self.students = [
+            create_student(self.course, f'ADM{index:03}', self.class_obj) for index in range(3)
+        ]
+        self.session = create_session(self.class_obj, self.today - timedelta(days=1))
+
+    def mark(self, student, status='present', session=None):
+        return AttendanceRecord.objects.create(session=session or self.session, student=student, status=status)
+
+
+class AttendanceTestCase(AttendanceFixture, TestCase):
+    pass
+
+
+class DeferredStatsTests(AttendanceTestCase):
+    """Dirty sessions and students are recomputed once per scope or transaction"""
+
+    def test_saves_in_one_request_are_recounted_once(self):
+        def view(request):
+            for student in self.students:
+                self.mark(student)
+            return HttpResponse()
+
+        with mock.patch.object(stats, 'recalculate_session_stats', wraps=stats.recalculate_session_stats) as recount:
+            with self.captureOnCommitCallbacks(execute=True):
+                SessionStatsMiddleware(view)(RequestFactory().get('/'))
+
+        recount.assert_called_once_with({self.session.id})
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.total_present, 3)
+
+    def test_saves_in_one_transaction_are_batched(self):
+        with mock.patch.object(stats, 'refresh_last_attendance_dates') as refresh:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                with transaction.atomic():
+                    for student in self.students:
+                        self.mark(student)
+
+        self.assertEqual(len(callbacks), 1)
+        refresh.assert_called_once_with({student.id for student in self.students})
+
+    def test_keys_are_deduplicated(self):
+        with mock.patch.object(stats, 'recalculate_session_stats') as recount:
+            with self.captureOnCommitCallbacks(execute=True):
+                record = self.mark(self.students[0])
+                record.status = 'late'
+                record.save()
+                self.mark(self.students[1])
+
+        recount.assert_called_once_with({self.session.id})
+
+    def test_rolled_back_saves_are_not_recomputed(self):
+        with mock.patch.object(stats, 'recalculate_session_stats') as recount:
+            with self.captureOnCommitCallbacks(execute=True):
+                with self.assertRaises(RuntimeError), transaction.atomic():
+                    self.mark(self.students[0])
+                    raise RuntimeError
+            recount.assert_not_called()
+
+            # The next transaction starts a new batch
+            with self.captureOnCommitCallbacks(execute=True):
+                self.mark(self.students[1])
+        recount.assert_called_once_with({self.session.id})
+
+
+class BulkMarkAttendanceTests(AttendanceTestCase):
+    """bulk_mark_attendance writes a whole class with a fixed number of queries"""
+
+    def test_creates_updates_and_rejects(self):
+        outsider = create_student(self.course, 'ADM999')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.mark(self.students[0], 'absent')
+            result = services.bulk_mark_attendance(self.session, {
+                str(self.students[0].id): 'late',
+                str(self.students[1].id): 'present',
+                str(self.students[2].id): 'unknown',
+                str(outsider.id): 'present',
+                'abc': 'present',
+            }, self.instructor)
+
+        self.assertEqual((result['created'], result['updated']), (1, 1))
+        self.assertEqual(result['rejected'], {
+            str(self.students[2].id): 'Invalid status',
+            str(outsider.id): 'Not enrolled in this class',
+            'abc': 'Invalid student id',
+        })
+        late = AttendanceRecord.objects.get(session=self.session, student=self.students[0])
+        self.assertEqual(late.status, 'late')
+        self.assertIsNotNone(late.check_in_time)
+        self.assertEqual(late.class_session_id, self.class_obj.id)
+        self.session.refresh_from_db()
+        self.assertEqual((self.session.total_present, self.session.total_late), (1, 1))
+
+    def test_query_count_does_not_grow_with_the_class(self):
+        def mark_all(session, students):
+            self.mark(students[0], 'absent', session=session)
+            with CaptureQueriesContext(connection) as queries:
+                services.bulk_mark_attendance(
+                    session, {student.id: 'present' for student in students}, self.instructor
+                )
+            return len(queries)
+
+        few = mark_all(self.session, self.students[:2])
+        for index in range(3, 10):
+            self.students.append(create_student(self.course, f'ADM{index:03}', self.class_obj))
+        self.assertEqual(mark_all(create_session(self.class_obj, self.today), self.students), few)
+
+
+class MaterialiseRosterTests(AttendanceTestCase):
+    """create_session pre-populates an absent record per active enrollment in one insert"""
+
+    def setUp(self):
+        super().setUp()
+        self.instructor.user_permissions.add(Permission.objects.get(codename='add_attendancesession'))
+        self.client.force_login(self.instructor)
+
+    def create_session(self, session_date):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('attendance:create_session'), {
+                'class_session': self.class_obj.id,
+                'session_date': session_date.isoformat(),
+                'start_time': '08:00',
+                'end_time': '10:00',
+                'topic_covered': 'Intro',
+                'venue': 'Lab',
+                'attendance_method': 'manual',
+            })
+        self.assertEqual(response.status_code, 302)
+        return AttendanceSession.objects.get(class_session=self.class_obj, session_date=session_date), len(queries)
+
+    def test_roster_is_materialised(self):
+        self.class_obj.enrollments.filter(student=self.students[2]).update(is_active=False)
+
+        session, _ = self.create_session(self.today)
+
+        self.assertEqual(
+            sorted(session.attendance_records.values_list('student_id', 'status', 'session_date')),
+            [(student.id, 'absent', self.today) for student in self.students[:2]]
+        )
+        self.assertEqual((session.total_present, session.total_absent), (0, 2))
+
+    def test_query_count_does_not_grow_with_the_roster(self):
+        _, few = self.create_session(self.today)
+        for index in range(3, 10):
+            create_student(self.course, f'ADM{index:03}', self.class_obj)
+
+        session, many = self.create_session(self.today + timedelta(days=1))
+
+        self.assertEqual(session.attendance_records.count(), 10)
+        self.assertEqual(many, few)
+
+    def test_create_daily_sessions(self):
+        monday = self.today + timedelta(days=7 - self.today.weekday())
+
+        call_command('create_daily_sessions', date=monday.isoformat(), stdout=StringIO())
+        call_command('create_daily_sessions', date=monday.isoformat(), stdout=StringIO())
+
+        session = AttendanceSession.objects.get(class_session=self.class_obj, session_date=monday)
+        self.assertEqual((session.start_time, session.end_time), (time(8), time(10)))
+        self.assertEqual(session.attendance_records.filter(status='absent').count(), 3)
+
+
+class SessionFieldCopyTests(AttendanceTestCase):
+    """Records keep copies of their session's date and class in step with the session"""
+
+    def fields(self):
+        return set(AttendanceRecord.objects.values_list('session_date', 'class_session_id'))
+
+    def test_records_copy_their_session(self):
+        self.mark(self.students[0])
+        services.bulk_mark_attendance(self.session, {str(self.students[1].id): 'late'}, self.instructor)
+
+        self.assertEqual(self.fields(), {(self.session.session_date, self.class_obj.id)})
+
+    def test_moving_a_session_moves_its_records(self):
+        for student in self.students:
+            self.mark(student)
+        other_class = create_class(self.course, self.instructor)
+
+        session = AttendanceSession.objects.get(pk=self.session.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            session.session_date = self.today
+            session.class_session = other_class
+            session.save()
+
+        self.assertEqual(self.fields(), {(self.today, other_class.id)})
+        # Reports filtering on the copies follow the move
+        self.assertEqual(AttendanceRecord.objects.filter(session_date=self.today, class_session=other_class).count(), 3)
+
+
+class LastAttendanceDateTests(AttendanceTestCase):
+    """Student.last_attendance_date follows the latest present check-in"""
+
+    def test_follows_present_check_ins(self):
+        student, absentee = self.students[:2]
+        earlier = create_session(self.class_obj, self.today - timedelta(days=3))
+        check_in = timezone.now() - timedelta(days=1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            AttendanceRecord.objects.create(
+                session=earlier, student=student, status='present', check_in_time=check_in - timedelta(days=2)
+            )
+            latest = AttendanceRecord.objects.create(
+                session=self.session, student=student, status='present', check_in_time=check_in
+            )
+            self.mark(absentee, 'absent')
+        student.refresh_from_db()
+        absentee.refresh_from_db()
+        self.assertEqual(student.last_attendance_date, check_in.date())
+        self.assertIsNone(absentee.last_attendance_date)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            latest.delete()
+        student.refresh_from_db()
+        self.assertEqual(student.last_attendance_date, (check_in - timedelta(days=2)).date())
+
+    def test_saving_a_record_does_not_save_the_student(self):
+        with mock.patch.object(Student, 'save') as save:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.mark(self.students[0], 'present')
+        save.assert_not_called()
+
+
+class DailyRollupTests(AttendanceTestCase):
+    """DailyAttendanceRollup follows the records of each (date, class) scope"""
+
+    def rollups(self):
+        return sorted(DailyAttendanceRollup.objects.values_list('date', 'instructor_id', 'status', 'count'))
+
+    def test_rollups_follow_marking_and_session_moves(self):
+        yesterday = self.session.session_date
+        with self.captureOnCommitCallbacks(execute=True):
+            self.mark(self.students[0], 'present')
+            self.mark(self.students[1], 'late')
+        self.assertEqual(self.rollups(), [
+            (yesterday, self.instructor.id, 'late', 1),
+            (yesterday, self.instructor.id, 'present', 1),
+        ])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.session.session_date = self.today
+            self.session.save()
+        self.assertEqual([row[0] for row in self.rollups()], [self.today, self.today])
+
+    def test_a_mark_writes_only_its_students_rows(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for student in self.students:
+                self.mark(student, 'present')
+        untouched = set(DailyAttendanceRollup.objects.exclude(student=self.students[0]).values_list('id', 'count'))
+
+        def save(record):
+            written = []
+            with mock.patch.object(stats, 'refresh_student_rollups', lambda keys: written.append(
+                rollups.refresh_student_rollups(keys)
+            )):
+                with self.captureOnCommitCallbacks(execute=True):
+                    record.save()
+            return written
+
+        # The student's present row is deleted and a late row is inserted
+        record = AttendanceRecord.objects.get(student=self.students[0])
+        record.status = 'late'
+        self.assertEqual(save(record), [2])
+        self.assertEqual(set(DailyAttendanceRollup.objects.exclude(student=self.students[0]).values_list('id', 'count')), untouched)
+        self.assertEqual(list(DailyAttendanceRollup.objects.filter(student=self.students[0]).values_list('status', 'count')), [('late', 1)])
+
+        # Saving an unchanged record writes nothing
+        self.assertEqual(save(record), [0])
+
+    def test_reassigning_a_session_moves_its_rollups(self):
+        substitute = create_user('substitute', 'instructor')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.mark(self.students[0], 'present')
+
+        session = AttendanceSession.objects.get(pk=self.session.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            session.instructor = substitute
+            session.save()
+
+        self.assertEqual(self.rollups(), [(session.session_date, substitute.id, 'present', 1)])
+
+    def test_bulk_class_reassignment_evicts_cached_sessions(self):
+        substitute = create_user('substitute', 'instructor')
+        admin = create_user('admin', 'admin', is_staff=True)
+        AttendanceSession.objects.filter(pk=self.session.pk).update(status='ongoing')
+        self.assertEqual(active_sessions._ongoing_sessions(substitute), [])
+
+        self.client.force_login(admin)
+        with mock.patch.object(stats, 'invalidate_report_scopes') as invalidate_reports:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(reverse('courses:bulk_assign_instructors'), {
+                    'instructor': substitute.id, 'class_ids': [self.class_obj.id],
+                })
+
+        invalidate_reports.assert_called_once_with({(self.session.session_date, self.class_obj.id)})
+        self.assertEqual(len(active_sessions._ongoing_sessions(substitute)), 1)
+
+
+class ActiveSessionsTests(AttendanceTestCase):
+    """Ongoing sessions are loaded once per request, by one set of visibility rules"""
+
+    def setUp(self):
+        super().setUp()
+        self.other_instructor = create_user('other', 'instructor')
+        self.other_class = create_class(self.course, self.other_instructor)
+        self.ongoing = create_session(self.class_obj, self.today, status='ongoing')
+        # Run by this class's instructor as a substitute in another class
+        self.covering = create_session(self.other_class, self.today, time(11), status='ongoing',
+                                       instructor_id=self.instructor.id)
+        self.other = create_session(self.other_class, self.today, time(14), status='ongoing')
+        Student.objects.filter(id=self.students[0].id).update(current_class=self.class_obj)
+
+    def request(self, user=None):
+        request = RequestFactory().get('/')
+        request.user = user or AnonymousUser()
+        return request
+
+    def test_visibility(self):
+        admin = create_user('admin', 'admin', is_staff=True)
+        cases = [
+            (self.instructor, [self.covering, self.ongoing]),
+            (self.other_instructor, [self.other, self.covering]),
+            (self.students[0].user, [self.ongoing]),
+            (admin, [self.other, self.covering, self.ongoing]),
+            (create_user('unplaced'), []),
+            (None, []),
+        ]
+        for user, expected in cases:
+            with self.subTest(user=user):
+                self.assertEqual(active_sessions.active_sessions_for(self.request(user)), expected)
+
+    def test_sessions_are_loaded_once_per_request(self):
+        request = self.request(self.instructor)
+        context = active_session(request)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(context['active_sessions_count'](), 2)
+            self.assertEqual(context['active_session'](), self.covering)
+            self.assertEqual(context['recent_sessions'](), [self.covering, self.ongoing])
+
+    def test_pages_without_active_sessions_run_no_session_queries(self):
+        self.client.force_login(self.instructor)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('profile'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([query for query in queries if 'attendance_attendancesession' in query['sql']])
+
+
+class OngoingSessionCacheTests(AttendanceTestCase):
+    """Ongoing-session lists are cached across requests and evicted when their sessions change"""
+
+    def setUp(self):
+        super().setUp()
+        self.admin = create_user('admin', 'admin', is_staff=True)
+        self.student = self.students[0]
+        Student.objects.filter(id=self.student.id).update(current_class=self.class_obj)
+        self.ongoing = create_session(self.class_obj, self.today, status='ongoing')
+
+    def lists(self):
+        return [
+            active_sessions._ongoing_sessions(user) for user in (self.instructor, self.student.user, self.admin)
+        ]
+
+    def test_lists_are_cached_across_requests(self):
+        self.lists()
+
+        # Only the student's current class is looked up again
+        with self.assertNumQueries(1):
+            self.assertEqual(self.lists(), [[self.ongoing]] * 3)
+
+    def test_closing_a_session_evicts_its_lists(self):
+        self.lists()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ongoing.status = 'completed'
+            self.ongoing.save()
+
+        self.assertEqual(self.lists(), [[], [], []])
+
+    def test_recounts_refresh_the_cached_totals(self):
+        self.lists()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.mark(self.student, session=self.ongoing)
+
+        self.assertEqual([sessions[0].total_present for sessions in self.lists()], [1, 1, 1])
+
+    def test_changing_a_class_instructor_moves_its_sessions(self):
+        substitute = create_user('substitute', 'instructor')
+        self.assertEqual(active_sessions._ongoing_sessions(substitute), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.class_obj.instructor = substitute
+            self.class_obj.save()
+
+        self.assertEqual(active_sessions._ongoing_sessions(substitute), [self.ongoing])
+
+
+class QueryPlanTests(TestCase):
+    """check_query_plans passes with the attendance indexes and fails on a full scan"""
+
+    def test_hot_queries_use_indexes(self):
+        output = StringIO()
+        call_command('check_query_plans', stdout=output)
+
+        self.assertIn('No hot query does a full scan', output.getvalue())
+
+    def test_full_scans_fail(self):
+        queries = [('records by remark', AttendanceRecord.objects.filter(remarks='late bus'))]
+        output = StringIO()
+
+        with mock.patch('attendance.management.commands.check_query_plans.hot_queries', return_value=queries):
+            with self.assertRaisesMessage(CommandError, '1 of the hot queries do a full scan'):
+                call_command('check_query_plans', stdout=output)
+        self.assertIn('FULL SCAN  records by remark: attendance_attendancerecord', output.getvalue())
+
+    def test_sorted_exports_fail(self):
+        queries = [('export records by admission number', AttendanceRecord.objects.filter(
+            session_date=date.today()
+        ).order_by('session_date', 'student__admission_number'))]
+        output = StringIO()
+
+        with mock.patch('attendance.management.commands.check_query_plans.export_queries', return_value=queries):
+            with self.assertRaisesMessage(CommandError, '1 of the hot queries do a full scan or a sort'):
+                call_command('check_query_plans', stdout=output)
+        self.assertIn('SORT       export records by admission number', output.getvalue())
+
+
+@override_settings(ATTENDANCE_STATUS_ARRAYS=True)
+class StatusArrayTests(AttendanceTestCase):
+    """Incrementally maintained status arrays always equal a rebuild from the records"""
+
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.mark(self.students[0], 'present')
+        status_arrays.rebuild_status_arrays([self.class_obj.id])
+
+    def arrays(self):
+        # Trailing sessions without records may be left out of incrementally grown arrays
+        arrays = status_arrays.class_status_arrays(self.class_obj.id)
+        return {student_id: statuses.rstrip(b'\x00') for student_id, statuses in arrays.items()}
+
+    def assertArraysMatchRebuild(self):
+        incremental = self.arrays()
+        status_arrays.rebuild_status_arrays([self.class_obj.id])
+        self.assertEqual(incremental, self.arrays())
+
+    def new_session(self, session_date, start=time(8)):
+        with self.captureOnCommitCallbacks(execute=True):
+            session = create_session(self.class_obj, session_date, start)
+            services.materialise_roster(session)
+        return session
+
+    def test_incremental_updates_match_a_rebuild(self):
+        # Appended session: only its byte is written
+        with mock.patch.object(stats, 'rebuild_status_arrays') as rebuild:
+            last = self.new_session(self.today)
+        rebuild.assert_not_called()
+        self.assertEqual(self.arrays()[self.students[1].id], bytes([0, status_arrays.STATUS_CODES['absent']]))
+        self.assertArraysMatchRebuild()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            services.bulk_mark_attendance(last, {
+                str(self.students[0].id): 'late', str(self.students[1].id): 'present',
+            }, self.instructor)
+            self.mark(self.students[2], 'excused', session=self.session)
+        self.assertArraysMatchRebuild()
+
+        # Inserted before existing sessions, moved and deleted: the class is rebuilt
+        self.new_session(self.today - timedelta(days=2))
+        self.assertArraysMatchRebuild()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            last.session_date = self.today - timedelta(days=3)
+            last.save()
+        self.assertArraysMatchRebuild()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            AttendanceSession.objects.get(pk=self.session.pk).delete()
+        self.assertArraysMatchRebuild()
+
+    def test_figures(self):
+        code = status_arrays.STATUS_CODES
+        statuses = bytes([code['present'], code['present'], code['absent'], code['late'], code['half_day'], 0])
+
+        self.assertEqual(status_arrays.attendance_rate(statuses), 80.0)
+        self.assertEqual((status_arrays.current_streak(statuses), status_arrays.longest_streak(statuses)), (2, 2))
+        self.assertEqual(status_arrays.rolling_rates(statuses[:5], 2), [100.0, 50.0, 50.0, 100.0])
+        self.assertEqual(status_arrays.programme_trend(statuses, window=2), {
+            'current_streak': 2, 'longest_streak': 2, 'recent_rate': 100.0, 'trend': 50.0,
+        })
+
+    def test_students_by_class_reads_the_arrays(self):
+        session = self.new_session(self.today)
+        with self.captureOnCommitCallbacks(execute=True):
+            services.bulk_mark_attendance(session, {str(self.students[0].id): 'late'}, self.instructor)
+        self.client.force_login(self.instructor)
+        url = reverse('students:students_by_class', args=[self.class_obj.id])
+
+        def figures(response):
+            return [
+                (enrollment.student_id, enrollment.present_count, enrollment.late_count, enrollment.absent_count,
+                 enrollment.last_attendance_date)
+                for enrollment in response.context['enrollments']
+            ]
+
+        response = self.client.get(url)
+        with override_settings(ATTENDANCE_STATUS_ARRAYS=False):
+            self.assertEqual(figures(response), figures(self.client.get(url)))
+        first = next(
+            enrollment for enrollment in response.context['enrollments'] if enrollment.student_id == self.students[0].id
+        )
+        self.assertEqual((first.current_streak, first.longest_streak), (2, 2))
+        self.assertContains(response, 'Streak 2 (best 2)')
+
+
+class AttendanceSummaryTests(AttendanceTestCase):
+    """Weekly and monthly summaries are rebuilt when attendance changes"""
+
+    def test_summaries_follow_marking(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.mark(self.students[0], 'present')
+            self.mark(self.students[0], 'late', session=create_session(self.class_obj, self.session.session_date, time(11)))
+            self.mark(self.students[1], 'late')
+
+        summary = AttendanceSummary.objects.get(student=self.students[0], period_type='monthly')
+        self.assertEqual((summary.total_sessions, summary.present_count, summary.late_count), (2, 1, 1))
+        self.assertEqual(summary.attendance_rate, Decimal('50.00'))
+        self.assertEqual(summary.punctuality_rate, Decimal('50.00'))
+        self.assertEqual(AttendanceSummary.objects.filter(student=self.students[0], period_type='weekly').count(), 1)
+
+        # Late without any present record is 0% punctual, never negative
+        late_only = AttendanceSummary.objects.get(student=self.students[1], period_type='monthly')
+        self.assertEqual(late_only.punctuality_rate, Decimal('0.00'))
+
+    def test_a_mark_rewrites_only_that_students_rows(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for student in self.students:
+                self.mark(student, 'present')
+        before = dict(AttendanceSummary.objects.values_list('id', 'updated_at'))
+
+        record = AttendanceRecord.objects.get(student=self.students[0])
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                record.status = 'absent'
+                record.save()
+
+        rewritten = AttendanceSummary.objects.filter(id__in=[
+            summary_id for summary_id, updated_at in AttendanceSummary.objects.values_list('id', 'updated_at')
+            if before.get(summary_id) != updated_at
+        ])
+        self.assertEqual(sorted(rewritten.values_list('student_id', 'period_type')), [
+            (self.students[0].id, 'monthly'), (self.students[0].id, 'weekly'),
+        ])
+        self.assertEqual(rewritten.get(period_type='weekly').attendance_rate, Decimal('0.00'))
+        # One read of the existing rows and one upsert, for both periods
+        self.assertEqual(len([query for query in queries if 'attendance_attendancesummary' in query['sql']]), 2)
+
+    def test_the_next_period_follows_an_earlier_mark(self):
+        last_week = create_session(self.class_obj, self.session.session_date - timedelta(days=7))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.mark(self.students[0], 'present')
+        this_week = AttendanceSummary.objects.get(student=self.students[0], period_type='weekly')
+        self.assertEqual((this_week.previous_period_rate, this_week.trend), (Decimal('0.00'), 'stable'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.mark(self.students[0], 'absent', session=last_week)
+
+        this_week.refresh_from_db()
+        self.assertEqual((this_week.previous_period_rate, this_week.trend), (Decimal('0.00'), 'up'))
+
+    def test_punctuality_rate(self):
+        self.assertEqual(summaries.punctuality_rate(3, 1), Decimal('75.00'))
+        self.assertEqual(summaries.punctuality_rate(0, 0), Decimal('0.00'))
+        self.assertEqual(summaries.punctuality_rate(0, 4), Decimal('0.00'))
+
+
+class CSVExportTests(AttendanceTestCase):
+    """export_attendance_report streams one CSV row per record from values_list rows"""
+
+    def export(self):
+        self.client.force_login(self.instructor)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('attendance:export_report'), {
+                'start_date': self.session.session_date.isoformat(), 'end_date': self.today.isoformat(),
+            })
+            content = b''.join(response.streaming_content).decode()
+        self.assertIsInstance(response, StreamingHttpResponse)
+        return list(csv.reader(StringIO(content))), len(queries)
+
+    def test_rows(self):
+        check_in = timezone.now().replace(hour=8, minute=5, second=0, microsecond=0)
+        AttendanceRecord.objects.create(
+            session=self.session, student=self.students[0], status='late',
+            check_in_time=check_in, marked_by=self.instructor, remarks='x' * 60,
+        )
+        self.mark(self.students[1], 'absent')
+
+        rows, _ = self.export()
+
+        self.assertEqual(rows[0], [
+            'Date', 'Class', 'Admission No', 'Student Name', 'Status', 'Check-in Time', 'Marked By', 'Remarks'
+        ])
+        self.assertEqual(rows[1], [
+            self.session.session_date.isoformat(), self.class_obj.class_code, 'ADM000',
+            self.students[0].user.get_full_name(), 'Late', check_in.strftime('%H:%M:%S'),
+            self.instructor.get_full_name(), 'x' * 50,
+        ])
+        self.assertEqual(rows[2][4:7], ['Absent', 'N/A', 'System'])
+
+    def test_query_count_does_not_grow_with_the_export(self):
+        for student in self.students:
+            self.mark(student)
+        few_rows, few = self.export()
+
+        for index in range(3, 10):
+            self.mark(create_student(self.course, f'ADM{index:03}', self.class_obj))
+        many_rows, many = self.export()
+
+        self.assertEqual((len(few_rows), len(many_rows)), (4, 11))
+        self.assertEqual(many, few)
+
+
+# Budgeted views that fail before their query count means anything
+BROKEN_VIEWS = {
+    'attendance:qr_attendance': "qr_attendance.html reverses the missing 'attendance:student_dashboard'",
+    'attendance:view_qr': 'attendance/view_qr.html does not exist',
+    'attendance:student_history': "redirects to the unnamed 'dashboard' URL",
+    'attendance:student_history_by_id': "redirects to the unnamed 'dashboard' URL",
+}
+
+
+class QueryBudgetTests(QueryBudgetTestMixin, AttendanceFixture, TransactionTestCase):
+    """Budgeted attendance views run a fixed number of queries whatever the class size"""
+
+    def setUp(self):
+        super().setUp()
+        self.admin = create_user('admin', 'admin', is_staff=True, is_superuser=True)
+        self.instructor.user_permissions.add(Permission.objects.get(codename='add_attendancesession'))
+        self.grow(self.students, time(12))
+
+    def grow(self, students, start):
+        """Mark and excuse students in both the current and a new session"""
+        session = create_session(self.class_obj, self.today, start)
+        for student in students:
+            self.mark(student, 'present')
+            self.mark(student, 'late', session=session)
+            ExcuseApplication.objects.create(
+                student=student, class_session=self.class_obj, attendance_session=self.session,
+                reason='Sick', start_date=self.today, end_date=self.today,
+            )
+
+    def requests(self, session_date):
+        student = self.students[0]
+        record = AttendanceRecord.objects.get(session=self.session, student=student)
+        return [
+            (self.instructor, 'get', 'attendance:dashboard', [], {}),
+            (self.instructor, 'get', 'attendance:create_session', [], {}),
+            (self.instructor, 'post', 'attendance:create_session', [], {
+                'class_session': self.class_obj.id, 'session_date': session_date.isoformat(),
+                'start_time': '08:00', 'end_time': '10:00', 'topic_covered': 'Intro',
+                'venue': 'Lab', 'attendance_method': 'manual',
+            }),
+            (self.instructor, 'get', 'attendance:mark_attendance', [self.session.id], {}),
+            (self.instructor, 'post', 'attendance:mark_attendance', [self.session.id], {
+                'student_id': student.id, 'status': 'late',
+            }),
+            (self.instructor, 'post', 'attendance:bulk_mark', [self.session.id], {
+                'attendance_data': json.dumps({student.id: 'present' for student in self.students}),
+            }),
+            (self.admin, 'get', 'attendance:report', [], {'date_range': 'this_month'}),
+            (self.admin, 'get', 'attendance:export_report', [], {}),
+            (student.user, 'get', 'attendance:apply_excuse', [], {}),
+            (self.admin, 'get', 'attendance:excuse_list', [], {}),
+            (self.admin, 'get', 'attendance:review_excuse', [ExcuseApplication.objects.first().id], {}),
+            # Ends absent so that the next round's marks change the status again
+            (self.instructor, 'post', 'attendance:update_status', [record.id], {'status': 'absent'}),
+        ]
+
+    def test_query_counts_do_not_grow_with_the_class(self):
+        few = self.budgeted_query_counts(self.requests(self.today + timedelta(days=1)))
+        students = [create_student(self.course, f'ADM{index:03}', self.class_obj) for index in range(3, 10)]
+        self.grow(students, time(14))
+        self.students += students
+
+        self.assertEqual(self.budgeted_query_counts(self.requests(self.today + timedelta(days=2))), few)
+
+    def test_every_budgeted_view_is_requested(self):
+        self.assertBudgetsCovered('attendance', self.requests(self.today), BROKEN_VIEWS)
+
+    def test_broken_views(self):
+        for name, reason in BROKEN_VIEWS.items():
+            with self.subTest(view=name):
+                self.skipTest(reason)
@@ -10,32 +10,34 @@ from django.utils import timezone
 from datetime import datetime, timedelta
 import json
 
+from .active_sessions import active_sessions_for
 from .models import AttendanceSession, AttendanceRecord, AttendanceSummary, ExcuseApplication
+from .stats import flush_deferred_stats
+from . import services
 from .forms import (
     AttendanceSessionForm, ManualAttendanceForm, BulkAttendanceForm, 
     QRAttendanceForm, ExcuseApplicationForm, AttendanceReportFilterForm
 )
 from students.models import Student
 from courses.models import Class
+from reports.exports import RECORD_EXPORT_ORDERING, stream_records_csv
 
 @login_required
 def attendance_dashboard(request):
     """Main attendance dashboard"""
     today = timezone.now().date()
     
+    # Shared with the active_session context processor
+    active_sessions = active_sessions_for(request)
+    
     # Get user's classes (if instructor)
     if request.user.user_type == 'instructor':
-        active_sessions = AttendanceSession.objects.filter(
-            class_session__instructor=request.user,
-            status='ongoing'
-        )
-        
-        today_sessions = AttendanceSession.objects.filter(
+        today_sessions = AttendanceSession.objects.select_related('class_session', 'instructor').filter(
             class_session__instructor=request.user,
             session_date=today
         ).order_by('start_time')
         
-        upcoming_sessions = AttendanceSession.objects.filter(
+        upcoming_sessions = AttendanceSession.objects.select_related('class_session', 'instructor').filter(
             class_session__instructor=request.user,
             session_date__gt=today,
             status='scheduled'
@@ -45,12 +47,7 @@ def attendance_dashboard(request):
         # Student view - show their attendance
         try:
             student = request.user.student
-            active_sessions = AttendanceSession.objects.filter(
-                class_session=student.current_class,
-                status='ongoing'
-            )
-            
-            today_sessions = AttendanceSession.objects.filter(
+            today_sessions = AttendanceSession.objects.select_related('class_session', 'instructor').filter(
                 class_session=student.current_class,
                 session_date=today
             ).order_by('start_time')
@@ -58,7 +55,7 @@ def attendance_dashboard(request):
             # Get student's recent attendance
             recent_attendance = AttendanceRecord.objects.filter(
                 student=student
-            ).select_related('session', 'session__class_session').order_by('-session__session_date')[:10]
+            ).select_related('session', 'session__class_session').order_by('-session_date')[:10]
             
             # Calculate attendance stats
             total_sessions = AttendanceSession.objects.filter(
@@ -90,20 +87,19 @@ def attendance_dashboard(request):
     
     else:
         # Admin/Registrar view
-        active_sessions = AttendanceSession.objects.filter(status='ongoing')
-        today_sessions = AttendanceSession.objects.filter(session_date=today)
-        upcoming_sessions = AttendanceSession.objects.filter(
+        today_sessions = AttendanceSession.objects.select_related('class_session', 'instructor').filter(session_date=today)
+        upcoming_sessions = AttendanceSession.objects.select_related('class_session', 'instructor').filter(
             session_date__gte=today,
             status='scheduled'
         ).order_by('session_date', 'start_time')[:5]
     
     # Statistics for admin/instructor
     total_sessions_today = today_sessions.count()
-    active_sessions_count = active_sessions.count()
+    active_sessions_count = len(active_sessions)
     
     # Get attendance statistics for today
     today_attendance = AttendanceRecord.objects.filter(
-        session__session_date=today
+        session_date=today
     ).aggregate(
         total_present=Count('id', filter=Q(status='present')),
         total_absent=Count('id', filter=Q(status='absent')),
@@ -134,17 +130,7 @@ def create_session(request):
             session.save()
             
             # Pre-populate attendance records for all enrolled students
-            enrolled_students = session.class_session.enrollments.filter(
-                is_active=True
-            ).select_related('student')
-            
-            for enrollment in enrolled_students:
-                AttendanceRecord.objects.create(
-                    session=session,
-                    student=enrollment.student,
-                    status='absent',  # Default status
-                    marked_by=request.user
-                )
+            services.materialise_roster(session, marked_by=request.user)
             
             messages.success(request, f'Attendance session created successfully!')
             
@@ -163,7 +149,7 @@ def create_session(request):
 def mark_attendance(request, session_id):
     """Mark attendance for a session"""
     session = get_object_or_404(
-        AttendanceSession.objects.select_related('class_session'),
+        AttendanceSession.objects.select_related('class_session', 'instructor'),
         id=session_id
     )
     
@@ -192,7 +178,7 @@ def mark_attendance(request, session_id):
         is_excused = request.POST.get('is_excused') == 'on'
         
         if student_id:
-            student = get_object_or_404(Student, id=student_id)
+            student = get_object_or_404(Student.objects.select_related('user'), id=student_id)
             
             # Update or create attendance record
             record, created = AttendanceRecord.objects.get_or_create(
@@ -208,6 +194,7 @@ def mark_attendance(request, session_id):
             )
             
             if not created:
+                record.session = session
                 record.status = status
                 record.marked_by = request.user
                 record.remarks = remarks
@@ -225,6 +212,10 @@ def mark_attendance(request, session_id):
                     'attendance_status': status,
                     'record_id': record.id
                 })
+            
+            # Bring the counters below up to date before rendering
+            flush_deferred_stats()
+            session.refresh_from_db(fields=['total_present', 'total_absent', 'total_late'])
     
     # Prepare student data for template
     students_data = []
@@ -257,40 +248,42 @@ def bulk_mark_attendance(request, session_id):
     """Bulk mark attendance for a session"""
     session = get_object_or_404(AttendanceSession, id=session_id)
     
-    if request.user != session.instructor and request.user.user_type != 'admin':
+    if request.user.id != session.instructor_id and request.user.user_type != 'admin':
         messages.error(request, "You don't have permission to mark attendance for this session.")
         return redirect('attendance:dashboard')
     
     if request.method == 'POST':
-        attendance_data = json.loads(request.POST.get('attendance_data', '{}'))
+        try:
+            attendance_data = json.loads(request.POST.get('attendance_data', '{}'))
+        except json.JSONDecodeError:
+            attendance_data = None
         
-        for student_id, status in attendance_data.items():
-            try:
-                student = Student.objects.get(id=student_id)
-                record, created = AttendanceRecord.objects.get_or_create(
-                    session=session,
-                    student=student,
-                    defaults={
-                        'status': status,
-                        'marked_by': request.user,
-                        'check_in_time': timezone.now() if status in ['present', 'late'] else None
-                    }
-                )
-                
-                if not created:
-                    record.status = status
-                    record.marked_by = request.user
-                    if status in ['present', 'late'] and not record.check_in_time:
-                        record.check_in_time = timezone.now()
-                    record.save()
-                    
-            except Student.DoesNotExist:
-                continue
+        if not isinstance(attendance_data, dict):
+            if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+                return JsonResponse({'error': 'Invalid attendance data'}, status=400)
+            messages.error(request, 'Invalid attendance data.')
+            return redirect('attendance:mark_attendance', session_id=session_id)
+        
+        result = services.bulk_mark_attendance(session, attendance_data, request.user)
+        rejected = result['rejected']
+        
+        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+            return JsonResponse({
+                'status': 'success',
+                'created': result['created'],
+                'updated': result['updated'],
+                'rejected': rejected,
+            })
         
-        # Recalculate session statistics
-        session.calculate_stats()
+        if rejected:
+            messages.warning(
+                request,
+                'Some students were not marked: ' + ', '.join(
+                    f'{student_id} ({reason})' for student_id, reason in list(rejected.items())[:10]
+                )
+            )
         
-        messages.success(request, 'Attendance marked in bulk successfully!')
+        messages.success(request, f"Attendance marked for {result['created'] + result['updated']} students.")
         return redirect('attendance:mark_attendance', session_id=session_id)
     
     return redirect('attendance:mark_attendance', session_id=session_id)
@@ -431,10 +424,10 @@ def attendance_report(request):
             end_date = today.replace(day=1) - timedelta(days=1)
         
         # Filter attendance records
-        filters = Q(session__session_date__range=[start_date, end_date])
+        filters = Q(session_date__range=[start_date, end_date])
         
         if class_session:
-            filters &= Q(session__class_session=class_session)
+            filters &= Q(class_session=class_session)
         
         if student:
             filters &= Q(student=student)
@@ -445,15 +438,22 @@ def attendance_report(request):
         attendance_data = AttendanceRecord.objects.filter(
             filters
         ).select_related(
-            'session', 'session__class_session', 'student', 'student__user'
-        ).order_by('-session__session_date', '-check_in_time')
+            'session', 'session__class_session', 'student', 'student__user', 'student__course'
+        ).order_by('-session_date', '-check_in_time')
         
         # Calculate statistics
-        total_records = attendance_data.count()
-        present_count = attendance_data.filter(status='present').count()
-        absent_count = attendance_data.filter(status='absent').count()
-        late_count = attendance_data.filter(status='late').count()
-        excused_count = attendance_data.filter(is_excused=True).count()
+        counts = attendance_data.aggregate(
+            total=Count('id'),
+            present=Count('id', filter=Q(status='present')),
+            absent=Count('id', filter=Q(status='absent')),
+            late=Count('id', filter=Q(status='late')),
+            excused=Count('id', filter=Q(is_excused=True)),
+        )
+        total_records = counts['total']
+        present_count = counts['present']
+        absent_count = counts['absent']
+        late_count = counts['late']
+        excused_count = counts['excused']
         
         attendance_rate = (present_count / total_records * 100) if total_records > 0 else 0
         
@@ -473,10 +473,10 @@ def attendance_report(request):
         # Default: show today's attendance
         today = timezone.now().date()
         attendance_data = AttendanceRecord.objects.filter(
-            session__session_date=today
+            session_date=today
         ).select_related(
-            'session', 'session__class_session', 'student', 'student__user'
-        ).order_by('-session__session_date', '-check_in_time')
+            'session', 'session__class_session', 'student', 'student__user', 'student__course'
+        ).order_by('-session_date', '-check_in_time')
         
         context = {
             'form': form,
@@ -509,7 +509,7 @@ def student_attendance_history(request, student_id=None):
         student=student
     ).select_related(
         'session', 'session__class_session', 'session__instructor'
-    ).order_by('-session__session_date', '-check_in_time')
+    ).order_by('-session_date', '-check_in_time')
     
     # Calculate statistics
     total_sessions = AttendanceSession.objects.filter(
@@ -573,13 +573,13 @@ def excuse_list(request):
     if request.user.user_type == 'student':
         try:
             student = request.user.student
-            excuses = ExcuseApplication.objects.filter(student=student).order_by('-applied_at')
+            excuses = ExcuseApplication.objects.filter(student=student).select_related('student__user').order_by('-applied_at')
         except Student.DoesNotExist:
             messages.error(request, "Student profile not found.")
             return redirect('dashboard')
     else:
         # Instructor/Admin view
-        excuses = ExcuseApplication.objects.all().order_by('-applied_at')
+        excuses = ExcuseApplication.objects.select_related('student__user').order_by('-applied_at')
     
     context = {'excuses': excuses}
     return render(request, 'attendance/excuse_list.html', context)
@@ -634,10 +634,10 @@ def review_excuse(request, excuse_id):
 @login_required
 def update_attendance_status(request, record_id):
     """Update attendance status via AJAX"""
-    record = get_object_or_404(AttendanceRecord, id=record_id)
+    record = get_object_or_404(AttendanceRecord.objects.select_related('session'), id=record_id)
     
     # Check permissions
-    if request.user != record.session.instructor and request.user.user_type != 'admin':
+    if request.user.id != record.session.instructor_id and request.user.user_type != 'admin':
         return JsonResponse({'error': 'Permission denied'}, status=403)
     
     status = request.POST.get('status')
@@ -665,8 +665,6 @@ def update_attendance_status(request, record_id):
 @login_required
 def export_attendance_report(request):
     """Export attendance report as CSV"""
-    import csv
-    
     # Get filter parameters
     start_date = request.GET.get('start_date')
     end_date = request.GET.get('end_date')
@@ -675,34 +673,17 @@ def export_attendance_report(request):
     # Filter records
     filters = Q()
     if start_date and end_date:
-        filters &= Q(session__session_date__range=[start_date, end_date])
+        filters &= Q(session_date__range=[start_date, end_date])
     if class_session_id:
-        filters &= Q(session__class_session_id=class_session_id)
+        filters &= Q(class_session_id=class_session_id)
     
     attendance_records = AttendanceRecord.objects.filter(
         filters
-    ).select_related(
-        'session', 'session__class_session', 'student', 'student__user'
-    ).order_by('session__session_date', 'student__admission_number')
-    
-    # Create CSV response
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="attendance_report_{timezone.now().date()}.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow(['Date', 'Class', 'Admission No', 'Student Name', 'Status', 
-                     'Check-in Time', 'Marked By', 'Remarks'])
-    
-    for record in attendance_records:
-        writer.writerow([
-            record.session.session_date,
-            record.session.class_session.class_code,
-            record.student.admission_number,
-            record.student.user.get_full_name(),
-            record.get_status_display(),
-            record.check_in_time.strftime('%H:%M:%S') if record.check_in_time else 'N/A',
-            record.marked_by.get_full_name() if record.marked_by else 'System',
-            record.remarks[:50]  # Limit remarks length
-        ])
-    
-    return response
\ No newline at end of file
+    ).order_by(*RECORD_EXPORT_ORDERING)
+    
+    # Rows are streamed to the browser as they are read, in index order
+    return stream_records_csv(
+        f'attendance_report_{timezone.now().date()}.csv',
+        attendance_records,
+        ['date', 'class', 'admission_number', 'student_name', 'status', 'check_in', 'marked_by', 'remarks']
+    )
\ No newline at end of file
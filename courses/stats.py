@@ -0,0 +1,68 @@
+# courses/stats.py
+"""
+Class overview statistics for instructors.
+
+Every figure shown on the instructor's class list is computed with subquery
+annotations on the class queryset, so the number of queries does not grow
+with the number of classes.
+"""
+from django.db.models import Count, Exists, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Class
+from attendance.models import AttendanceSession, AttendanceRecord
+from students.models import Enrollment
+
+
+def _count(queryset, group_field):
+    """Correlated COUNT(*) subquery over a queryset grouped on its outer reference"""
+    return Coalesce(
+        Subquery(
+            queryset.order_by().values(group_field).annotate(total=Count('pk')).values('total'),
+            output_field=IntegerField()
+        ),
+        Value(0)
+    )
+
+
+def instructor_class_overview(instructor, today=None):
+    """
+    Return the instructor's active classes annotated with student_count,
+    total_sessions, today_session, next_session and attendance_rate.
+    """
+    today = today or timezone.now().date()
+    sessions = AttendanceSession.objects.filter(class_session=OuterRef('pk'))
+    records = AttendanceRecord.objects.filter(class_session=OuterRef('pk'))
+
+    classes = list(Class.objects.filter(
+        instructor=instructor,
+        is_active=True
+    ).select_related('course').annotate(
+        student_count=_count(
+            Enrollment.objects.filter(class_enrolled=OuterRef('pk'), is_active=True), 'class_enrolled'
+        ),
+        total_sessions=_count(sessions, 'class_session'),
+        today_session=Exists(sessions.filter(session_date=today)),
+        next_session_id=Subquery(
+            sessions.filter(session_date__gte=today).order_by('session_date', 'start_time').values('pk')[:1]
+        ),
+        total_records=_count(records, 'class_session'),
+        present_records=_count(records.filter(status='present'), 'class_session'),
+    ))
+
+    next_session_ids = [class_obj.next_session_id for class_obj in classes if class_obj.next_session_id]
+    next_sessions = AttendanceSession.objects.in_bulk(next_session_ids) if next_session_ids else {}
+
+    for class_obj in classes:
+        class_obj.next_session = next_sessions.get(class_obj.next_session_id)
+        if class_obj.next_session:
+            # Avoid a query per class when the session is rendered
+            class_obj.next_session.class_session = class_obj
+
+        if class_obj.total_records > 0:
+            class_obj.attendance_rate = round((class_obj.present_records / class_obj.total_records) * 100, 1)
+        else:
+            class_obj.attendance_rate = 0
+
+    return classes
@@ -1,3 +1,202 @@
-from django.test import TestCase
+import json
+import tempfile
+from datetime import date, time, timedelta
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts.models import User
+from attendance.models import AttendanceSession, AttendanceRecord
+from students.models import Student, Enrollment
+from tvet_attendance.testing import (
+    QueryBudgetTestMixin, create_class, create_course, create_session, create_student, create_user,
+)
+from .models import Course, Class
+from .stats import instructor_class_overview
+
+
+class InstructorClassOverviewTests(QueryBudgetTestMixin, TestCase):
+    """The instructor class list must not issue queries per class"""
+
+    def setUp(self):
+        self.today = date.today()
+        self.instructor = User.objects.create_user(
+            username='instructor', password='pass', user_type='instructor', account_status='approved'
+        )
+        self.course = Course.objects.create(code='ICT101', name='ICT', department='ICT')
+        student_user = User.objects.create_user(username='student', password='pass', user_type='student')
+        self.student = Student.objects.create(
+            user=student_user,
+            admission_number='ADM001',
+            date_of_birth=date(2000, 1, 1),
+            gender='F',
+            address='Kitui',
+            sub_county='Kitui Central',
+            emergency_contact_name='Parent',
+            emergency_contact_phone='0700000000',
+            emergency_contact_relationship='Parent',
+            year_of_admission=2026,
+            course=self.course,
+        )
+
+    def _add_class(self, index):
+        class_obj = Class.objects.create(
+            course=self.course,
+            class_code=f'ICT101-{index}',
+            name=f'ICT Class {index}',
+            instructor=self.instructor,
+            academic_year='2026',
+            start_date=self.today - timedelta(days=30),
+            end_date=self.today + timedelta(days=30),
+            meeting_days='Monday',
+            meeting_time='8:00 AM - 10:00 AM',
+            venue='Lab',
+        )
+        Enrollment.objects.create(student=self.student, course=self.course, class_enrolled=class_obj)
+        past = AttendanceSession.objects.create(
+            class_session=class_obj, instructor=self.instructor,
+            session_date=self.today - timedelta(days=1),
+            start_time=time(8), end_time=time(10), topic_covered='Intro'
+        )
+        AttendanceRecord.objects.create(session=past, student=self.student, status='present')
+        AttendanceSession.objects.create(
+            class_session=class_obj, instructor=self.instructor,
+            session_date=self.today + timedelta(days=7),
+            start_time=time(8), end_time=time(10), topic_covered='Next'
+        )
+        return class_obj
+
+    def test_overview_annotations(self):
+        self._add_class(0)
+
+        class_obj, = instructor_class_overview(self.instructor, today=self.today)
+
+        self.assertEqual(class_obj.student_count, 1)
+        self.assertEqual(class_obj.total_sessions, 2)
+        self.assertFalse(class_obj.today_session)
+        self.assertEqual(class_obj.next_session.session_date, self.today + timedelta(days=7))
+        self.assertEqual(class_obj.attendance_rate, 100.0)
+
+    def test_overview_query_count_is_constant(self):
+        self._add_class(0)
+        with self.assertNumQueries(2):
+            classes = instructor_class_overview(self.instructor, today=self.today)
+            [str(class_obj.next_session) for class_obj in classes]
+
+        for index in range(1, 6):
+            self._add_class(index)
+        with self.assertNumQueries(2):
+            classes = instructor_class_overview(self.instructor, today=self.today)
+            [str(class_obj.next_session) for class_obj in classes]
+        self.assertEqual(len(classes), 6)
+
+    def test_instructor_classes_view_query_count_is_constant(self):
+        self.client.force_login(self.instructor)
+        url = reverse('courses:instructor_classes')
+
+        self._add_class(0)
+        with CaptureQueriesContext(connection) as single:
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+        for index in range(1, 6):
+            self._add_class(index)
+        with CaptureQueriesContext(connection) as many:
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+        self.assertEqual(len(single), len(many))
+
+    def test_student_classes_within_budget(self):
+        for index in range(3):
+            self._add_class(index)
+        self.client.force_login(self.student.user)
+
+        response = self.client.get(reverse('courses:student_classes'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('db;desc=', response['Server-Timing'])
+
+    def test_request_over_budget_fails(self):
+        self._add_class(0)
+        self.client.force_login(self.instructor)
+
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as budget_file:
+            json.dump({'courses:instructor_classes': 1}, budget_file)
+            budget_file.flush()
+            with override_settings(QUERY_BUDGETS_FILE=budget_file.name):
+                with self.assertRaisesMessage(AssertionError, 'over its budget of 1'):
+                    self.client.get(reverse('courses:instructor_classes'))
+
+
+# Budgeted views that fail before their query count means anything
+BROKEN_VIEWS = {
+    'courses:api_unassigned_classes': "filters the instructor foreign key on '', which raises ValueError",
+}
+
+
+class QueryBudgetTests(QueryBudgetTestMixin, TransactionTestCase):
+    """Budgeted course views run a fixed number of queries however many classes there are"""
+
+    def setUp(self):
+        self.today = date.today()
+        self.admin = create_user('admin', 'admin', is_staff=True, is_superuser=True)
+        self.instructor = create_user('instructor', 'instructor')
+        self.substitute = create_user('substitute', 'instructor')
+        self.course = create_course()
+        self.student = create_student(self.course, 'ADM000')
+        self.classes = []
+        self.grow(2)
+
+    def grow(self, count):
+        """Add count classes with the student, a classmate and a marked session in each"""
+        for _ in range(count):
+            class_obj = create_class(self.course, self.instructor)
+            for student in (self.student, create_student(self.course, f'ADM{Student.objects.count():03}')):
+                Enrollment.objects.create(student=student, course=self.course, class_enrolled=class_obj)
+            session = create_session(class_obj, self.today - timedelta(days=1))
+            AttendanceRecord.objects.create(session=session, student=self.student, status='present')
+            create_session(class_obj, self.today + timedelta(days=7))
+            self.classes.append(class_obj)
+
+    def requests(self, assignee):
+        class_obj, other_class = self.classes[:2]
+        doomed_course = create_course(f'DEL{Course.objects.count()}')
+        doomed_class = create_class(doomed_course, self.instructor)
+        return [
+            (self.admin, 'get', 'courses:list', [], {}),
+            (self.admin, 'get', 'courses:create', [], {}),
+            (self.admin, 'get', 'courses:detail', [self.course.id], {}),
+            (self.admin, 'get', 'courses:update', [self.course.id], {}),
+            (self.admin, 'get', 'courses:class_list', [], {}),
+            (self.admin, 'get', 'courses:class_create', [], {}),
+            (self.admin, 'get', 'courses:class_detail', [class_obj.id], {}),
+            (self.admin, 'get', 'courses:class_update', [class_obj.id], {}),
+            (self.admin, 'post', 'courses:class_delete', [doomed_class.id], {}),
+            (self.admin, 'post', 'courses:delete', [doomed_course.id], {}),
+            (self.admin, 'get', 'courses:enroll_students', [class_obj.id], {}),
+            (self.student.user, 'get', 'courses:available_courses', [], {}),
+            (self.instructor, 'get', 'courses:instructor_classes', [], {}),
+            (self.student.user, 'get', 'courses:student_classes', [], {}),
+            (self.admin, 'get', 'courses:manage_instructor_assignments', [], {}),
+            (self.admin, 'get', 'courses:api_unassigned_count', [], {}),
+            (self.admin, 'get', 'courses:api_instructors', [], {}),
+            (self.admin, 'post', 'courses:bulk_assign_instructors', [], {
+                'instructor': assignee.id, 'class_ids': [class_obj.id],
+            }),
+            (self.admin, 'post', 'courses:assign_instructor', [other_class.id], {'instructor': assignee.id}),
+        ]
+
+    def test_query_counts_do_not_grow_with_the_classes(self):
+        few = self.budgeted_query_counts(self.requests(self.substitute))
+        self.grow(5)
+
+        self.assertEqual(self.budgeted_query_counts(self.requests(self.instructor)), few)
+
+    def test_every_budgeted_view_is_requested(self):
+        self.assertBudgetsCovered('courses', self.requests(self.substitute), BROKEN_VIEWS)
+
+    def test_broken_views(self):
+        for name, reason in BROKEN_VIEWS.items():
+            with self.subTest(view=name):
+                self.skipTest(reason)
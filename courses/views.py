@@ -3,13 +3,15 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, permission_required
 from django.contrib import messages
 from django.core.paginator import Paginator
-from django.db.models import Q, Count
+from django.db.models import Q, Count, Sum
 from django.utils import timezone
-from attendance.models import AttendanceRecord, AttendanceSession
+from attendance.models import AttendanceRecord, AttendanceSession, AttendanceSummary
+from attendance.stats import mark_classes_reassigned
 from django.http import JsonResponse
 from attendance.models import AttendanceRecord
 from .models import Course, Class
 from .forms import CourseForm, ClassForm, ClassEnrollmentForm
+from .stats import instructor_class_overview
 from students.models import Enrollment, Student
 from accounts.models import User
 
@@ -62,8 +64,10 @@ def course_list(request):
 @login_required
 def course_detail(request, pk):
     """View course details"""
-    course = get_object_or_404(Course.objects.prefetch_related('classes'), pk=pk)
-    active_classes = course.classes.filter(is_active=True)
+    course = get_object_or_404(Course, pk=pk)
+    active_classes = course.classes.filter(is_active=True).select_related('instructor').annotate(
+        enrollment_count=Count('enrollments')
+    )
     total_students = Student.objects.filter(course=course, status='active').count()
     
     context = {
@@ -291,46 +295,8 @@ def instructor_classes(request):
         messages.error(request, "Access denied. Instructors only.")
         return redirect('dashboard')
     
-    # Get classes taught by this instructor
-    classes = Class.objects.filter(
-        instructor=request.user,
-        is_active=True
-    ).select_related('course').prefetch_related('enrollments')
-    
-    # Add additional data to each class
-    from django.utils import timezone
-    today = timezone.now().date()
-    
-    for class_obj in classes:
-        # Count students
-        class_obj.student_count = class_obj.enrollments.filter(is_active=True).count()
-        
-        # Check if there's a session today
-        class_obj.today_session = class_obj.attendance_sessions.filter(
-            session_date=today
-        ).exists()
-        
-        # Get total sessions
-        class_obj.total_sessions = class_obj.attendance_sessions.count()
-        
-        # Get next session
-        next_session = class_obj.attendance_sessions.filter(
-            session_date__gte=today
-        ).order_by('session_date', 'start_time').first()
-        class_obj.next_session = next_session
-        
-        # Calculate attendance rate (optional)
-        if class_obj.total_sessions > 0:
-            total_records = AttendanceRecord.objects.filter(
-                session__class_session=class_obj
-            ).count()
-            present_records = AttendanceRecord.objects.filter(
-                session__class_session=class_obj,
-                status='present'
-            ).count()
-            class_obj.attendance_rate = round((present_records / total_records) * 100, 1) if total_records > 0 else 0
-        else:
-            class_obj.attendance_rate = 0
+    # Get classes taught by this instructor, with their statistics
+    classes = instructor_class_overview(request.user)
     
     context = {
         'classes': classes,
@@ -354,21 +320,41 @@ def student_classes(request):
             is_active=True
         ).select_related('class_enrolled', 'course', 'class_enrolled__instructor')
         
+        # Attendance counts per class, summed from the monthly summaries
+        totals = {
+            row['class_session_id']: row
+            for row in AttendanceSummary.objects.filter(
+                student=student,
+                period_type='monthly'
+            ).order_by().values('class_session_id').annotate(
+                present=Sum('present_count'),
+                late=Sum('late_count'),
+                absent=Sum('absent_count'),
+                total=Sum('total_sessions'),
+            )
+        }
+        
+        # Upcoming scheduled sessions for all enrolled classes, earliest first
+        upcoming = list(AttendanceSession.objects.filter(
+            class_session__in=[e.class_enrolled_id for e in enrollments],
+            session_date__gte=timezone.now().date(),
+            status='scheduled'
+        ).order_by('session_date', 'start_time'))
+        next_sessions = {}
+        for session in upcoming:
+            next_sessions.setdefault(session.class_session_id, session)
+        
         # Calculate attendance for each enrollment
         total_attendance = 0
         for enrollment in enrollments:
-            # Get attendance records for this class
-            attendance_records = AttendanceRecord.objects.filter(
-                student=student,
-                session__class_session=enrollment.class_enrolled
-            )
+            row = totals.get(enrollment.class_enrolled_id, {})
             
             # Calculate counts
-            enrollment.present_count = attendance_records.filter(status='present').count()
-            enrollment.late_count = attendance_records.filter(status='late').count()
-            enrollment.absent_count = attendance_records.filter(status='absent').count()
+            enrollment.present_count = row.get('present', 0)
+            enrollment.late_count = row.get('late', 0)
+            enrollment.absent_count = row.get('absent', 0)
             
-            total_sessions = attendance_records.count()
+            total_sessions = row.get('total', 0)
             if total_sessions > 0:
                 enrollment.attendance_percentage = round(
                     (enrollment.present_count + enrollment.late_count) / total_sessions * 100, 1
@@ -377,28 +363,17 @@ def student_classes(request):
                 enrollment.attendance_percentage = 0
             
             # Get next session
-            enrollment.next_session = AttendanceSession.objects.filter(
-                class_session=enrollment.class_enrolled,
-                session_date__gte=timezone.now().date(),
-                status='scheduled'
-            ).order_by('session_date', 'start_time').first()
+            enrollment.next_session = next_sessions.get(enrollment.class_enrolled_id)
             
             total_attendance += enrollment.attendance_percentage
         
         # Calculate average attendance
         avg_attendance = round(total_attendance / len(enrollments), 1) if enrollments else 0
         
-        # Count upcoming sessions
-        upcoming_sessions = AttendanceSession.objects.filter(
-            class_session__in=[e.class_enrolled for e in enrollments],
-            session_date__gte=timezone.now().date(),
-            status='scheduled'
-        ).count()
-        
         context = {
             'enrollments': enrollments,
             'avg_attendance': avg_attendance,
-            'upcoming_sessions': upcoming_sessions,
+            'upcoming_sessions': len(upcoming),
         }
         
     except Student.DoesNotExist:
@@ -436,19 +411,25 @@ def manage_instructor_assignments(request):
         classes = classes.filter(academic_year=academic_year)
     
     # Get all instructors for filter dropdown
-    instructors = User.objects.filter(user_type='instructor', is_active=True)
+    instructors = list(User.objects.filter(user_type='instructor', is_active=True))
     courses = Course.objects.filter(is_active=True)
     academic_years = Class.objects.values_list('academic_year', flat=True).distinct().order_by('-academic_year')
     
+    # Every class once, grouped by instructor in Python
+    class_list = list(classes.annotate(enrollment_count=Count('enrollments')))
+    classes_by_instructor = {}
+    for class_obj in class_list:
+        classes_by_instructor.setdefault(class_obj.instructor_id, []).append(class_obj)
+    
     # Unassigned classes
-    unassigned_classes = classes.filter(instructor__isnull=True)
+    unassigned_classes = classes_by_instructor.get(None, [])
     
     # Classes by instructor (only assigned ones)
-    instructor_classes = {}
-    for instructor in instructors:
-        assigned = classes.filter(instructor=instructor)
-        if assigned.exists():
-            instructor_classes[instructor] = assigned
+    instructor_classes = {
+        instructor: classes_by_instructor[instructor.id]
+        for instructor in instructors
+        if instructor.id in classes_by_instructor
+    }
     
     context = {
         'instructors': instructors,
@@ -456,9 +437,9 @@ def manage_instructor_assignments(request):
         'academic_years': academic_years,
         'instructor_classes': instructor_classes,
         'unassigned_classes': unassigned_classes,
-        'total_classes': classes.count(),
-        'assigned_count': classes.filter(instructor__isnull=False).count(),
-        'unassigned_count': unassigned_classes.count(),
+        'total_classes': len(class_list),
+        'assigned_count': len(class_list) - len(unassigned_classes),
+        'unassigned_count': len(unassigned_classes),
     }
     return render(request, 'courses/manage_instructor_assignments.html', context)
 
@@ -474,7 +455,11 @@ def bulk_assign_instructors(request):
         
         if instructor_id and class_ids:
             instructor = get_object_or_404(User, id=instructor_id, user_type='instructor')
-            updated = Class.objects.filter(id__in=class_ids).update(instructor=instructor)
+            classes = Class.objects.filter(id__in=class_ids)
+            previous_instructors = set(classes.values_list('instructor_id', flat=True))
+            updated = classes.update(instructor=instructor)
+            # update() sends no signals; evict what the save signal would have
+            mark_classes_reassigned(class_ids, previous_instructors | {instructor.id})
             messages.success(request, f'Successfully assigned {instructor.get_full_name()} to {updated} classes')
         else:
             messages.warning(request, 'Please select both an instructor and at least one class')
@@ -540,19 +525,25 @@ def manage_instructor_assignments(request):
         classes = classes.filter(academic_year=academic_year)
     
     # Get all instructors for filter dropdown
-    instructors = User.objects.filter(user_type='instructor', is_active=True)
+    instructors = list(User.objects.filter(user_type='instructor', is_active=True))
     courses = Course.objects.filter(is_active=True)
     academic_years = Class.objects.values_list('academic_year', flat=True).distinct().order_by('-academic_year')
     
+    # Every class once, grouped by instructor in Python
+    class_list = list(classes.annotate(enrollment_count=Count('enrollments')))
+    classes_by_instructor = {}
+    for class_obj in class_list:
+        classes_by_instructor.setdefault(class_obj.instructor_id, []).append(class_obj)
+    
     # Unassigned classes
-    unassigned_classes = classes.filter(instructor__isnull=True)
+    unassigned_classes = classes_by_instructor.get(None, [])
     
     # Classes by instructor (only assigned ones)
-    instructor_classes = {}
-    for instructor in instructors:
-        assigned = classes.filter(instructor=instructor)
-        if assigned.exists():
-            instructor_classes[instructor] = assigned
+    instructor_classes = {
+        instructor: classes_by_instructor[instructor.id]
+        for instructor in instructors
+        if instructor.id in classes_by_instructor
+    }
     
     context = {
         'instructors': instructors,
@@ -560,9 +551,9 @@ def manage_instructor_assignments(request):
         'academic_years': academic_years,
         'instructor_classes': instructor_classes,
         'unassigned_classes': unassigned_classes,
-        'total_classes': classes.count(),
-        'assigned_count': classes.filter(instructor__isnull=False).count(),
-        'unassigned_count': unassigned_classes.count(),
+        'total_classes': len(class_list),
+        'assigned_count': len(class_list) - len(unassigned_classes),
+        'unassigned_count': len(unassigned_classes),
     }
     return render(request, 'courses/manage_instructor_assignments.html', context)
 
@@ -579,7 +570,11 @@ def bulk_assign_instructors(request):
         
         if instructor_id and class_ids:
             instructor = get_object_or_404(User, id=instructor_id, user_type='instructor')
-            updated = Class.objects.filter(id__in=class_ids).update(instructor=instructor)
+            classes = Class.objects.filter(id__in=class_ids)
+            previous_instructors = set(classes.values_list('instructor_id', flat=True))
+            updated = classes.update(instructor=instructor)
+            # update() sends no signals; evict what the save signal would have
+            mark_classes_reassigned(class_ids, previous_instructors | {instructor.id})
             messages.success(request, f'Successfully assigned {instructor.get_full_name()} to {updated} classes')
         else:
             messages.warning(request, 'Please select both an instructor and at least one class')
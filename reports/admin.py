@@ -25,10 +25,11 @@ class ReportTemplateAdmin(admin.ModelAdmin):
 @admin.register(GeneratedReport)
 class GeneratedReportAdmin(admin.ModelAdmin):
     list_display = ['report_name', 'report_type', 'file_format', 'generated_by', 
-                   'generated_at', 'is_ready', 'file_size_display']
-    list_filter = ['report_type', 'file_format', 'is_ready', 'generated_at']
+                   'generated_at', 'status', 'is_ready', 'file_size_display']
+    list_filter = ['report_type', 'file_format', 'status', 'is_ready', 'generated_at']
     search_fields = ['report_name', 'description']
-    readonly_fields = ['generated_at', 'file_size']
+    readonly_fields = ['generated_at', 'file_size', 'worker_id', 'attempts', 'started_at', 'heartbeat_at',
+                       'completed_at']
     list_per_page = 20
     
     fieldsets = (
@@ -49,6 +50,11 @@ class GeneratedReportAdmin(admin.ModelAdmin):
         ('Status', {
             'fields': ('is_ready', 'is_archived', 'generated_by', 'generated_at')
         }),
+        ('Background Generation', {
+            'fields': ('status', 'worker_id', 'attempts', 'started_at', 'heartbeat_at', 'completed_at',
+                       'error_message'),
+            'classes': ('collapse',)
+        }),
     )
     
     def file_size_display(self, obj):
@@ -0,0 +1,222 @@
+# reports/cache.py
+"""
+Report result cache.
+
+Results live in the size-bounded 'reports' cache (LocMemCache evicts the
+least recently used entries) under a hash of the report name, the
+normalised form data and the resolved date range. Every entry also stores a
+fingerprint of the version stamps of the (date, class) scopes it covers.
+
+When attendance changes, the stats flush bumps the stamp of each touched
+(date, class) and of (date, all classes). Only results whose range and
+class filter cover a touched scope stop matching; everything else,
+including closed historical ranges, keeps being served from the cache.
+
+The stamps must be seen by every application process, so results are only
+cached when 'report_versions' is a shared backend (the file cache shipped in
+the settings for a single host, Redis, Memcached, the database); with a
+per-process LocMemCache reports are always computed. A
+stamp that has been evicted is replaced by a fresh token, which never
+matches a result stored before it was lost.
+
+Dashboard widget data is shared by every user of a widget and kept for the
+widget's refresh_interval. One request recomputes an expired entry while
+the others keep receiving the previous data. The active widgets visible to
+each user type are cached as one map, dropped whenever a widget is saved or
+deleted. That drop only reaches the saving process's cache, so the map also
+expires after WIDGET_MAP_TIMEOUT seconds.
+"""
+import hashlib
+import json
+import pickle
+import time
+import uuid
+from datetime import date, datetime, timedelta
+
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models import Model, QuerySet
+
+RESULTS_CACHE = 'reports'
+VERSIONS_CACHE = 'report_versions'
+
+ALL_CLASSES = 'all'
+
+# Reports spanning more (date, class) scopes than this are not cached
+MAX_SCOPE_KEYS = 5000
+
+WIDGETS_CACHE = 'default'
+WIDGET_MAP_KEY = 'dashboard-widget-map'
+
+# Longest other processes keep serving the widget map after a widget changes
+WIDGET_MAP_TIMEOUT = 60
+
+# Widgets without a refresh interval are still cached for this many seconds
+MIN_WIDGET_TIMEOUT = 60
+
+# Longest a widget recomputation may hold its lock
+WIDGET_LOCK_TIMEOUT = 30
+
+# How long a request without stale data waits for another request's result
+WIDGET_LOCK_WAIT = 5
+
+# Results larger than this when pickled are not cached, bounding the cache size
+MAX_RESULT_BYTES = 2 * 1024 * 1024
+
+
+def _normalise(value):
+    if isinstance(value, Model):
+        return value.pk
+    if isinstance(value, QuerySet):
+        return sorted(value.values_list('pk', flat=True))
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, (list, tuple, set)):
+        return sorted(_normalise(item) for item in value)
+    return value
+
+
+def report_cache_key(name, cleaned_data, start_date, end_date):
+    """Canonical cache key for a report's parameters"""
+    payload = json.dumps({
+        'params': {field: _normalise(value) for field, value in cleaned_data.items()},
+        'range': [start_date.isoformat(), end_date.isoformat()],
+    }, sort_keys=True, default=str)
+    return f'report:{name}:{hashlib.sha256(payload.encode()).hexdigest()}'
+
+
+def _version_key(day, class_id):
+    return f'report-version:{day.isoformat()}:{class_id}'
+
+
+def _scope_keys(start_date, end_date, class_ids):
+    classes = [ALL_CLASSES] if class_ids is None else sorted(set(class_ids))
+    return [
+        _version_key(start_date + timedelta(days=offset), class_id)
+        for offset in range((end_date - start_date).days + 1)
+        for class_id in classes
+    ]
+
+
+def report_cache_enabled():
+    """Whether the version stamps live in a backend shared by every process"""
+    return not isinstance(caches[VERSIONS_CACHE], (LocMemCache, DummyCache))
+
+
+def _fingerprint(keys):
+    """Fingerprint of the scopes' version stamps, or None when they cannot all be read"""
+    versions = caches[VERSIONS_CACHE]
+    stamps = versions.get_many(keys)
+    missing = [key for key in keys if key not in stamps]
+    if missing:
+        versions.set_many(dict.fromkeys(missing, uuid.uuid4().hex), caches[RESULTS_CACHE].default_timeout)
+        stamps = versions.get_many(keys)
+        if len(stamps) < len(keys):
+            return None
+    return hashlib.sha256(json.dumps(sorted(stamps.items())).encode()).hexdigest()
+
+
+def cached_report(name, cleaned_data, start_date, end_date, class_ids, compute):
+    """
+    Return compute(), cached until attendance inside the report's scope changes.
+
+    class_ids are the classes the report covers, or None for all classes.
+    The result must be picklable and should hold plain values rather than
+    model instances.
+    """
+    if not report_cache_enabled():
+        return compute()
+
+    keys = _scope_keys(start_date, end_date, class_ids)
+    if len(keys) > MAX_SCOPE_KEYS:
+        return compute()
+
+    results = caches[RESULTS_CACHE]
+    key = report_cache_key(name, cleaned_data, start_date, end_date)
+    # Taken before computing, so a change committed meanwhile invalidates the result
+    fingerprint = _fingerprint(keys)
+    if fingerprint is None:
+        return compute()
+
+    entry = results.get(key)
+    if entry is not None and entry[0] == fingerprint:
+        return entry[1]
+
+    result = compute()
+    if len(pickle.dumps(result, pickle.HIGHEST_PROTOCOL)) <= MAX_RESULT_BYTES:
+        results.set(key, (fingerprint, result))
+    return result
+
+
+def invalidate_report_scopes(scopes):
+    """Bump the version stamps of (date, class_id) scopes and of their dates across all classes"""
+    token = uuid.uuid4().hex
+    stamps = {}
+    for day, class_id in scopes:
+        stamps[_version_key(day, class_id)] = token
+        stamps[_version_key(day, ALL_CLASSES)] = token
+
+    # Stamps must outlive every result computed before the bump
+    caches[VERSIONS_CACHE].set_many(stamps, caches[RESULTS_CACHE].default_timeout)
+
+
+def dashboard_widgets(user_type):
+    """Active widgets visible to a user type, in display order"""
+    cache = caches[WIDGETS_CACHE]
+    widget_map = cache.get(WIDGET_MAP_KEY)
+    if widget_map is None:
+        from .models import DashboardWidget
+
+        widget_map = {}
+        for widget in DashboardWidget.objects.filter(is_active=True):
+            for visible_to in widget.user_types:
+                widget_map.setdefault(visible_to, []).append(widget)
+        cache.set(WIDGET_MAP_KEY, widget_map, WIDGET_MAP_TIMEOUT)
+    return widget_map.get(user_type, [])
+
+
+def invalidate_dashboard_widgets():
+    caches[WIDGETS_CACHE].delete(WIDGET_MAP_KEY)
+
+
+def _widget_key(widget):
+    # updated_at changes whenever the widget's configuration is edited
+    return f'widget-data:{widget.id}:{widget.updated_at.timestamp()}'
+
+
+def cached_widget_data(widget, compute):
+    """
+    Return compute() for a widget, recomputed at most once per refresh_interval.
+
+    Expired data is kept for a second interval. While one request holds the
+    widget's lock and recomputes, concurrent requests are served that stale
+    copy, or wait briefly for the new data when there is none.
+    """
+    cache = caches[WIDGETS_CACHE]
+    timeout = max(widget.refresh_interval * 60, MIN_WIDGET_TIMEOUT)
+    key = _widget_key(widget)
+    lock_key = f'{key}:lock'
+
+    entry = cache.get(key)
+    if entry is not None and entry[0] > time.time():
+        return entry[1]
+
+    if not cache.add(lock_key, True, WIDGET_LOCK_TIMEOUT):
+        if entry is not None:
+            return entry[1]
+        deadline = time.monotonic() + WIDGET_LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(0.1)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry[1]
+        # The lock holder is too slow or gone; compute without caching
+        return compute()
+
+    try:
+        data = compute()
+        cache.set(key, (time.time() + timeout, data), timeout * 2)
+    finally:
+        cache.delete(lock_key)
+    return data
@@ -113,7 +113,7 @@ class StudentAttendanceReportForm(ReportFilterForm):
         super().__init__(*args, **kwargs)
         from students.models import Student
         from courses.models import Class
-        self.fields['student'].queryset = Student.objects.filter(status='active')
+        self.fields['student'].queryset = Student.objects.filter(status='active').select_related('user')
         self.fields['class_session'].queryset = Class.objects.filter(is_active=True)
 
 class ClassAttendanceReportForm(ReportFilterForm):
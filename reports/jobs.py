@@ -0,0 +1,213 @@
+# reports/jobs.py
+"""
+Database-backed queue for report exports.
+
+Exports are stored as pending GeneratedReport rows. Worker processes
+(manage.py run_report_workers) claim them with a compare-and-set update on
+status, render the file with the same code as the synchronous export and
+save it under MEDIA_ROOT. While rendering, a worker refreshes the report's
+heartbeat_at every HEARTBEAT_INTERVAL. Every poll returns running reports
+whose heartbeat is older than stale_after to the queue, so a worker that
+dies is recovered by the others without restarting the pool, while a slow
+export that is still alive is left to finish.
+"""
+import logging
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.core.files import File
+from django.db import connection
+from django.db.models import F
+from django.utils import timezone
+
+from .models import GeneratedReport
+
+logger = logging.getLogger(__name__)
+
+# Export report type -> GeneratedReport.report_type
+EXPORT_REPORT_TYPES = {
+    'attendance': 'attendance_summary',
+    'student': 'student_attendance',
+    'class': 'class_attendance',
+}
+
+FILE_EXTENSIONS = {
+    'csv': 'csv',
+    'excel': 'xlsx',
+    'pdf': 'pdf',
+}
+
+MAX_ATTEMPTS = 3
+
+HEARTBEAT_INTERVAL = timedelta(minutes=1)
+
+STALE_AFTER = timedelta(minutes=5)
+
+
+def enqueue_export(user, report_type, export_format, filters, start_date=None, end_date=None,
+                   include_charts=True, include_summary=True, claimed_by=None):
+    """
+    Queue an export; filters are the raw filter form values.
+
+    With claimed_by the report is created already running under that worker
+    id, for callers that generate it themselves.
+    """
+    state = {'status': 'pending'}
+    if claimed_by:
+        now = timezone.now()
+        state = {
+            'status': 'running', 'worker_id': claimed_by, 'started_at': now, 'heartbeat_at': now, 'attempts': 1,
+        }
+    return GeneratedReport.objects.create(
+        report_type=EXPORT_REPORT_TYPES[report_type],
+        report_name=f'{report_type.title()} Report ({export_format.upper()})',
+        parameters={
+            'export': report_type,
+            'filters': filters,
+            'include_charts': include_charts,
+            'include_summary': include_summary,
+        },
+        start_date=start_date,
+        end_date=end_date,
+        file_format=export_format,
+        generated_by=user,
+        **state
+    )
+
+
+def claim_next_report(worker_id):
+    """Claim the oldest pending report, or return None when the queue is empty"""
+    while True:
+        report_id = GeneratedReport.objects.filter(
+            status='pending'
+        ).order_by('generated_at', 'id').values_list('id', flat=True).first()
+        if report_id is None:
+            return None
+
+        # Only one worker can move the row out of pending; the others retry
+        now = timezone.now()
+        claimed = GeneratedReport.objects.filter(id=report_id, status='pending').update(
+            status='running',
+            worker_id=worker_id,
+            started_at=now,
+            heartbeat_at=now,
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return GeneratedReport.objects.get(id=report_id)
+
+
+@contextmanager
+def heartbeat(report, interval):
+    """Refresh the report's heartbeat_at every interval until the block exits"""
+    stopped = threading.Event()
+
+    def beat():
+        # The thread has its own database connection, closed when it stops
+        try:
+            while not stopped.wait(interval.total_seconds()):
+                try:
+                    GeneratedReport.objects.filter(
+                        id=report.id, status='running', worker_id=report.worker_id
+                    ).update(heartbeat_at=timezone.now())
+                except Exception:
+                    logger.exception('Heartbeat for report %s failed', report.id)
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=beat, name=f'report-{report.id}-heartbeat', daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def generate_report(report):
+    """Render a claimed report to its file; returns True on success"""
+    from .views import EXPORT_FORMS, render_export
+
+    parameters = report.parameters
+    report_type = parameters.get('export')
+    try:
+        with heartbeat(report, HEARTBEAT_INTERVAL):
+            filter_form = EXPORT_FORMS[report_type][0](parameters.get('filters', {}))
+            if not filter_form.is_valid():
+                raise ValueError(f'Invalid report parameters: {filter_form.errors.as_text()}')
+
+            response = render_export(
+                filter_form, report_type, report.file_format,
+                parameters.get('include_charts', True), parameters.get('include_summary', True)
+            )
+            with tempfile.TemporaryFile() as output:
+                for chunk in response.streaming_content:
+                    output.write(chunk)
+                response.close()
+                file_size = output.tell()
+                output.seek(0)
+                report.file_path.save(
+                    f'{report_type}_report_{report.id}.{FILE_EXTENSIONS[report.file_format]}',
+                    File(output),
+                    save=False
+                )
+    except Exception as e:
+        logger.exception('Report %s failed', report.id)
+        report.status = 'failed'
+        report.error_message = str(e) or e.__class__.__name__
+        report.completed_at = timezone.now()
+        report.save(update_fields=['status', 'error_message', 'completed_at'])
+        return False
+
+    report.file_size = file_size
+    report.is_ready = True
+    report.status = 'completed'
+    report.error_message = ''
+    report.completed_at = timezone.now()
+    report.save(update_fields=['file_path', 'file_size', 'is_ready', 'status', 'error_message', 'completed_at'])
+    return True
+
+
+def requeue_stale_reports(timeout):
+    """
+    Return reports whose worker disappeared to the queue.
+
+    A report counts as abandoned once its heartbeat is older than timeout,
+    however long ago it was started.
+
+    Reports that have already been attempted MAX_ATTEMPTS times are marked
+    failed instead. Returns (requeued, failed) counts.
+    """
+    stale = GeneratedReport.objects.filter(status='running', heartbeat_at__lt=timezone.now() - timeout)
+    failed = stale.filter(attempts__gte=MAX_ATTEMPTS).update(
+        status='failed',
+        error_message='The worker stopped before the report was finished.',
+        completed_at=timezone.now(),
+    )
+    requeued = stale.filter(attempts__lt=MAX_ATTEMPTS).update(status='pending', worker_id='')
+    return requeued, failed
+
+
+def work(worker_id, poll_interval=2.0, once=False, stale_after=STALE_AFTER):
+    """Process queued reports until interrupted, or until the queue is empty with once=True"""
+    processed = 0
+    while True:
+        requeued, failed = requeue_stale_reports(stale_after)
+        if requeued or failed:
+            logger.warning('Worker %s requeued %d and failed %d abandoned reports', worker_id, requeued, failed)
+
+        report = claim_next_report(worker_id)
+        if report is None:
+            if once:
+                return processed
+            time.sleep(poll_interval)
+            continue
+
+        started = time.monotonic()
+        succeeded = generate_report(report)
+        processed += 1
+        logger.info('Worker %s %s report %s in %.1fs', worker_id,
+                    'finished' if succeeded else 'failed', report.id, time.monotonic() - started)
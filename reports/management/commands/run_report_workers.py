@@ -0,0 +1,69 @@
+import multiprocessing
+import os
+import socket
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+def worker_process(worker_id, poll_interval, once, stale_after):
+    # Spawned (non-forked) children start without a configured Django
+    import django
+    django.setup()
+
+    from reports.jobs import work
+    try:
+        work(worker_id, poll_interval=poll_interval, once=once, stale_after=stale_after)
+    except KeyboardInterrupt:
+        pass
+
+
+class Command(BaseCommand):
+    help = 'Run a pool of worker processes that generate queued report exports'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Number of worker processes (default: 2)')
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Seconds to wait when the queue is empty (default: 2)')
+        parser.add_argument('--stale-after', type=int, default=5,
+                            help='Minutes without a heartbeat after which a running report is considered '
+                                 'abandoned and returned to the queue; checked on every poll (default: 5)')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty')
+
+    def handle(self, *args, **options):
+        from reports.jobs import requeue_stale_reports
+
+        if options['workers'] < 1:
+            raise CommandError('--workers must be at least 1')
+
+        stale_after = timedelta(minutes=options['stale_after'])
+        requeued, failed = requeue_stale_reports(stale_after)
+        if requeued or failed:
+            self.stdout.write(f'Requeued {requeued} and failed {failed} abandoned reports')
+
+        # Children must open their own database connections
+        connections.close_all()
+
+        host = socket.gethostname()
+        processes = []
+        for index in range(options['workers']):
+            process = multiprocessing.Process(
+                target=worker_process,
+                args=(f'{host}:{os.getpid()}:{index}', options['poll_interval'], options['once'], stale_after),
+                daemon=True,
+            )
+            process.start()
+            processes.append(process)
+        self.stdout.write(f'Started {len(processes)} report workers')
+
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.join()
+
+        self.stdout.write(self.style.SUCCESS('Report workers stopped'))
@@ -0,0 +1,55 @@
+# Generated by Django 6.0.2 on 2026-10-17 11:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_ready_reports_completed(apps, schema_editor):
+    GeneratedReport = apps.get_model('reports', 'GeneratedReport')
+    GeneratedReport.objects.filter(is_ready=True).update(status='completed')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generatedreport',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='generatedreport',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='generatedreport',
+            name='error_message',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='generatedreport',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='generatedreport',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='generatedreport',
+            name='worker_id',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='generatedreport',
+            index=models.Index(fields=['status', 'generated_at'], name='reports_gen_status_4d1741_idx'),
+        ),
+        migrations.RunPython(mark_ready_reports_completed, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 6.0.2 on 2026-10-17 13:00
+
+import json
+
+from django.db import migrations
+
+
+def normalize_user_types(apps, schema_editor):
+    DashboardWidget = apps.get_model('reports', 'DashboardWidget')
+    for widget in DashboardWidget.objects.all():
+        value = widget.user_types
+        if isinstance(value, str):
+            try:
+                value = json.loads(value)
+            except json.JSONDecodeError:
+                value = value.split(',')
+            if isinstance(value, str):
+                value = [value]
+        if not isinstance(value, (list, tuple)):
+            value = []
+        user_types = list(dict.fromkeys(str(user_type).strip() for user_type in value if str(user_type).strip()))
+        if user_types != widget.user_types:
+            DashboardWidget.objects.filter(id=widget.id).update(user_types=user_types)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0002_generatedreport_job_queue'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_user_types, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 6.0.2 on 2026-10-17 15:00
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def start_running_heartbeats(apps, schema_editor):
+    # Running reports are aged from their start until their worker next beats
+    GeneratedReport = apps.get_model('reports', 'GeneratedReport')
+    GeneratedReport.objects.filter(status='running').update(heartbeat_at=F('started_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0003_normalize_widget_user_types'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generatedreport',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, help_text='Last sign of life from the worker', null=True),
+        ),
+        migrations.RunPython(start_running_heartbeats, migrations.RunPython.noop),
+    ]
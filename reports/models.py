@@ -2,6 +2,22 @@
 from django.db import models
 from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
+import json
+
+
+def normalize_user_types(value):
+    """Coerce a JSON list, JSON string or comma separated string to a list of user types"""
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            value = value.split(',')
+        if isinstance(value, str):
+            value = [value]
+    if not isinstance(value, (list, tuple)):
+        return []
+    return list(dict.fromkeys(str(user_type).strip() for user_type in value if str(user_type).strip()))
+
 
 class ReportTemplate(models.Model):
     """Predefined report templates"""
@@ -36,6 +52,13 @@ class GeneratedReport(models.Model):
         ('html', 'HTML'),
     )
     
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    )
+    
     template = models.ForeignKey(ReportTemplate, on_delete=models.SET_NULL, null=True, blank=True)
     report_type = models.CharField(max_length=50, choices=ReportTemplate.REPORT_TYPE_CHOICES)
     report_name = models.CharField(max_length=200)
@@ -63,8 +86,20 @@ class GeneratedReport(models.Model):
     is_ready = models.BooleanField(default=False)
     is_archived = models.BooleanField(default=False)
     
+    # Background generation
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    worker_id = models.CharField(max_length=100, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True, help_text="Last sign of life from the worker")
+    completed_at = models.DateTimeField(null=True, blank=True)
+    error_message = models.TextField(blank=True)
+    
     class Meta:
         ordering = ['-generated_at']
+        indexes = [
+            models.Index(fields=['status', 'generated_at']),
+        ]
     
     def __str__(self):
         return f"{self.report_name} - {self.generated_at.date()}"
@@ -115,6 +150,10 @@ class DashboardWidget(models.Model):
     
     def __str__(self):
         return f"{self.name} ({self.get_widget_type_display()})"
+    
+    def save(self, *args, **kwargs):
+        self.user_types = normalize_user_types(self.user_types)
+        super().save(*args, **kwargs)
 
 class ReportSchedule(models.Model):
     """Schedule automated report generation"""
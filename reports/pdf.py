@@ -0,0 +1,249 @@
+# reports/pdf.py
+"""
+PDF report rendering.
+
+Pages are drawn straight onto a ReportLab canvas as rows arrive from a
+chunked queryset iterator, so no flowable/document tree is built. ReportLab
+still keeps every finished page in memory until the canvas is saved, so
+nothing is streamed: tables stop after MAX_TABLE_ROWS rows, and exports
+with more rows than PDF_SYNC_MAX_ROWS are generated by the report workers
+rather than in the request. Chart images are rasterised in memory; the most
+recently used ones are kept in a small per-process cache.
+"""
+import json
+import tempfile
+from datetime import date, datetime
+from functools import lru_cache
+from io import BytesIO
+
+from django.http import FileResponse
+from PIL import Image, ImageDraw, ImageFont
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.units import mm
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+
+PAGE_SIZE = landscape(A4)
+MARGIN = 15 * mm
+ROW_HEIGHT = 13
+FONT = 'Helvetica'
+BOLD_FONT = 'Helvetica-Bold'
+FONT_SIZE = 8
+
+CHART_STATUSES = ('present', 'late', 'absent', 'excused')
+CHART_COLORS = {
+    'present': (40, 167, 69),
+    'late': (255, 193, 7),
+    'absent': (220, 53, 69),
+    'excused': (23, 162, 184),
+}
+CHART_SIZE = (1600, 440)
+CHART_MAX_LABELS = 16
+
+
+CHART_CACHE_SIZE = 32
+
+# Rows drawn in one table, bounding the pages held in memory (about 36 rows a page)
+MAX_TABLE_ROWS = 20000
+
+# Exports with more record rows than this are always queued for the report workers
+PDF_SYNC_MAX_ROWS = 2000
+
+
+def chart_image(series, statuses=CHART_STATUSES):
+    """
+    Stacked bar chart for series of (label, {status: count}), as an image
+    ReportLab can draw.
+
+    Rendered PNGs are cached by the plotted values, so the same report
+    parameters over unchanged data reuse the image.
+    """
+    values = [[str(label), [counts.get(status, 0) for status in statuses]] for label, counts in series]
+    return ImageReader(BytesIO(_chart_png(json.dumps([list(statuses), values]))))
+
+
+@lru_cache(maxsize=CHART_CACHE_SIZE)
+def _chart_png(plotted):
+    statuses, values = json.loads(plotted)
+    output = BytesIO()
+    _draw_chart(values, statuses).save(output, 'PNG')
+    return output.getvalue()
+
+
+def _draw_chart(values, statuses):
+    width, height = CHART_SIZE
+    left, right, top, bottom = 70, 20, 50, 50
+    image = Image.new('RGB', CHART_SIZE, 'white')
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default(size=18)
+
+    plot_width = width - left - right
+    plot_height = height - top - bottom
+    highest = max((sum(counts) for _, counts in values), default=0) or 1
+
+    draw.line([(left, top), (left, height - bottom), (width - right, height - bottom)], fill='black', width=2)
+    draw.text((left - 10, top), str(highest), fill='black', font=font, anchor='ra')
+    draw.text((left - 10, height - bottom), '0', fill='black', font=font, anchor='rs')
+
+    x = left
+    for status in statuses:
+        draw.rectangle([x, 12, x + 18, 30], fill=CHART_COLORS[status])
+        draw.text((x + 26, 21), status.title(), fill='black', font=font, anchor='lm')
+        x += 150
+
+    if not values:
+        return image
+
+    slot = plot_width / len(values)
+    bar_width = max(1, slot * 0.7)
+    label_step = max(1, -(-len(values) // CHART_MAX_LABELS))
+    for index, (label, counts) in enumerate(values):
+        x0 = left + index * slot + (slot - bar_width) / 2
+        y = height - bottom
+        for status, count in zip(statuses, counts):
+            if count:
+                bar_height = count / highest * plot_height
+                draw.rectangle([x0, y - bar_height, x0 + bar_width, y], fill=CHART_COLORS[status])
+                y -= bar_height
+        if index % label_step == 0:
+            draw.text((x0 + bar_width / 2, height - bottom + 8), label, fill='black', font=font, anchor='ma')
+    return image
+
+
+def _text(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M')
+    if isinstance(value, date):
+        return value.strftime('%Y-%m-%d')
+    return str(value)
+
+
+def _fit(text, width, font=FONT, size=FONT_SIZE):
+    """Truncate text so it fits within width points"""
+    # No Helvetica glyph is wider than 1.015em, so short text can skip measuring
+    if len(text) * size * 1.015 <= width or stringWidth(text, font, size) <= width:
+        return text
+    while text and stringWidth(text + '...', font, size) > width:
+        text = text[:-1]
+    return text + '...'
+
+
+class PDFReport:
+    """Canvas wrapper that lays out key figures, charts and paginated tables"""
+
+    def __init__(self, output, title, subtitle=''):
+        self.canvas = canvas.Canvas(output, pagesize=PAGE_SIZE, pageCompression=1)
+        self.canvas.setTitle(title)
+        self.title = title
+        self.subtitle = subtitle
+        self.width, self.height = PAGE_SIZE
+        self.page_number = 0
+        self.columns = None
+        self._start_page()
+
+    def _start_page(self):
+        self.page_number += 1
+        self.canvas.setFont(BOLD_FONT, 14)
+        self.canvas.drawString(MARGIN, self.height - MARGIN, self.title)
+        self.canvas.setFont(FONT, 9)
+        self.canvas.drawString(MARGIN, self.height - MARGIN - 14, self.subtitle)
+        self.canvas.drawRightString(self.width - MARGIN, MARGIN / 2, f'Page {self.page_number}')
+        self.y = self.height - MARGIN - 34
+        if self.columns:
+            self._table_header()
+
+    def _ensure_space(self, height):
+        if self.y - height < MARGIN:
+            self.canvas.showPage()
+            self._start_page()
+
+    def figures(self, rows):
+        """Draw (label, value) pairs as a block of key figures"""
+        for label, value in rows:
+            self._ensure_space(ROW_HEIGHT)
+            self.canvas.setFont(BOLD_FONT, 9)
+            self.canvas.drawString(MARGIN, self.y, str(label))
+            self.canvas.setFont(FONT, 9)
+            self.canvas.drawString(MARGIN + 120, self.y, _text(value))
+            self.y -= ROW_HEIGHT
+        self.y -= ROW_HEIGHT
+
+    def chart(self, series):
+        """Draw a cached stacked bar chart across the page width"""
+        width = self.width - 2 * MARGIN
+        height = width * CHART_SIZE[1] / CHART_SIZE[0]
+        self._ensure_space(height)
+        self.canvas.drawImage(chart_image(series), MARGIN, self.y - height, width=width, height=height)
+        self.y -= height + ROW_HEIGHT
+
+    def table(self, header, rows, weights=None, max_rows=MAX_TABLE_ROWS):
+        """Draw up to max_rows rows of a table, repeating the header on every page it spans"""
+        weights = weights or [1] * len(header)
+        available = self.width - 2 * MARGIN
+        x = MARGIN
+        self.columns = []
+        for title, weight in zip(header, weights):
+            width = available * weight / sum(weights)
+            self.columns.append((title, x, width))
+            x += width
+
+        self._ensure_space(ROW_HEIGHT * 2)
+        self._table_header()
+        # One text object per page is much cheaper than a drawString per cell
+        text = self.canvas.beginText()
+        text.setFont(FONT, FONT_SIZE)
+        truncated = False
+        for index, row in enumerate(rows):
+            if index == max_rows:
+                truncated = True
+                break
+            if self.y - ROW_HEIGHT < MARGIN:
+                self.canvas.drawText(text)
+                self.canvas.showPage()
+                self._start_page()
+                text = self.canvas.beginText()
+                text.setFont(FONT, FONT_SIZE)
+            for (_, x, width), value in zip(self.columns, row):
+                text.setTextOrigin(x + 2, self.y)
+                text.textOut(_fit(_text(value), width - 4))
+            self.y -= ROW_HEIGHT
+        self.canvas.drawText(text)
+        self.columns = None
+        if truncated:
+            self._ensure_space(ROW_HEIGHT)
+            self.canvas.setFont(BOLD_FONT, FONT_SIZE)
+            self.canvas.drawString(
+                MARGIN, self.y, f'Only the first {max_rows} rows are shown; export as CSV or Excel for all of them.'
+            )
+            self.y -= ROW_HEIGHT
+        self.y -= ROW_HEIGHT
+
+    def _table_header(self):
+        self.canvas.setFillColor(colors.HexColor('#e9ecef'))
+        self.canvas.rect(MARGIN, self.y - 3, self.width - 2 * MARGIN, ROW_HEIGHT, stroke=0, fill=1)
+        self.canvas.setFillColor(colors.black)
+        self.canvas.setFont(BOLD_FONT, FONT_SIZE)
+        for title, x, width in self.columns:
+            self.canvas.drawString(x + 2, self.y, _fit(title, width - 4, BOLD_FONT))
+        self.canvas.setFont(FONT, FONT_SIZE)
+        self.y -= ROW_HEIGHT
+
+    def save(self):
+        self.canvas.save()
+
+
+def pdf_response(filename, title, subtitle, build):
+    """
+    Render a PDFReport with build(report) into a temporary file and return it
+    as a FileResponse once complete
+    """
+    output = tempfile.TemporaryFile()
+    report = PDFReport(output, title, subtitle)
+    build(report)
+    report.save()
+    output.seek(0)
+    return FileResponse(output, as_attachment=True, filename=filename, content_type='application/pdf')
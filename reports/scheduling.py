@@ -0,0 +1,188 @@
+# reports/scheduling.py
+"""
+ReportSchedule execution.
+
+Due schedules are claimed by advancing next_run inside a locked
+transaction, so several scheduler processes never run the same occurrence
+twice. Each claimed schedule produces one GeneratedReport per output format
+through the export pipeline in reports.jobs, and the results are emailed to
+the schedule's recipients.
+"""
+import calendar
+from datetime import date, datetime, time, timedelta
+
+from django.core.mail import EmailMessage
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import User
+from .jobs import FILE_EXTENSIONS, enqueue_export
+from .models import ReportSchedule
+
+# ReportTemplate.report_type -> export report type
+SCHEDULE_EXPORT_TYPES = {
+    'attendance_summary': 'attendance',
+    'monthly_summary': 'attendance',
+    'student_attendance': 'student',
+    'class_attendance': 'class',
+    'instructor_report': 'class',
+}
+
+# Each run reports on the period that has just ended
+SCHEDULE_DATE_RANGES = {
+    'daily': 'yesterday',
+    'weekly': 'last_week',
+    'monthly': 'last_month',
+    'quarterly': 'last_quarter',
+    'yearly': 'last_year',
+}
+
+SCHEDULE_MONTHS = {
+    'monthly': range(1, 13),
+    'quarterly': (1, 4, 7, 10),
+    'yearly': (1,),
+}
+
+
+def _month_days(start, day_of_month, months):
+    """Yield the run day in each matching month from start's month onwards"""
+    year, month = start.year, start.month
+    for _ in range(13):
+        if month in months:
+            yield date(year, month, min(day_of_month, calendar.monthrange(year, month)[1]))
+        month += 1
+        if month > 12:
+            year, month = year + 1, 1
+
+
+def compute_next_run(schedule, after=None):
+    """
+    Next time the schedule is due strictly after `after` (default: now).
+
+    Weekly schedules default to Monday and monthly, quarterly and yearly
+    ones to the 1st; yearly schedules run in January. Custom schedules have
+    no rule and return None.
+    """
+    after = timezone.localtime(after or timezone.now())
+    today = after.date()
+
+    if schedule.frequency == 'daily':
+        days = [today, today + timedelta(days=1)]
+    elif schedule.frequency == 'weekly':
+        weekday = schedule.day_of_week if schedule.day_of_week is not None else 0
+        first = today + timedelta(days=(weekday - today.weekday()) % 7)
+        days = [first, first + timedelta(days=7)]
+    elif schedule.frequency in SCHEDULE_MONTHS:
+        days = _month_days(today, schedule.day_of_month or 1, SCHEDULE_MONTHS[schedule.frequency])
+    else:
+        return None
+
+    for day in days:
+        run = timezone.make_aware(datetime.combine(day, time(schedule.hour, schedule.minute)))
+        if run > after:
+            return run
+    return None
+
+
+def initialize_next_runs(now=None):
+    """Give active schedules that have never been planned their first next_run"""
+    planned = 0
+    for schedule in ReportSchedule.objects.filter(is_active=True, next_run__isnull=True).exclude(frequency='custom'):
+        next_run = compute_next_run(schedule, now)
+        planned += ReportSchedule.objects.filter(id=schedule.id, next_run__isnull=True).update(next_run=next_run)
+    return planned
+
+
+def claim_due_schedules(now=None, limit=20):
+    """Claim due schedules and advance their next_run; returns the claimed schedules"""
+    now = now or timezone.now()
+    claimed = []
+    with transaction.atomic():
+        due = ReportSchedule.objects.select_for_update(skip_locked=True, of=('self',)).select_related(
+            'report_template', 'created_by'
+        ).filter(is_active=True, next_run__lte=now).order_by('next_run')[:limit]
+
+        for schedule in due:
+            next_run = compute_next_run(schedule, now)
+            # The compare-and-set on next_run also protects databases without row locks
+            updated = ReportSchedule.objects.filter(id=schedule.id, next_run=schedule.next_run).update(
+                last_run=now, next_run=next_run
+            )
+            if updated:
+                schedule.last_run, schedule.next_run = now, next_run
+                claimed.append(schedule)
+    return claimed
+
+
+def schedule_filters(schedule):
+    """Export report type and filter form values for a schedule's template"""
+    from .views import EXPORT_FORMS
+
+    template = schedule.report_template
+    export_type = SCHEDULE_EXPORT_TYPES.get(template.report_type, 'attendance')
+    form_class = EXPORT_FORMS[export_type][0]
+
+    filters = {
+        name: field.initial for name, field in form_class().fields.items() if field.initial is not None
+    }
+    filters['date_range'] = SCHEDULE_DATE_RANGES.get(schedule.frequency, 'this_month')
+    filters.update({
+        name: value for name, value in (template.parameters or {}).items() if name in form_class.base_fields
+    })
+    return export_type, filters
+
+
+def output_formats(schedule):
+    formats = [fmt for fmt in (schedule.output_formats or []) if fmt in FILE_EXTENSIONS]
+    return formats or ['pdf']
+
+
+def create_schedule_reports(schedule, worker_id):
+    """Create one GeneratedReport per output format, claimed by worker_id"""
+    from .views import _get_date_range
+
+    export_type, filters = schedule_filters(schedule)
+    start_date, end_date = _get_date_range(filters['date_range'], None, None)
+    reports = []
+    for export_format in output_formats(schedule):
+        report = enqueue_export(
+            schedule.created_by, export_type, export_format, filters, start_date, end_date,
+            include_charts=filters.get('include_charts', True), claimed_by=worker_id
+        )
+        report.template = schedule.report_template
+        report.report_name = f'{schedule.name} ({export_format.upper()})'
+        report.save(update_fields=['template', 'report_name'])
+        reports.append(report)
+    return reports
+
+
+def schedule_recipients(schedule):
+    recipients = schedule.email_recipients or []
+    if isinstance(recipients, str):
+        recipients = recipients.split(',')
+    recipients = [email.strip() for email in recipients if email and email.strip()]
+
+    if schedule.notify_users:
+        recipients += User.objects.filter(
+            id__in=schedule.notify_users, is_active=True
+        ).exclude(email='').values_list('email', flat=True)
+    return list(dict.fromkeys(recipients))
+
+
+def send_schedule_email(schedule, reports):
+    """Email the generated files to the schedule's recipients; returns the number sent"""
+    recipients = schedule_recipients(schedule)
+    if not recipients:
+        return 0
+
+    lines = [f'Scheduled report "{schedule.name}" ran at {timezone.localtime(schedule.last_run):%d/%m/%Y %H:%M}.', '']
+    message = EmailMessage(subject=f'{schedule.name} - {timezone.localdate():%d/%m/%Y}', to=recipients)
+    for report in reports:
+        if report.is_ready:
+            with report.file_path.open('rb') as report_file:
+                message.attach(report.file_path.name.rsplit('/', 1)[-1], report_file.read())
+            lines.append(f'- {report.get_file_format_display()}: attached')
+        else:
+            lines.append(f'- {report.get_file_format_display()}: failed ({report.error_message})')
+    message.body = '\n'.join(lines)
+    return message.send()
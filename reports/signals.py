@@ -0,0 +1,14 @@
+# reports/signals.py
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import invalidate_dashboard_widgets
+from .models import DashboardWidget
+
+
+@receiver(post_save, sender=DashboardWidget)
+@receiver(post_delete, sender=DashboardWidget)
+def dashboard_widget_changed(sender, **kwargs):
+    # After commit, so a concurrent rebuild cannot cache the old rows again
+    transaction.on_commit(invalidate_dashboard_widgets)
@@ -1,3 +1,663 @@
-from django.test import TestCase
+import os
+import pickle
+import re
+import tempfile
+import time as time_module
+import zipfile
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from io import BytesIO
+from unittest import mock
+from xml.etree import ElementTree
 
-# Create your tests here.
+from django.conf import settings
+from django.core import mail
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from attendance.models import AttendanceRecord
+from tvet_attendance.testing import (
+    QueryBudgetTestMixin, create_class, create_course, create_session, create_student, create_user,
+)
+from . import cache as report_cache, jobs, pdf, scheduling, views, xlsx
+from .models import DashboardWidget, GeneratedReport, ReportSchedule, ReportTemplate
+from .views import _class_report_data
+
+SHEET_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+
+
+# Budgeted views that fail before their query count means anything
+BROKEN_VIEWS = {
+    'reports:class_attendance_report': 'reports/class_attendance_report.html does not exist',
+    'reports:view_saved': 'reports/view_saved.html does not exist',
+}
+
+
+class QueryBudgetTests(QueryBudgetTestMixin, TransactionTestCase):
+    """Budgeted report views run a fixed number of queries however much attendance there is"""
+
+    def setUp(self):
+        self.today = date.today()
+        self.enterContext(override_settings(MEDIA_ROOT=self.enterContext(tempfile.TemporaryDirectory())))
+        self.admin = create_user('admin', 'admin', is_staff=True, is_superuser=True)
+        self.instructor = create_user('instructor', 'instructor')
+        self.course = create_course()
+        self.students = []
+        self.grow(3)
+        self.report = GeneratedReport.objects.create(
+            report_type='attendance', report_name='Export', generated_by=self.admin,
+            file_format='csv', status='completed', is_ready=True,
+        )
+        self.report.file_path.save('export.csv', ContentFile(b'date,status\n'))
+        self.widget = DashboardWidget.objects.create(
+            name='Students', widget_type='student_stats', user_types=['admin'],
+        )
+
+    def grow(self, count):
+        """Add a class of count students, all marked present today"""
+        class_obj = create_class(self.course, self.instructor)
+        start = len(self.students)
+        students = [
+            create_student(self.course, f'ADM{index:03}', class_obj) for index in range(start, start + count)
+        ]
+        session = create_session(class_obj, self.today, time(8))
+        for student in students:
+            AttendanceRecord.objects.create(session=session, student=student, status='present')
+        self.students += students
+
+    def requests(self):
+        report_filters = {'date_range': 'this_month', 'report_type': 'summary', 'group_by': 'student'}
+        return [
+            (self.admin, 'get', 'reports:dashboard', [], {}),
+            (self.admin, 'get', 'reports:attendance_report', [], report_filters),
+            (self.admin, 'get', 'reports:student_attendance_report', [], {'date_range': 'this_month'}),
+            (self.admin, 'post', 'reports:export_report', ['attendance'], {
+                **report_filters, 'export_format': 'csv',
+            }),
+            (self.admin, 'get', 'reports:report_job', [self.report.id], {}),
+            (self.admin, 'get', 'reports:report_job_status', [self.report.id], {}),
+            (self.admin, 'get', 'reports:download_report', [self.report.id], {}),
+            (self.admin, 'post', 'reports:save_report', [], {
+                'report_name': 'Saved', 'report_type': 'attendance', 'parameters': '{}', 'data': '{}',
+            }),
+            (self.admin, 'get', 'reports:widget_data', [self.widget.id], {}),
+            (self.admin, 'get', 'reports:quick_report', [], {'type': 'today'}),
+        ]
+
+    def test_query_counts_do_not_grow_with_the_attendance(self):
+        few = self.budgeted_query_counts(self.requests())
+        self.grow(7)
+
+        self.assertEqual(self.budgeted_query_counts(self.requests()), few)
+
+    @override_settings(REPORT_EXPORTS_IN_BACKGROUND=False)
+    def test_streamed_export_queries_are_counted(self):
+        # A plain client, so the body is still unread when the response comes back
+        client = Client()
+        client.force_login(self.admin)
+
+        response = client.post(reverse('reports:export_report', args=['attendance']), {
+            'date_range': 'this_month', 'report_type': 'summary', 'group_by': 'day', 'export_format': 'csv',
+        })
+        before_streaming = response.query_count
+        content = b''.join(response.streaming_content)
+
+        self.assertEqual(content.count(b'\n'), len(self.students) + 1)
+        self.assertGreater(response.query_count, before_streaming)
+
+    def test_every_budgeted_view_is_requested(self):
+        self.assertBudgetsCovered('reports', self.requests(), BROKEN_VIEWS)
+
+    def test_broken_views(self):
+        for name, reason in BROKEN_VIEWS.items():
+            with self.subTest(view=name):
+                self.skipTest(reason)
+
+
+class XLSXTests(TestCase):
+    """stream_xlsx writes typed, multi-sheet workbooks while consuming rows lazily"""
+
+    def workbook(self, chunks):
+        archive = zipfile.ZipFile(BytesIO(b''.join(chunks)))
+        workbook = ElementTree.fromstring(archive.read('xl/workbook.xml'))
+        names = [sheet.get('name') for sheet in workbook.iter(f'{SHEET_NS}sheet')]
+        sheets = {}
+        for index, name in enumerate(names, start=1):
+            sheet = ElementTree.fromstring(archive.read(f'xl/worksheets/sheet{index}.xml'))
+            sheets[name] = [
+                [(cell.get('r'), cell.get('t'), cell.get('s'), ''.join(cell.itertext())) for cell in row]
+                for row in sheet.iter(f'{SHEET_NS}row')
+            ]
+        return sheets
+
+    def test_typed_cells_and_sheets(self):
+        sheets = self.workbook(xlsx.stream_xlsx([
+            ('Records', ['Date', 'Count', 'Note'], [[date(2026, 3, 2), 3, 'A & B\x01'], [None, 2.5, '']]),
+            ('Summary', ['Metric', 'Value'], iter([['Rate', Decimal('87.50')]])),
+        ]))
+
+        self.assertEqual(list(sheets), ['Records', 'Summary'])
+        header, first, second = sheets['Records']
+        self.assertEqual(header[0], ('A1', 'inlineStr', str(xlsx.STYLE_HEADER), 'Date'))
+        self.assertEqual(first, [
+            ('A2', None, str(xlsx.STYLE_DATE), str((date(2026, 3, 2) - date(1899, 12, 30)).days)),
+            ('B2', None, None, '3'),
+            ('C2', 'inlineStr', None, 'A & B'),
+        ])
+        # Empty cells are left out
+        self.assertEqual(second, [('B3', None, None, '2.5')])
+        self.assertEqual(sheets['Summary'][1][1], ('B2', None, None, '87.50'))
+
+    def test_rows_are_consumed_as_their_sheet_is_written(self):
+        consumed = []
+
+        def rows():
+            for number in range(xlsx.ROWS_PER_FLUSH * 2 + 1):
+                consumed.append(number)
+                yield [number]
+
+        stream = xlsx.stream_xlsx([('Numbers', ['N'], rows())])
+        chunks = [next(stream)]
+        self.assertEqual(consumed, [])
+
+        chunks.append(next(stream))
+        self.assertEqual(len(consumed), xlsx.ROWS_PER_FLUSH)
+
+        chunks += list(stream)
+        self.assertEqual(len(self.workbook(chunks)['Numbers']), xlsx.ROWS_PER_FLUSH * 2 + 2)
+
+    def test_column_letters(self):
+        self.assertEqual(
+            [xlsx.column_letter(index) for index in (0, 25, 26, 701, 702)], ['A', 'Z', 'AA', 'ZZ', 'AAA']
+        )
+
+    @override_settings(REPORT_EXPORTS_IN_BACKGROUND=False)
+    def test_attendance_export_has_records_summary_and_class_sheets(self):
+        admin = create_user('admin', 'admin', is_staff=True)
+        class_obj = create_class(create_course(), create_user('instructor', 'instructor'))
+        session = create_session(class_obj, date.today())
+        for index, status in enumerate(['present', 'late', 'absent']):
+            student = create_student(class_obj.course, f'ADM{index:03}', class_obj)
+            AttendanceRecord.objects.create(session=session, student=student, status=status)
+        self.client.force_login(admin)
+
+        response = self.client.post(reverse('reports:export_report', args=['attendance']), {
+            'date_range': 'today', 'report_type': 'summary', 'group_by': 'day', 'export_format': 'excel',
+        })
+
+        self.assertEqual(response['Content-Type'], xlsx.XLSX_CONTENT_TYPE)
+        sheets = self.workbook(response.streaming_content)
+        self.assertEqual(list(sheets), ['Records', 'Summary', 'By Class'])
+        # Column E is the status; empty cells are left out so it is looked up by reference
+        statuses = [
+            text for row in sheets['Records'][1:] for ref, _, _, text in row if ref.startswith('E')
+        ]
+        self.assertEqual(statuses, ['Present', 'Late', 'Absent'])
+
+
+class PDFChartTests(TestCase):
+    """PDF charts are rendered in memory and cached in a bounded per-process cache"""
+
+    def setUp(self):
+        pdf._chart_png.cache_clear()
+        self.media_root = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(MEDIA_ROOT=self.media_root))
+
+    def test_charts_are_cached_in_memory(self):
+        series = [('Mon', {'present': 3, 'late': 1}), ('Tue', {'absent': 2})]
+
+        first = pdf.chart_image(series)
+        pdf.chart_image(series)
+        pdf.chart_image(series[:1])
+
+        self.assertEqual(first.getSize(), pdf.CHART_SIZE)
+        info = pdf._chart_png.cache_info()
+        self.assertEqual((info.hits, info.misses, info.maxsize), (1, 2, pdf.CHART_CACHE_SIZE))
+
+    @override_settings(REPORT_EXPORTS_IN_BACKGROUND=False)
+    def test_pdf_export_writes_nothing_under_media_root(self):
+        class_obj = create_class(create_course(), create_user('instructor', 'instructor'))
+        student = create_student(class_obj.course, 'ADM000', class_obj)
+        AttendanceRecord.objects.create(
+            session=create_session(class_obj, date.today()), student=student, status='present'
+        )
+        self.client.force_login(create_user('admin', 'admin', is_staff=True))
+
+        response = self.client.post(reverse('reports:export_report', args=['attendance']), {
+            'date_range': 'today', 'report_type': 'summary', 'group_by': 'day',
+            'export_format': 'pdf', 'include_charts': 'on',
+        })
+
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+        self.assertEqual(pdf._chart_png.cache_info().currsize, 1)
+        self.assertEqual(os.listdir(self.media_root), [])
+
+
+@override_settings(REPORT_EXPORTS_IN_BACKGROUND=False)
+class PDFExportTests(TestCase):
+    """PDF tables are capped in pages and large PDFs are left to the report workers"""
+
+    def setUp(self):
+        self.enterContext(override_settings(MEDIA_ROOT=self.enterContext(tempfile.TemporaryDirectory())))
+        today = date.today()
+        class_obj = create_class(create_course(), create_user('instructor', 'instructor'))
+        students = [create_student(class_obj.course, f'ADM{index:03}', class_obj) for index in range(10)]
+        for offset in range(30):
+            session = create_session(class_obj, today - timedelta(days=offset))
+            AttendanceRecord.objects.bulk_create([
+                AttendanceRecord(session=session, student=student, session_date=session.session_date,
+                                 class_session=class_obj, status='present')
+                for student in students
+            ])
+        self.client.force_login(create_user('admin', 'admin', is_staff=True))
+        self.url = reverse('reports:export_report', args=['attendance'])
+        self.export = {
+            'date_range': 'custom', 'start_date': (today - timedelta(days=29)).isoformat(),
+            'end_date': today.isoformat(), 'report_type': 'summary', 'group_by': 'day', 'export_format': 'pdf',
+        }
+
+    def pages(self):
+        content = b''.join(self.client.post(self.url, self.export).streaming_content)
+        return len(re.findall(rb'/Type /Page\b(?!s)', content))
+
+    def test_tables_stop_at_max_rows(self):
+        # 300 rows take nine pages at 36 rows a page
+        self.assertEqual(self.pages(), 9)
+        with mock.patch.object(views, 'MAX_TABLE_ROWS', 30):
+            self.assertEqual(self.pages(), 1)
+
+    def test_large_pdfs_are_queued(self):
+        with mock.patch.object(views, 'PDF_SYNC_MAX_ROWS', 100):
+            response = self.client.post(self.url, self.export)
+
+        report = GeneratedReport.objects.get()
+        self.assertRedirects(response, reverse('reports:report_job', args=[report.id]))
+        self.assertEqual((report.file_format, report.status), ('pdf', 'pending'))
+
+        # Other formats stream, and smaller PDFs are still rendered in the request
+        self.assertTrue(self.client.post(self.url, {**self.export, 'export_format': 'csv'}).streaming)
+        self.assertTrue(self.client.post(self.url, self.export).streaming)
+
+
+class ReportJobTests(TestCase):
+    """Workers claim queued exports and recover reports abandoned by a dead worker"""
+
+    def setUp(self):
+        self.enterContext(override_settings(MEDIA_ROOT=self.enterContext(tempfile.TemporaryDirectory())))
+        self.admin = create_user('admin', 'admin', is_staff=True)
+        class_obj = create_class(create_course(), create_user('instructor', 'instructor'))
+        student = create_student(class_obj.course, 'ADM000', class_obj)
+        AttendanceRecord.objects.create(
+            session=create_session(class_obj, date.today()), student=student, status='present'
+        )
+
+    def enqueue(self, **options):
+        filters = {'date_range': 'today', 'report_type': 'summary', 'group_by': 'day'}
+        return jobs.enqueue_export(self.admin, 'attendance', 'csv', filters, **options)
+
+    def abandon(self, report, attempts=1):
+        last_seen = timezone.now() - jobs.STALE_AFTER - timedelta(minutes=1)
+        GeneratedReport.objects.filter(id=report.id).update(
+            status='running', worker_id='dead', attempts=attempts, started_at=last_seen, heartbeat_at=last_seen,
+        )
+
+    def test_worker_generates_queued_reports(self):
+        report = self.enqueue()
+
+        self.assertEqual(jobs.work('worker', once=True), 1)
+
+        report.refresh_from_db()
+        self.assertEqual((report.status, report.worker_id, report.attempts), ('completed', 'worker', 1))
+        self.assertTrue(report.is_ready)
+        with report.file_path.open('rb') as output:
+            self.assertEqual(output.read().count(b'\n'), 2)
+
+    def test_polling_requeues_abandoned_reports(self):
+        abandoned = self.enqueue()
+        self.abandon(abandoned)
+        running = self.enqueue(claimed_by='alive')
+
+        self.assertEqual(jobs.work('worker', once=True), 1)
+
+        abandoned.refresh_from_db()
+        self.assertEqual((abandoned.status, abandoned.worker_id, abandoned.attempts), ('completed', 'worker', 2))
+        running.refresh_from_db()
+        self.assertEqual((running.status, running.worker_id), ('running', 'alive'))
+
+    def test_slow_reports_that_still_beat_are_not_requeued(self):
+        report = self.enqueue(claimed_by='slow')
+        GeneratedReport.objects.filter(id=report.id).update(started_at=timezone.now() - timedelta(hours=2))
+
+        self.assertEqual(jobs.requeue_stale_reports(jobs.STALE_AFTER), (0, 0))
+        report.refresh_from_db()
+        self.assertEqual((report.status, report.worker_id), ('running', 'slow'))
+
+    def test_reports_out_of_attempts_fail(self):
+        report = self.enqueue()
+        self.abandon(report, attempts=jobs.MAX_ATTEMPTS)
+
+        self.assertEqual(jobs.work('worker', once=True), 0)
+
+        report.refresh_from_db()
+        self.assertEqual(report.status, 'failed')
+        self.assertFalse(report.is_ready)
+
+
+class ReportHeartbeatTests(TransactionTestCase):
+    """A worker keeps its report's heartbeat fresh for as long as it renders"""
+
+    def setUp(self):
+        self.enterContext(override_settings(MEDIA_ROOT=self.enterContext(tempfile.TemporaryDirectory())))
+        filters = {'date_range': 'today', 'report_type': 'summary', 'group_by': 'day'}
+        self.report = jobs.enqueue_export(
+            create_user('admin', 'admin', is_staff=True), 'attendance', 'csv', filters, claimed_by='slow'
+        )
+
+    def test_heartbeats_continue_while_rendering(self):
+        render_export = views.render_export
+        beats = []
+
+        def slow_render(*args):
+            # Rendering outlasts several intervals and the stale timeout
+            for _ in range(3):
+                time_module.sleep(0.2)
+                beats.append(GeneratedReport.objects.get(id=self.report.id).heartbeat_at)
+                self.assertEqual(jobs.requeue_stale_reports(timedelta(seconds=0.15)), (0, 0))
+            return render_export(*args)
+
+        with mock.patch.object(jobs, 'HEARTBEAT_INTERVAL', timedelta(seconds=0.05)), \
+                mock.patch.object(views, 'render_export', slow_render):
+            self.assertTrue(jobs.generate_report(self.report))
+
+        self.assertEqual(len(set(beats)), 3)
+        self.report.refresh_from_db()
+        self.assertEqual(self.report.status, 'completed')
+
+
+class ReportScheduleTests(TestCase):
+    """Due schedules are claimed once, generate every output format and email the files"""
+
+    def setUp(self):
+        self.enterContext(override_settings(MEDIA_ROOT=self.enterContext(tempfile.TemporaryDirectory())))
+        self.admin = create_user('admin', 'admin', is_staff=True, email='admin@example.com')
+        self.template = ReportTemplate.objects.create(name='Daily', report_type='attendance_summary')
+
+    def schedule(self, frequency='daily', **extra):
+        return ReportSchedule.objects.create(
+            name=f'{frequency.title()} attendance', report_template=self.template, frequency=frequency,
+            created_by=self.admin, **extra
+        )
+
+    def at(self, *args):
+        return timezone.make_aware(datetime(*args))
+
+    def test_next_run(self):
+        # Wednesday 4 March 2026, after the 09:00 run time
+        after = self.at(2026, 3, 4, 10)
+        cases = [
+            ('daily', {}, self.at(2026, 3, 5, 9)),
+            ('weekly', {}, self.at(2026, 3, 9, 9)),
+            ('weekly', {'day_of_week': 2, 'hour': 11}, self.at(2026, 3, 4, 11)),
+            ('monthly', {'day_of_month': 31}, self.at(2026, 3, 31, 9)),
+            ('quarterly', {}, self.at(2026, 4, 1, 9)),
+            ('yearly', {}, self.at(2027, 1, 1, 9)),
+            ('custom', {}, None),
+        ]
+        for frequency, extra, expected in cases:
+            with self.subTest(frequency=frequency, **extra):
+                self.assertEqual(scheduling.compute_next_run(self.schedule(frequency, **extra), after), expected)
+
+        # Short months run on their last day
+        monthly = self.schedule('monthly', day_of_month=31)
+        self.assertEqual(scheduling.compute_next_run(monthly, self.at(2026, 4, 1)), self.at(2026, 4, 30, 9))
+
+    def test_due_schedules_are_claimed_once(self):
+        now = timezone.now()
+        due = self.schedule(next_run=now - timedelta(minutes=1))
+        self.schedule(next_run=now + timedelta(hours=1))
+        self.schedule(next_run=now - timedelta(minutes=1), is_active=False)
+
+        self.assertEqual([schedule.id for schedule in scheduling.claim_due_schedules(now)], [due.id])
+        self.assertEqual(scheduling.claim_due_schedules(now), [])
+
+        due.refresh_from_db()
+        self.assertEqual(due.last_run, now)
+        self.assertEqual(due.next_run, scheduling.compute_next_run(due, now))
+
+    def test_unplanned_schedules_get_a_first_run(self):
+        schedule = self.schedule()
+        self.schedule('custom')
+
+        self.assertEqual(scheduling.initialize_next_runs(), 1)
+        schedule.refresh_from_db()
+        self.assertGreater(schedule.next_run, timezone.now())
+
+    def test_schedule_reports_are_generated_and_emailed(self):
+        schedule = self.schedule(
+            output_formats=['csv', 'pdf', 'html'], email_recipients=['office@example.com', 'admin@example.com'],
+            notify_users=[self.admin.id], next_run=timezone.now() - timedelta(minutes=1),
+        )
+        [schedule] = scheduling.claim_due_schedules()
+
+        reports = scheduling.create_schedule_reports(schedule, 'scheduler')
+        for report in reports:
+            jobs.generate_report(report)
+
+        self.assertEqual([report.file_format for report in reports], ['csv', 'pdf'])
+        self.assertEqual({report.parameters['filters']['date_range'] for report in reports}, {'yesterday'})
+        self.assertEqual(scheduling.send_schedule_email(schedule, reports), 1)
+        [message] = mail.outbox
+        self.assertEqual(message.to, ['office@example.com', 'admin@example.com'])
+        self.assertEqual(
+            [name for name, _, _ in message.attachments],
+            [f'attendance_report_{report.id}.{ext}' for report, ext in zip(reports, ['csv', 'pdf'])]
+        )
+
+
+class ReportCacheTests(TestCase):
+    """Report results are cached against shared version stamps and hold only plain values"""
+
+    def setUp(self):
+        self.today = date.today()
+        caches[report_cache.RESULTS_CACHE].clear()
+        caches[report_cache.VERSIONS_CACHE].clear()
+        self.computed = 0
+
+    def compute(self):
+        self.computed += 1
+        return {'computed': self.computed}
+
+    def report(self, class_ids=None, **cleaned_data):
+        return report_cache.cached_report('test', cleaned_data, self.today, self.today, class_ids, self.compute)
+
+    def test_results_are_cached_until_a_covered_scope_changes(self):
+        self.assertEqual(self.report([1]), {'computed': 1})
+        self.assertEqual(self.report([1]), {'computed': 1})
+
+        report_cache.invalidate_report_scopes([(self.today - timedelta(days=1), 1), (self.today, 2)])
+        self.assertEqual(self.report([1]), {'computed': 1})
+
+        report_cache.invalidate_report_scopes([(self.today, 1)])
+        self.assertEqual(self.report([1]), {'computed': 2})
+        # Every class's change invalidates reports over all classes
+        self.report()
+        report_cache.invalidate_report_scopes([(self.today, 2)])
+        self.assertEqual(self.report(), {'computed': 4})
+
+    def test_evicted_stamps_invalidate_results(self):
+        self.report([1])
+        report_cache.invalidate_report_scopes([(self.today, 1)])
+        self.report([1])
+
+        # Losing the stamp must not bring back the version the first result was stored under
+        caches[report_cache.VERSIONS_CACHE].clear()
+        self.assertEqual(self.report([1]), {'computed': 3})
+        self.assertEqual(self.report([1]), {'computed': 3})
+
+    def test_per_process_version_stamps_disable_the_cache(self):
+        with override_settings(CACHES={**settings.CACHES, 'report_versions': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'versions',
+        }}):
+            self.assertFalse(report_cache.report_cache_enabled())
+            self.report()
+            self.assertEqual(self.report(), {'computed': 2})
+
+    def test_repeated_requests_are_served_from_the_cache_by_default(self):
+        self.assertTrue(report_cache.report_cache_enabled())
+        class_obj = create_class(create_course(), create_user('instructor', 'instructor'))
+        AttendanceRecord.objects.create(
+            session=create_session(class_obj, self.today),
+            student=create_student(class_obj.course, 'ADM000', class_obj),
+            status='present',
+        )
+        self.client.force_login(create_user('admin', 'admin', is_staff=True))
+        url = reverse('reports:attendance_report')
+
+        with mock.patch.object(views, '_attendance_report_data', wraps=views._attendance_report_data) as compute:
+            params = {'date_range': 'today', 'report_type': 'summary', 'group_by': 'day'}
+            first = self.client.get(url, params)
+            second = self.client.get(url, params)
+
+        compute.assert_called_once()
+        self.assertEqual(second.context['summary'], first.context['summary'])
+
+    def test_student_report_caches_plain_values(self):
+        class_obj = create_class(create_course(), create_user('instructor', 'instructor'))
+        student = create_student(class_obj.course, 'ADM000', class_obj)
+        AttendanceRecord.objects.create(
+            session=create_session(class_obj, self.today), student=student, status='late'
+        )
+        self.client.force_login(create_user('admin', 'admin', is_staff=True))
+        url = reverse('reports:student_attendance_report')
+
+        response = self.client.get(url, {'date_range': 'today'})
+        # Session, user and the form's student and class choices; no report queries
+        with self.assertNumQueries(4):
+            cached = self.client.get(url, {'date_range': 'today'})
+
+        [key] = [key for key in caches[report_cache.RESULTS_CACHE]._cache if ':student_attendance_report:' in key]
+        data = caches[report_cache.RESULTS_CACHE].get(key.split(':', 2)[2])[1]
+        self.assertNotIn(b'django.db.models', pickle.dumps(data))
+        [student_data] = data['grouped_data']
+        self.assertEqual(student_data['student']['admission_number'], 'ADM000')
+        self.assertEqual([record['status_display'] for record in student_data['records']], ['Late'])
+        self.assertEqual(cached.context['grouped_data'], response.context['grouped_data'])
+        self.assertContains(cached, 'ADM000')
+
+
+class WidgetDataCacheTests(TestCase):
+    """Widget data is computed once per refresh interval and served stale while recomputing"""
+
+    def setUp(self):
+        caches[report_cache.WIDGETS_CACHE].clear()
+        self.widget = DashboardWidget.objects.create(
+            name='Students', widget_type='student_stats', user_types=['admin'], refresh_interval=5,
+        )
+        self.computed = 0
+
+    def compute(self):
+        self.computed += 1
+        return {'computed': self.computed}
+
+    def data(self, at=None):
+        with mock.patch.object(report_cache.time, 'time', return_value=at or time_module.time()):
+            return report_cache.cached_widget_data(self.widget, self.compute)
+
+    def lock(self, at=None):
+        # The patched clock is also the one LocMemCache expires entries by
+        with mock.patch.object(report_cache.time, 'time', return_value=at or time_module.time()):
+            caches[report_cache.WIDGETS_CACHE].add(f'{report_cache._widget_key(self.widget)}:lock', True)
+
+    def test_data_is_recomputed_once_per_refresh_interval(self):
+        now = time_module.time()
+        self.assertEqual(self.data(now), {'computed': 1})
+        self.assertEqual(self.data(now + 4 * 60), {'computed': 1})
+        self.assertEqual(self.data(now + 5 * 60 + 1), {'computed': 2})
+
+    def test_editing_the_widget_recomputes(self):
+        self.data()
+        self.widget.refresh_interval = 10
+        self.widget.save()
+
+        self.assertEqual(self.data(), {'computed': 2})
+
+    def test_stale_data_is_served_while_another_request_recomputes(self):
+        now = time_module.time()
+        self.data(now)
+        self.lock(now + 5 * 60)
+
+        self.assertEqual(self.data(now + 5 * 60 + 1), {'computed': 1})
+        self.assertEqual(self.computed, 1)
+
+    @mock.patch.object(report_cache, 'WIDGET_LOCK_WAIT', 0.2)
+    def test_requests_without_data_compute_when_the_lock_holder_is_slow(self):
+        self.lock()
+
+        self.assertEqual(self.data(), {'computed': 1})
+        self.assertEqual(self.data(), {'computed': 2})
+
+
+class DashboardWidgetMapTests(TestCase):
+    """The cached widget map follows widget changes in this process and expires for the others"""
+
+    def setUp(self):
+        caches[report_cache.WIDGETS_CACHE].clear()
+        self.widget = DashboardWidget.objects.create(
+            name='Students', widget_type='student_stats', user_types=['admin', 'instructor'],
+        )
+
+    def widgets(self, user_type, at=None):
+        with mock.patch.object(report_cache.time, 'time', return_value=at or time_module.time()):
+            return [widget.id for widget in report_cache.dashboard_widgets(user_type)]
+
+    def test_saving_a_widget_drops_the_map(self):
+        self.assertEqual(self.widgets('instructor'), [self.widget.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.widget.user_types = ['admin']
+            self.widget.save()
+
+        self.assertEqual(self.widgets('instructor'), [])
+        self.assertEqual(self.widgets('admin'), [self.widget.id])
+
+    def test_map_expires_when_the_change_was_made_elsewhere(self):
+        now = time_module.time()
+        self.assertEqual(self.widgets('admin', now), [self.widget.id])
+
+        # As another process would: the change never reaches this process's cache
+        DashboardWidget.objects.filter(id=self.widget.id).update(is_active=False)
+
+        self.assertEqual(self.widgets('admin', now + report_cache.WIDGET_MAP_TIMEOUT - 1), [self.widget.id])
+        self.assertEqual(self.widgets('admin', now + report_cache.WIDGET_MAP_TIMEOUT + 1), [])
+
+
+class ClassReportDataTests(TestCase):
+    """The class report counts each class's records in the date range"""
+
+    def test_counts_per_class(self):
+        instructor = create_user('instructor', 'instructor')
+        course = create_course()
+        classes = [create_class(course, instructor), create_class(course, instructor)]
+        today = date.today()
+        for index, status in enumerate(['present', 'late', 'absent']):
+            student = create_student(course, f'ADM{index:03}', classes[0])
+            AttendanceRecord.objects.create(session=create_session(classes[0], today, time(8 + index * 2)),
+                                            student=student, status=status)
+        AttendanceRecord.objects.create(
+            session=create_session(classes[1], today - timedelta(days=40)),
+            student=create_student(course, 'ADM100', classes[1]), status='present'
+        )
+
+        data = _class_report_data(today - timedelta(days=7), today, None, instructor)
+
+        first, second = data['class_data']
+        self.assertEqual(first['class']['class_code'], classes[0].class_code)
+        self.assertEqual(
+            (first['total_sessions'], first['present_count'], first['late_count'], first['absent_count']), (3, 1, 1, 1)
+        )
+        self.assertEqual([student['admission_number'] for student in first['students']], ['ADM000', 'ADM001', 'ADM002'])
+        self.assertEqual((second['total_records'], second['students'][0]['admission_number']), (0, 'ADM100'))
+        self.assertEqual(data['overall_summary']['attendance_rate'], 33.33)
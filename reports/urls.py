@@ -15,6 +15,9 @@ urlpatterns = [
     
     # Export
     path('export/<str:report_type>/', views.export_report, name='export_report'),
+    path('jobs/<int:report_id>/', views.report_job, name='report_job'),
+    path('jobs/<int:report_id>/status/', views.report_job_status, name='report_job_status'),
+    path('jobs/<int:report_id>/download/', views.download_report, name='download_report'),
     
     # Saved Reports
     path('save/', views.save_report, name='save_report'),
@@ -2,16 +2,21 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, permission_required
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
+from django.conf import settings
+from django.http import JsonResponse, HttpResponse, FileResponse
 from django.db.models import Q, Count, Avg, Sum, F
+from django.db.models.functions import Coalesce
 from django.core.paginator import Paginator
+from django.urls import reverse
 from django.utils import timezone
+from collections import Counter, defaultdict
 from datetime import datetime, timedelta
+from functools import partial
 import json
-import csv
+import os
 from io import BytesIO
 
-from .models import GeneratedReport, DashboardWidget
+from .models import GeneratedReport
 from .forms import (
     AttendanceReportForm, StudentAttendanceReportForm, 
     ClassAttendanceReportForm, ExportReportForm
@@ -19,34 +24,17 @@ from .forms import (
 from accounts.models import User
 from students.models import Student, Enrollment
 from courses.models import Course, Class
-from attendance.models import AttendanceSession, AttendanceRecord
+from attendance.models import AttendanceSession, AttendanceRecord, DailyAttendanceRollup
+from .cache import cached_report, cached_widget_data, dashboard_widgets
+from .exports import RECORD_EXPORT_ORDERING, record_headers, record_rows, stream_csv, stream_records_csv
+from .jobs import enqueue_export
+from .pdf import MAX_TABLE_ROWS, PDF_SYNC_MAX_ROWS, pdf_response
+from .xlsx import xlsx_response
 
 @login_required
 def reports_dashboard(request):
     """Main reports dashboard"""
-    # Get user-specific widgets - FIXED for SQLite compatibility
-    user_type = request.user.user_type
-    
-    # Get all active widgets and filter in Python (SQLite doesn't support JSON __contains)
-    all_widgets = DashboardWidget.objects.filter(
-        is_active=True
-    ).order_by('display_order')
-    
-    # Filter widgets based on user_type
-    widgets = []
-    for widget in all_widgets:
-        if isinstance(widget.user_types, list) and user_type in widget.user_types:
-            widgets.append(widget)
-        elif isinstance(widget.user_types, str):
-            # Try to parse as JSON, or handle as comma-separated
-            try:
-                types_list = json.loads(widget.user_types)
-                if isinstance(types_list, list) and user_type in types_list:
-                    widgets.append(widget)
-            except (json.JSONDecodeError, TypeError):
-                # Not valid JSON, try comma-separated
-                if user_type in [t.strip() for t in widget.user_types.split(',')]:
-                    widgets.append(widget)
+    widgets = dashboard_widgets(request.user.user_type)
     
     # Get recent reports
     recent_reports = GeneratedReport.objects.filter(
@@ -58,7 +46,7 @@ def reports_dashboard(request):
     
     # Calculate attendance stats for today
     today_attendance = AttendanceRecord.objects.filter(
-        session__session_date=today
+        session_date=today
     ).aggregate(
         total=Count('id'),
         present=Count('id', filter=Q(status='present')),
@@ -107,44 +95,19 @@ def attendance_report(request):
             # Set date range
             start_date, end_date = _get_date_range(date_range, start_date, end_date)
             
-            # Get attendance data
-            attendance_data = AttendanceRecord.objects.filter(
-                session__session_date__range=[start_date, end_date]
-            ).select_related(
-                'session', 'session__class_session', 'student', 'student__user'
+            # Cached until attendance inside the range changes
+            data = cached_report(
+                'attendance_report', form.cleaned_data, start_date, end_date, None,
+                partial(_attendance_report_data, start_date, end_date, group_by)
             )
             
-            # Group data based on selection
-            if group_by == 'day':
-                grouped_data = _group_by_day(attendance_data, start_date, end_date)
-            elif group_by == 'week':
-                grouped_data = _group_by_week(attendance_data, start_date, end_date)
-            elif group_by == 'month':
-                grouped_data = _group_by_month(attendance_data, start_date, end_date)
-            elif group_by == 'class':
-                grouped_data = _group_by_class(attendance_data)
-            elif group_by == 'instructor':
-                grouped_data = _group_by_instructor(attendance_data)
-            elif group_by == 'student':
-                grouped_data = _group_by_student(attendance_data)
-            else:
-                grouped_data = []
-            
-            # Calculate summary statistics
-            summary = _calculate_attendance_summary(attendance_data)
-            
-            # Prepare chart data
-            chart_data = _prepare_chart_data(grouped_data, group_by)
-            
             context = {
                 'form': form,
                 'start_date': start_date,
                 'end_date': end_date,
-                'grouped_data': grouped_data,
-                'summary': summary,
-                'chart_data': json.dumps(chart_data) if chart_data else None,
                 'report_type': report_type,
                 'group_by': group_by,
+                **data,
             }
             
             return render(request, 'reports/attendance_report.html', context)
@@ -171,82 +134,17 @@ def student_attendance_report(request):
             # Set date range
             start_date, end_date = _get_date_range(date_range, start_date, end_date)
             
-            # Build query filters
-            filters = Q(session__session_date__range=[start_date, end_date])
-            
-            if student:
-                filters &= Q(student=student)
-            
-            if class_session:
-                filters &= Q(session__class_session=class_session)
-            
-            # Get attendance data
-            attendance_records = AttendanceRecord.objects.filter(
-                filters
-            ).select_related(
-                'session', 'session__class_session', 'student', 'student__user'
-            ).order_by('session__session_date')
-            
-            # Calculate statistics
-            total_sessions = AttendanceSession.objects.filter(
-                session_date__range=[start_date, end_date],
-                class_session=class_session if class_session else None
-            ).count()
-            
-            present_count = attendance_records.filter(status='present').count()
-            absent_count = attendance_records.filter(status='absent').count()
-            late_count = attendance_records.filter(status='late').count()
-            
-            attendance_rate = (present_count / total_sessions * 100) if total_sessions > 0 else 0
-            
-            # Group by student if no specific student selected
-            if not student:
-                student_data = []
-                students = Student.objects.filter(
-                    enrollments__class_enrolled=class_session
-                ) if class_session else Student.objects.all()
-                
-                for std in students:
-                    student_attendance = attendance_records.filter(student=std)
-                    student_present = student_attendance.filter(status='present').count()
-                    student_rate = (student_present / total_sessions * 100) if total_sessions > 0 else 0
-                    
-                    student_data.append({
-                        'student': std,
-                        'present_count': student_present,
-                        'absent_count': student_attendance.filter(status='absent').count(),
-                        'late_count': student_attendance.filter(status='late').count(),
-                        'attendance_rate': round(student_rate, 2),
-                        'records': student_attendance,
-                    })
-                
-                grouped_data = student_data
-            else:
-                grouped_data = [{
-                    'student': student,
-                    'records': attendance_records,
-                    'present_count': present_count,
-                    'absent_count': absent_count,
-                    'late_count': late_count,
-                    'attendance_rate': round(attendance_rate, 2),
-                }]
-            
-            # Prepare chart data
-            chart_data = _prepare_student_chart_data(attendance_records, start_date, end_date)
+            data = cached_report(
+                'student_attendance_report', form.cleaned_data, start_date, end_date,
+                [class_session.id] if class_session else None,
+                partial(_student_report_data, start_date, end_date, student, class_session)
+            )
             
             context = {
                 'form': form,
                 'start_date': start_date,
                 'end_date': end_date,
-                'grouped_data': grouped_data,
-                'chart_data': json.dumps(chart_data) if chart_data else None,
-                'total_sessions': total_sessions,
-                'summary': {
-                    'present_count': present_count,
-                    'absent_count': absent_count,
-                    'late_count': late_count,
-                    'attendance_rate': round(attendance_rate, 2),
-                },
+                **data,
             }
             
             return render(request, 'reports/student_attendance_report.html', context)
@@ -273,83 +171,26 @@ def class_attendance_report(request):
             # Set date range
             start_date, end_date = _get_date_range(date_range, start_date, end_date)
             
-            # Build query filters for classes
-            class_filters = Q()
+            # Cached until attendance of the covered classes inside the range changes
             if class_session:
-                class_filters &= Q(id=class_session.id)
-            if instructor:
-                class_filters &= Q(instructor=instructor)
-            
-            classes = Class.objects.filter(class_filters, is_active=True)
-            
-            class_data = []
-            all_sessions = []
-            
-            for cls in classes:
-                # Get attendance sessions for this class
-                sessions = AttendanceSession.objects.filter(
-                    class_session=cls,
-                    session_date__range=[start_date, end_date]
-                )
-                
-                # Get attendance records
-                attendance_records = AttendanceRecord.objects.filter(
-                    session__in=sessions
-                )
-                
-                # Calculate statistics
-                total_sessions = sessions.count()
-                total_records = attendance_records.count()
-                present_count = attendance_records.filter(status='present').count()
-                absent_count = attendance_records.filter(status='absent').count()
-                late_count = attendance_records.filter(status='late').count()
-                
-                attendance_rate = (present_count / total_records * 100) if total_records > 0 else 0
-                
-                # Get student list
-                students = cls.enrollments.filter(is_active=True).select_related('student', 'student__user')
-                
-                class_data.append({
-                    'class': cls,
-                    'total_sessions': total_sessions,
-                    'total_records': total_records,
-                    'present_count': present_count,
-                    'absent_count': absent_count,
-                    'late_count': late_count,
-                    'attendance_rate': round(attendance_rate, 2),
-                    'students': students,
-                    'sessions': sessions,
-                })
-                
-                all_sessions.extend(list(sessions))
-            
-            # Prepare chart data
-            chart_data = _prepare_class_chart_data(class_data)
-            
-            # Overall summary
-            overall_summary = {
-                'total_classes': len(class_data),
-                'total_sessions': sum(cd['total_sessions'] for cd in class_data),
-                'total_records': sum(cd['total_records'] for cd in class_data),
-                'total_present': sum(cd['present_count'] for cd in class_data),
-                'total_absent': sum(cd['absent_count'] for cd in class_data),
-                'total_late': sum(cd['late_count'] for cd in class_data),
-            }
-            
-            if overall_summary['total_records'] > 0:
-                overall_summary['attendance_rate'] = round(
-                    (overall_summary['total_present'] / overall_summary['total_records'] * 100), 2
-                )
+                class_ids = [class_session.id]
+            elif instructor:
+                class_ids = list(Class.objects.filter(
+                    instructor=instructor, is_active=True
+                ).values_list('id', flat=True))
             else:
-                overall_summary['attendance_rate'] = 0
+                class_ids = None
+            
+            data = cached_report(
+                'class_attendance_report', form.cleaned_data, start_date, end_date, class_ids,
+                partial(_class_report_data, start_date, end_date, class_session, instructor)
+            )
             
             context = {
                 'form': form,
                 'start_date': start_date,
                 'end_date': end_date,
-                'class_data': class_data,
-                'chart_data': json.dumps(chart_data) if chart_data else None,
-                'overall_summary': overall_summary,
+                **data,
             }
             
             return render(request, 'reports/class_attendance_report.html', context)
@@ -360,21 +201,20 @@ def class_attendance_report(request):
     context = {'form': form}
     return render(request, 'reports/class_attendance_report.html', context)
 
+# Export report type -> (filter form, template)
+EXPORT_FORMS = {
+    'attendance': (AttendanceReportForm, 'reports/export_attendance.html'),
+    'student': (StudentAttendanceReportForm, 'reports/export_student.html'),
+    'class': (ClassAttendanceReportForm, 'reports/export_class.html'),
+}
+
 @login_required
 def export_report(request, report_type):
     """Export report in various formats"""
-    if report_type == 'attendance':
-        form_class = AttendanceReportForm
-        template = 'reports/export_attendance.html'
-    elif report_type == 'student':
-        form_class = StudentAttendanceReportForm
-        template = 'reports/export_student.html'
-    elif report_type == 'class':
-        form_class = ClassAttendanceReportForm
-        template = 'reports/export_class.html'
-    else:
+    if report_type not in EXPORT_FORMS:
         messages.error(request, "Invalid report type.")
         return redirect('reports:dashboard')
+    form_class, template = EXPORT_FORMS[report_type]
     
     if request.method == 'POST':
         filter_form = form_class(request.POST)
@@ -386,17 +226,29 @@ def export_report(request, report_type):
             include_charts = export_form.cleaned_data['include_charts']
             include_summary = export_form.cleaned_data['include_summary']
             
-            # Generate report based on format
-            if export_format == 'csv':
-                return _export_csv(filter_form, report_type)
-            elif export_format == 'excel':
-                return _export_excel(filter_form, report_type)
-            elif export_format == 'pdf':
-                return _export_pdf(filter_form, report_type, request)
-            else:
+            if export_format == 'html':
                 # HTML export - just display
                 messages.info(request, "HTML report displayed on screen.")
                 return redirect(request.META.get('HTTP_REFERER', 'reports:dashboard'))
+            
+            # ReportLab holds a whole PDF in memory, so large ones are always left to the workers
+            if settings.REPORT_EXPORTS_IN_BACKGROUND or (
+                export_format == 'pdf' and _large_pdf(filter_form, report_type)
+            ):
+                # Generated by run_report_workers; the job page polls until the file is ready
+                start_date, end_date = _export_date_range(filter_form)
+                filters = {
+                    key: value for key, value in request.POST.items()
+                    if key in filter_form.fields
+                }
+                report = enqueue_export(
+                    request.user, report_type, export_format, filters,
+                    start_date, end_date, include_charts, include_summary
+                )
+                messages.info(request, "Your report is being generated. It will be ready for download shortly.")
+                return redirect('reports:report_job', report_id=report.id)
+            
+            return render_export(filter_form, report_type, export_format, include_charts, include_summary)
     
     else:
         filter_form = form_class(request.GET)
@@ -409,41 +261,75 @@ def export_report(request, report_type):
     }
     return render(request, template, context)
 
+def render_export(filter_form, report_type, export_format, include_charts=True, include_summary=True):
+    """Render an export as a streaming response"""
+    if export_format == 'csv':
+        return _export_csv(filter_form, report_type)
+    elif export_format == 'excel':
+        return _export_excel(filter_form, report_type)
+    elif export_format == 'pdf':
+        return _export_pdf(filter_form, report_type, include_charts, include_summary)
+    raise ValueError(f'Unsupported export format: {export_format}')
+
+@login_required
+def report_job(request, report_id):
+    """Progress page for a report generated in the background"""
+    report = get_object_or_404(GeneratedReport, id=report_id)
+    
+    if report.generated_by != request.user and not request.user.is_staff:
+        messages.error(request, "You don't have permission to view this report.")
+        return redirect('reports:dashboard')
+    
+    return render(request, 'reports/report_job.html', {'report': report})
+
+@login_required
+def report_job_status(request, report_id):
+    """Status of a background report (AJAX endpoint polled by the job page)"""
+    report = get_object_or_404(GeneratedReport, id=report_id)
+    
+    if report.generated_by != request.user and not request.user.is_staff:
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+    
+    return JsonResponse({
+        'status': report.status,
+        'status_display': report.get_status_display(),
+        'is_ready': report.is_ready,
+        'file_size': report.file_size,
+        'error': report.error_message,
+        'download_url': reverse('reports:download_report', args=[report.id]) if report.is_ready else None,
+    })
+
+@login_required
+def download_report(request, report_id):
+    """Download the file of a generated report"""
+    report = get_object_or_404(GeneratedReport, id=report_id)
+    
+    if report.generated_by != request.user and not request.user.is_staff:
+        messages.error(request, "You don't have permission to download this report.")
+        return redirect('reports:dashboard')
+    
+    if not report.is_ready or not report.file_path:
+        messages.warning(request, "This report is not ready yet.")
+        return redirect('reports:report_job', report_id=report.id)
+    
+    return FileResponse(
+        report.file_path.open('rb'),
+        as_attachment=True,
+        filename=os.path.basename(report.file_path.name)
+    )
+
 @login_required
 def dashboard_widget_data(request, widget_id):
     """Get data for dashboard widgets (AJAX endpoint)"""
-    widget = get_object_or_404(DashboardWidget, id=widget_id)
-    
-    # Check user type permission - FIXED for SQLite compatibility
-    user_type = request.user.user_type
-    has_permission = False
-    
-    if isinstance(widget.user_types, list) and user_type in widget.user_types:
-        has_permission = True
-    elif isinstance(widget.user_types, str):
-        try:
-            types_list = json.loads(widget.user_types)
-            if isinstance(types_list, list) and user_type in types_list:
-                has_permission = True
-        except (json.JSONDecodeError, TypeError):
-            if user_type in [t.strip() for t in widget.user_types.split(',')]:
-                has_permission = True
-    
-    if not has_permission:
+    # Only active widgets visible to the user's type are served
+    widget = next(
+        (widget for widget in dashboard_widgets(request.user.user_type) if widget.id == widget_id), None
+    )
+    if widget is None:
         return JsonResponse({'error': 'Access denied'}, status=403)
     
-    data = {}
-    
-    if widget.widget_type == 'attendance_chart':
-        data = _get_attendance_chart_data(widget)
-    elif widget.widget_type == 'student_stats':
-        data = _get_student_stats_data(widget)
-    elif widget.widget_type == 'class_stats':
-        data = _get_class_stats_data(widget)
-    elif widget.widget_type == 'instructor_stats':
-        data = _get_instructor_stats_data(widget)
-    elif widget.widget_type == 'recent_activity':
-        data = _get_recent_activity_data(widget)
+    data_function = WIDGET_DATA_FUNCTIONS.get(widget.widget_type)
+    data = cached_widget_data(widget, partial(data_function, widget)) if data_function else {}
     
     return JsonResponse(data)
 
@@ -458,7 +344,7 @@ def generate_quick_report(request):
     if report_type == 'today':
         # Today's attendance summary
         attendance = AttendanceRecord.objects.filter(
-            session__session_date=today
+            session_date=today
         ).aggregate(
             total=Count('id'),
             present=Count('id', filter=Q(status='present')),
@@ -545,6 +431,7 @@ def save_report(request):
             data=data,
             generated_by=request.user,
             is_ready=True,
+            status='completed',
         )
         
         messages.success(request, f"Report '{report_name}' saved successfully.")
@@ -599,12 +486,275 @@ def _get_date_range(date_range, start_date, end_date):
         else:
             last_month_end = last_month.replace(month=last_month.month + 1, day=1) - timedelta(days=1)
         return last_month, last_month_end
+    elif date_range == 'this_quarter':
+        quarter_start = today.replace(month=(today.month - 1) // 3 * 3 + 1, day=1)
+        return quarter_start, today
+    elif date_range == 'last_quarter':
+        quarter_start = today.replace(month=(today.month - 1) // 3 * 3 + 1, day=1)
+        last_quarter_end = quarter_start - timedelta(days=1)
+        return last_quarter_end.replace(month=last_quarter_end.month - 2, day=1), last_quarter_end
+    elif date_range == 'this_year':
+        return today.replace(month=1, day=1), today
+    elif date_range == 'last_year':
+        return today.replace(year=today.year - 1, month=1, day=1), today.replace(year=today.year - 1, month=12, day=31)
     elif date_range == 'custom' and start_date and end_date:
         return start_date, end_date
     else:
         # Default: last 30 days
         return today - timedelta(days=30), today
 
+def _attendance_report_data(start_date, end_date, group_by):
+    """Grouped data, summary and chart of the attendance report"""
+    # Get pre-aggregated attendance data
+    attendance_data = DailyAttendanceRollup.objects.filter(
+        date__range=[start_date, end_date]
+    )
+    
+    # Group data based on selection
+    if group_by == 'day':
+        grouped_data = _group_by_day(attendance_data, start_date, end_date)
+    elif group_by == 'week':
+        grouped_data = _group_by_week(attendance_data, start_date, end_date)
+    elif group_by == 'month':
+        grouped_data = _group_by_month(attendance_data, start_date, end_date)
+    elif group_by == 'class':
+        grouped_data = _group_by_class(attendance_data)
+    elif group_by == 'instructor':
+        grouped_data = _group_by_instructor(attendance_data)
+    elif group_by == 'student':
+        grouped_data = _group_by_student(attendance_data)
+    else:
+        grouped_data = []
+    
+    # Prepare chart data
+    chart_data = _prepare_chart_data(grouped_data, group_by)
+    
+    return {
+        'grouped_data': grouped_data,
+        'summary': _calculate_attendance_summary(attendance_data),
+        'chart_data': json.dumps(chart_data) if chart_data else None,
+    }
+
+def _student_values(students):
+    """Template values of students; report results hold no model instances so they cache cheaply"""
+    statuses = dict(Student.STATUS_CHOICES)
+    return [{
+        'pk': row['id'],
+        'full_name': _full_name(row['user__first_name'], row['user__last_name']),
+        'admission_number': row['admission_number'],
+        'course_code': row['course__code'],
+        'class_code': row['current_class__class_code'],
+        'status': row['status'],
+        'status_display': statuses.get(row['status'], row['status']),
+    } for row in students.values(
+        'id', 'user__first_name', 'user__last_name', 'admission_number',
+        'course__code', 'current_class__class_code', 'status'
+    )]
+
+def _student_report_data(start_date, end_date, student, class_session):
+    """Per-student records, statistics and chart of the student attendance report"""
+    # Build query filters
+    filters = Q(session_date__range=[start_date, end_date])
+    
+    if student:
+        filters &= Q(student=student)
+    
+    if class_session:
+        filters &= Q(class_session=class_session)
+    
+    # Get attendance data
+    statuses = dict(AttendanceRecord.STATUS_CHOICES)
+    attendance_records = [
+        {**record, 'status_display': statuses.get(record['status'], record['status'])}
+        for record in AttendanceRecord.objects.filter(filters).order_by('session_date').values(
+            'student_id', 'session_date', 'status', 'check_in_time', 'remarks',
+            class_code=F('class_session__class_code')
+        )
+    ]
+    
+    # Calculate statistics
+    sessions = AttendanceSession.objects.filter(session_date__range=[start_date, end_date])
+    if class_session:
+        sessions = sessions.filter(class_session=class_session)
+    total_sessions = sessions.count()
+    
+    status_counts = Counter(record['status'] for record in attendance_records)
+    present_count = status_counts['present']
+    absent_count = status_counts['absent']
+    late_count = status_counts['late']
+    
+    attendance_rate = (present_count / total_sessions * 100) if total_sessions > 0 else 0
+    
+    # Group by student if no specific student selected
+    if not student:
+        records_by_student = defaultdict(list)
+        for record in attendance_records:
+            records_by_student[record['student_id']].append(record)
+        
+        student_data = []
+        students = Student.objects.filter(
+            enrollments__class_enrolled=class_session
+        ) if class_session else Student.objects.all()
+        
+        for std in _student_values(students):
+            student_attendance = records_by_student.get(std['pk'], [])
+            student_counts = Counter(record['status'] for record in student_attendance)
+            student_present = student_counts['present']
+            student_rate = (student_present / total_sessions * 100) if total_sessions > 0 else 0
+            
+            student_data.append({
+                'student': std,
+                'present_count': student_present,
+                'absent_count': student_counts['absent'],
+                'late_count': student_counts['late'],
+                'attendance_rate': round(student_rate, 2),
+                'records': student_attendance,
+            })
+        
+        grouped_data = student_data
+    else:
+        grouped_data = [{
+            'student': _student_values(Student.objects.filter(pk=student.pk))[0],
+            'records': attendance_records,
+            'present_count': present_count,
+            'absent_count': absent_count,
+            'late_count': late_count,
+            'attendance_rate': round(attendance_rate, 2),
+        }]
+    
+    # Prepare chart data
+    chart_data = _prepare_student_chart_data(attendance_records, start_date, end_date)
+    
+    return {
+        'grouped_data': grouped_data,
+        'chart_data': json.dumps(chart_data) if chart_data else None,
+        'total_sessions': total_sessions,
+        'summary': {
+            'present_count': present_count,
+            'absent_count': absent_count,
+            'late_count': late_count,
+            'attendance_rate': round(attendance_rate, 2),
+        },
+    }
+
+def _class_report_data(start_date, end_date, class_session, instructor):
+    """Per-class statistics, chart and overall summary of the class attendance report"""
+    # Build query filters for classes
+    class_filters = Q()
+    if class_session:
+        class_filters &= Q(id=class_session.id)
+    if instructor:
+        class_filters &= Q(instructor=instructor)
+    
+    # Plain values throughout, so the cached result holds no model instances
+    classes = list(Class.objects.filter(class_filters, is_active=True).values('id', 'class_code', 'name'))
+    class_ids = [cls['id'] for cls in classes]
+    
+    # Sessions, record counts and active enrollments of every class at once
+    sessions_by_class = defaultdict(list)
+    for session in AttendanceSession.objects.filter(
+        class_session__in=class_ids,
+        session_date__range=[start_date, end_date]
+    ).values('id', 'class_session_id', 'session_date', 'start_time', 'end_time', 'status'):
+        sessions_by_class[session.pop('class_session_id')].append(session)
+    
+    record_counts = {
+        row['class_session']: row
+        for row in AttendanceRecord.objects.filter(
+            class_session__in=class_ids,
+            session_date__range=[start_date, end_date]
+        ).order_by().values('class_session').annotate(
+            total=Count('id'),
+            present=Count('id', filter=Q(status='present')),
+            absent=Count('id', filter=Q(status='absent')),
+            late=Count('id', filter=Q(status='late')),
+        )
+    }
+    
+    students_by_class = defaultdict(list)
+    for enrollment in Enrollment.objects.filter(
+        class_enrolled__in=class_ids, is_active=True
+    ).values(
+        'class_enrolled_id', 'student_id', 'student__admission_number',
+        'student__user__first_name', 'student__user__last_name'
+    ):
+        students_by_class[enrollment['class_enrolled_id']].append({
+            'pk': enrollment['student_id'],
+            'admission_number': enrollment['student__admission_number'],
+            'full_name': _full_name(enrollment['student__user__first_name'], enrollment['student__user__last_name']),
+        })
+    
+    class_data = []
+    
+    for cls in classes:
+        sessions = sessions_by_class[cls['id']]
+        counts = record_counts.get(cls['id'], {})
+    
+        # Calculate statistics
+        total_records = counts.get('total', 0)
+        present_count = counts.get('present', 0)
+    
+        attendance_rate = (present_count / total_records * 100) if total_records > 0 else 0
+    
+        class_data.append({
+            'class': cls,
+            'total_sessions': len(sessions),
+            'total_records': total_records,
+            'present_count': present_count,
+            'absent_count': counts.get('absent', 0),
+            'late_count': counts.get('late', 0),
+            'attendance_rate': round(attendance_rate, 2),
+            'students': students_by_class[cls['id']],
+            'sessions': sessions,
+        })
+    
+    # Prepare chart data
+    chart_data = _prepare_class_chart_data(class_data)
+    
+    # Overall summary
+    overall_summary = {
+        'total_classes': len(class_data),
+        'total_sessions': sum(cd['total_sessions'] for cd in class_data),
+        'total_records': sum(cd['total_records'] for cd in class_data),
+        'total_present': sum(cd['present_count'] for cd in class_data),
+        'total_absent': sum(cd['absent_count'] for cd in class_data),
+        'total_late': sum(cd['late_count'] for cd in class_data),
+    }
+    
+    if overall_summary['total_records'] > 0:
+        overall_summary['attendance_rate'] = round(
+            (overall_summary['total_present'] / overall_summary['total_records'] * 100), 2
+        )
+    else:
+        overall_summary['attendance_rate'] = 0
+    
+    return {
+        'class_data': class_data,
+        'chart_data': json.dumps(chart_data) if chart_data else None,
+        'overall_summary': overall_summary,
+    }
+
+def _status_counts():
+    """Per-status sums of rollup counts, for use in aggregate()/annotate()"""
+    return {
+        'total': Coalesce(Sum('count'), 0),
+        'present': Coalesce(Sum('count', filter=Q(status='present')), 0),
+        'absent': Coalesce(Sum('count', filter=Q(status='absent')), 0),
+        'late': Coalesce(Sum('count', filter=Q(status='late')), 0),
+        'excused': Coalesce(Sum('count', filter=Q(status='excused')), 0),
+    }
+
+def _full_name(first_name, last_name):
+    return f"{first_name or ''} {last_name or ''}".strip()
+
+def _add_counts(target, row):
+    for key in ('present', 'absent', 'late', 'excused', 'total'):
+        target[key] += row[key]
+
+def _daily_counts(attendance_data):
+    """Status counts per day from a DailyAttendanceRollup queryset"""
+    return attendance_data.order_by().values('date').annotate(**_status_counts())
+
 def _group_by_day(attendance_data, start_date, end_date):
     """Group attendance data by day"""
     grouped = {}
@@ -621,25 +771,14 @@ def _group_by_day(attendance_data, start_date, end_date):
         }
         current_date += timedelta(days=1)
     
-    for record in attendance_data:
-        date = record.session.session_date
-        if date in grouped:
-            grouped[date]['total'] += 1
-            if record.status == 'present':
-                grouped[date]['present'] += 1
-            elif record.status == 'absent':
-                grouped[date]['absent'] += 1
-            elif record.status == 'late':
-                grouped[date]['late'] += 1
-            elif record.status == 'excused':
-                grouped[date]['excused'] += 1
+    for row in _daily_counts(attendance_data):
+        if row['date'] in grouped:
+            _add_counts(grouped[row['date']], row)
     
     return list(grouped.values())
 
 def _group_by_week(attendance_data, start_date, end_date):
     """Group attendance data by week"""
-    from django.utils.dateformat import DateFormat
-    
     grouped = {}
     current_date = start_date
     
@@ -666,22 +805,14 @@ def _group_by_week(attendance_data, start_date, end_date):
             }
         current_date += timedelta(days=7)
     
-    for record in attendance_data:
-        date = record.session.session_date
+    for row in _daily_counts(attendance_data):
+        date = row['date']
         week_num = date.isocalendar()[1]
         year = date.year
         week_key = f"{year}-W{week_num:02d}"
         
         if week_key in grouped:
-            grouped[week_key]['total'] += 1
-            if record.status == 'present':
-                grouped[week_key]['present'] += 1
-            elif record.status == 'absent':
-                grouped[week_key]['absent'] += 1
-            elif record.status == 'late':
-                grouped[week_key]['late'] += 1
-            elif record.status == 'excused':
-                grouped[week_key]['excused'] += 1
+            _add_counts(grouped[week_key], row)
     
     return list(grouped.values())
 
@@ -708,142 +839,96 @@ def _group_by_month(attendance_data, start_date, end_date):
         else:
             current_date = current_date.replace(month=current_date.month + 1)
     
-    for record in attendance_data:
-        date = record.session.session_date
-        month_key = date.strftime('%Y-%m')
+    for row in _daily_counts(attendance_data):
+        month_key = row['date'].strftime('%Y-%m')
         
         if month_key in grouped:
-            grouped[month_key]['total'] += 1
-            if record.status == 'present':
-                grouped[month_key]['present'] += 1
-            elif record.status == 'absent':
-                grouped[month_key]['absent'] += 1
-            elif record.status == 'late':
-                grouped[month_key]['late'] += 1
-            elif record.status == 'excused':
-                grouped[month_key]['excused'] += 1
+            _add_counts(grouped[month_key], row)
     
     return list(grouped.values())
 
 def _group_by_class(attendance_data):
     """Group attendance data by class"""
-    classes = {}
-    
-    for record in attendance_data:
-        class_session = record.session.class_session
-        if class_session:
-            class_id = class_session.id
-            class_name = class_session.class_code
-            
-            if class_id not in classes:
-                classes[class_id] = {
-                    'class_id': class_id,
-                    'class_name': class_name,
-                    'instructor': class_session.instructor.get_full_name() if class_session.instructor else 'N/A',
-                    'present': 0,
-                    'absent': 0,
-                    'late': 0,
-                    'excused': 0,
-                    'total': 0,
-                }
-            
-            classes[class_id]['total'] += 1
-            if record.status == 'present':
-                classes[class_id]['present'] += 1
-            elif record.status == 'absent':
-                classes[class_id]['absent'] += 1
-            elif record.status == 'late':
-                classes[class_id]['late'] += 1
-            elif record.status == 'excused':
-                classes[class_id]['excused'] += 1
-    
-    return list(classes.values())
+    rows = attendance_data.order_by('class_session__class_code').values(
+        'class_session_id',
+        'class_session__class_code',
+        'class_session__instructor_id',
+        'class_session__instructor__first_name',
+        'class_session__instructor__last_name',
+    ).annotate(**_status_counts())
+    
+    return [{
+        'class_id': row['class_session_id'],
+        'class_name': row['class_session__class_code'],
+        'instructor': _full_name(
+            row['class_session__instructor__first_name'],
+            row['class_session__instructor__last_name']
+        ) if row['class_session__instructor_id'] else 'N/A',
+        'present': row['present'],
+        'absent': row['absent'],
+        'late': row['late'],
+        'excused': row['excused'],
+        'total': row['total'],
+    } for row in rows]
 
 def _group_by_instructor(attendance_data):
     """Group attendance data by instructor"""
-    instructors = {}
-    
-    for record in attendance_data:
-        class_session = record.session.class_session
-        if class_session and class_session.instructor:
-            instructor_id = class_session.instructor.id
-            instructor_name = class_session.instructor.get_full_name()
-            
-            if instructor_id not in instructors:
-                instructors[instructor_id] = {
-                    'instructor_id': instructor_id,
-                    'instructor_name': instructor_name,
-                    'present': 0,
-                    'absent': 0,
-                    'late': 0,
-                    'excused': 0,
-                    'total': 0,
-                }
-            
-            instructors[instructor_id]['total'] += 1
-            if record.status == 'present':
-                instructors[instructor_id]['present'] += 1
-            elif record.status == 'absent':
-                instructors[instructor_id]['absent'] += 1
-            elif record.status == 'late':
-                instructors[instructor_id]['late'] += 1
-            elif record.status == 'excused':
-                instructors[instructor_id]['excused'] += 1
-    
-    return list(instructors.values())
+    rows = attendance_data.filter(
+        instructor__isnull=False
+    ).order_by('instructor__first_name', 'instructor__last_name').values(
+        'instructor_id',
+        'instructor__first_name',
+        'instructor__last_name',
+    ).annotate(**_status_counts())
+    
+    return [{
+        'instructor_id': row['instructor_id'],
+        'instructor_name': _full_name(row['instructor__first_name'], row['instructor__last_name']),
+        'present': row['present'],
+        'absent': row['absent'],
+        'late': row['late'],
+        'excused': row['excused'],
+        'total': row['total'],
+    } for row in rows]
 
 def _group_by_student(attendance_data):
     """Group attendance data by student"""
-    students = {}
-    
-    for record in attendance_data:
-        student = record.student
-        if student:
-            student_id = student.id
-            student_name = student.user.get_full_name()
-            
-            if student_id not in students:
-                students[student_id] = {
-                    'student_id': student_id,
-                    'student_name': student_name,
-                    'student_number': student.student_number,
-                    'course': student.course.code if student.course else 'N/A',
-                    'present': 0,
-                    'absent': 0,
-                    'late': 0,
-                    'excused': 0,
-                    'total': 0,
-                }
-            
-            students[student_id]['total'] += 1
-            if record.status == 'present':
-                students[student_id]['present'] += 1
-            elif record.status == 'absent':
-                students[student_id]['absent'] += 1
-            elif record.status == 'late':
-                students[student_id]['late'] += 1
-            elif record.status == 'excused':
-                students[student_id]['excused'] += 1
-    
-    return list(students.values())
+    rows = attendance_data.order_by('student__admission_number').values(
+        'student_id',
+        'student__admission_number',
+        'student__user__first_name',
+        'student__user__last_name',
+        'student__course__code',
+    ).annotate(**_status_counts())
+    
+    return [{
+        'student_id': row['student_id'],
+        'student_name': _full_name(row['student__user__first_name'], row['student__user__last_name']),
+        'student_number': row['student__admission_number'],
+        'course': row['student__course__code'] or 'N/A',
+        'present': row['present'],
+        'absent': row['absent'],
+        'late': row['late'],
+        'excused': row['excused'],
+        'total': row['total'],
+    } for row in rows]
 
 def _calculate_attendance_summary(attendance_data):
     """Calculate summary statistics for attendance data"""
-    total = attendance_data.count()
-    present = attendance_data.filter(status='present').count()
-    absent = attendance_data.filter(status='absent').count()
-    late = attendance_data.filter(status='late').count()
-    excused = attendance_data.filter(status='excused').count()
+    counts = attendance_data.aggregate(**_status_counts())
+    total = counts['total']
+    present = counts['present']
+    late = counts['late']
     
     attendance_rate = (present / total * 100) if total > 0 else 0
-    punctuality_rate = ((present - late) / present * 100) if present > 0 else 0
+    punctuality_rate = (present / (present + late) * 100) if present + late > 0 else 0
     
     return {
         'total': total,
         'present': present,
-        'absent': absent,
+        'absent': counts['absent'],
         'late': late,
-        'excused': excused,
+        'excused': counts['excused'],
         'attendance_rate': round(attendance_rate, 2),
         'punctuality_rate': round(punctuality_rate, 2),
     }
@@ -932,13 +1017,13 @@ def _prepare_student_chart_data(attendance_records, start_date, end_date):
         current_date += timedelta(days=1)
     
     for record in attendance_records:
-        date = record.session.session_date
+        date = record['session_date']
         if date in daily_data:
-            if record.status == 'present':
+            if record['status'] == 'present':
                 daily_data[date]['present'] += 1
-            elif record.status == 'absent':
+            elif record['status'] == 'absent':
                 daily_data[date]['absent'] += 1
-            elif record.status == 'late':
+            elif record['status'] == 'late':
                 daily_data[date]['late'] += 1
     
     # Convert to lists
@@ -970,7 +1055,7 @@ def _prepare_class_chart_data(class_data):
     if not class_data:
         return None
     
-    labels = [item['class'].class_code for item in class_data]
+    labels = [item['class']['class_code'] for item in class_data]
     attendance_rates = [item['attendance_rate'] for item in class_data]
     
     return {
@@ -988,12 +1073,12 @@ def _prepare_class_chart_data(class_data):
 def _get_attendance_chart_data(widget):
     """Get data for attendance chart widget"""
     today = timezone.now().date()
-    days = widget.config.get('days', 7)
+    days = widget.configuration.get('days', 7)
     
     start_date = today - timedelta(days=days-1)
     
     attendance_data = AttendanceRecord.objects.filter(
-        session__session_date__range=[start_date, today]
+        session_date__range=[start_date, today]
     )
     
     # Group by day
@@ -1007,11 +1092,10 @@ def _get_attendance_chart_data(widget):
         }
         current_date += timedelta(days=1)
     
-    for record in attendance_data:
-        date = record.session.session_date
+    for date, status in attendance_data.values_list('session_date', 'status').iterator():
         if date in daily_stats:
             daily_stats[date]['total'] += 1
-            if record.status == 'present':
+            if status == 'present':
                 daily_stats[date]['present'] += 1
     
     # Prepare chart data
@@ -1057,7 +1141,7 @@ def _get_class_stats_data(widget):
     # Get attendance for today
     today = timezone.now().date()
     today_attendance = AttendanceRecord.objects.filter(
-        session__session_date=today
+        session_date=today
     ).aggregate(
         present=Count('id', filter=Q(status='present')),
         total=Count('id')
@@ -1122,84 +1206,57 @@ def _get_recent_activity_data(widget):
         'count': len(activities),
     }
 
+WIDGET_DATA_FUNCTIONS = {
+    'attendance_chart': _get_attendance_chart_data,
+    'student_stats': _get_student_stats_data,
+    'class_stats': _get_class_stats_data,
+    'instructor_stats': _get_instructor_stats_data,
+    'recent_activity': _get_recent_activity_data,
+}
+
 # Export functions
-def _export_csv(filter_form, report_type):
-    """Export report as CSV"""
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="{report_type}_report_{timezone.now().date()}.csv"'
-    
-    writer = csv.writer(response)
-    
-    # Write header based on report type
-    if report_type == 'attendance':
-        writer.writerow(['Date', 'Class', 'Student', 'Status', 'Check-in Time', 'Remarks'])
-        
-        # Get filtered data (simplified for example)
-        date_range = filter_form.cleaned_data['date_range']
-        start_date, end_date = _get_date_range(
-            date_range,
-            filter_form.cleaned_data['start_date'],
-            filter_form.cleaned_data['end_date']
-        )
-        
-        records = AttendanceRecord.objects.filter(
-            session__session_date__range=[start_date, end_date]
-        ).select_related('session', 'session__class_session', 'student', 'student__user')
-        
-        for record in records:
-            writer.writerow([
-                record.session.session_date,
-                record.session.class_session.class_code if record.session.class_session else 'N/A',
-                record.student.user.get_full_name() if record.student and record.student.user else 'N/A',
-                record.get_status_display(),
-                record.check_in_time.strftime('%H:%M:%S') if record.check_in_time else 'N/A',
-                record.remarks[:50] if record.remarks else ''
-            ])
-    
-    elif report_type == 'student':
-        # Add CSV export for student reports
-        date_range = filter_form.cleaned_data['date_range']
-        start_date, end_date = _get_date_range(
-            date_range,
-            filter_form.cleaned_data['start_date'],
-            filter_form.cleaned_data['end_date']
-        )
-        
-        writer.writerow(['Student ID', 'Name', 'Course', 'Present', 'Absent', 'Late', 'Attendance Rate %'])
+def _export_date_range(filter_form):
+    return _get_date_range(
+        filter_form.cleaned_data['date_range'],
+        filter_form.cleaned_data['start_date'],
+        filter_form.cleaned_data['end_date']
+    )
+
+def _record_status_counts(records):
+    """Present/absent/late counts and attendance rate for an AttendanceRecord queryset"""
+    counts = records.aggregate(
+        present=Count('id', filter=Q(status='present')),
+        absent=Count('id', filter=Q(status='absent')),
+        late=Count('id', filter=Q(status='late')),
+    )
+    total = counts['present'] + counts['absent'] + counts['late']
+    counts['rate'] = round(counts['present'] / total * 100, 2) if total > 0 else 0
+    return counts
+
+def _summary_export(filter_form, report_type, start_date, end_date):
+    """Header and rows of the student and class exports"""
+    rows = []
+    if report_type == 'student':
+        header = ['Student ID', 'Name', 'Course', 'Present', 'Absent', 'Late', 'Attendance Rate %']
         
-        # Simplified student data
         student = filter_form.cleaned_data.get('student')
         if student:
-            records = AttendanceRecord.objects.filter(
-                session__session_date__range=[start_date, end_date],
+            counts = _record_status_counts(AttendanceRecord.objects.filter(
+                session_date__range=[start_date, end_date],
                 student=student
-            )
-            present = records.filter(status='present').count()
-            absent = records.filter(status='absent').count()
-            late = records.filter(status='late').count()
-            total = present + absent + late
-            rate = (present / total * 100) if total > 0 else 0
-            
-            writer.writerow([
-                student.student_number,
+            ))
+            rows.append([
+                student.admission_number,
                 student.user.get_full_name(),
                 student.course.code if student.course else 'N/A',
-                present,
-                absent,
-                late,
-                round(rate, 2)
+                counts['present'],
+                counts['absent'],
+                counts['late'],
+                counts['rate']
             ])
     
     elif report_type == 'class':
-        # Add CSV export for class reports
-        date_range = filter_form.cleaned_data['date_range']
-        start_date, end_date = _get_date_range(
-            date_range,
-            filter_form.cleaned_data['start_date'],
-            filter_form.cleaned_data['end_date']
-        )
-        
-        writer.writerow(['Class Code', 'Instructor', 'Sessions', 'Present', 'Absent', 'Late', 'Attendance Rate %'])
+        header = ['Class Code', 'Instructor', 'Sessions', 'Present', 'Absent', 'Late', 'Attendance Rate %']
         
         class_session = filter_form.cleaned_data.get('class_session')
         if class_session:
@@ -1207,34 +1264,159 @@ def _export_csv(filter_form, report_type):
                 class_session=class_session,
                 session_date__range=[start_date, end_date]
             )
-            records = AttendanceRecord.objects.filter(session__in=sessions)
-            present = records.filter(status='present').count()
-            absent = records.filter(status='absent').count()
-            late = records.filter(status='late').count()
-            total = present + absent + late
-            rate = (present / total * 100) if total > 0 else 0
-            
-            writer.writerow([
+            counts = _record_status_counts(AttendanceRecord.objects.filter(session__in=sessions))
+            rows.append([
                 class_session.class_code,
                 class_session.instructor.get_full_name() if class_session.instructor else 'N/A',
                 sessions.count(),
-                present,
-                absent,
-                late,
-                round(rate, 2)
+                counts['present'],
+                counts['absent'],
+                counts['late'],
+                counts['rate']
             ])
+    else:
+        header = []
+    
+    return header, rows
+
+def _export_csv(filter_form, report_type):
+    """Export report as CSV"""
+    filename = f'{report_type}_report_{timezone.now().date()}.csv'
+    start_date, end_date = _export_date_range(filter_form)
+    
+    if report_type == 'attendance':
+        records = AttendanceRecord.objects.filter(
+            session_date__range=[start_date, end_date]
+        ).order_by(*RECORD_EXPORT_ORDERING)
+        return stream_records_csv(
+            filename, records, ['date', 'class', 'student', 'status', 'check_in', 'remarks']
+        )
     
-    return response
+    header, rows = _summary_export(filter_form, report_type, start_date, end_date)
+    return stream_csv(filename, header, rows)
+
+def _attendance_summary_rows(rollups, start_date, end_date):
+    totals = rollups.aggregate(**_status_counts())
+    rate = round(totals['present'] / totals['total'] * 100, 2) if totals['total'] else 0
+    return [
+        ['Start Date', start_date],
+        ['End Date', end_date],
+        ['Total Records', totals['total']],
+        ['Present', totals['present']],
+        ['Absent', totals['absent']],
+        ['Late', totals['late']],
+        ['Excused', totals['excused']],
+        ['Attendance Rate %', rate],
+    ]
+
+def _class_breakdown_rows(start_date, end_date):
+    for row in _group_by_class(DailyAttendanceRollup.objects.filter(date__range=[start_date, end_date])):
+        rate = round(row['present'] / row['total'] * 100, 2) if row['total'] else 0
+        yield [
+            row['class_name'], row['instructor'], row['present'], row['absent'],
+            row['late'], row['excused'], row['total'], rate,
+        ]
 
 def _export_excel(filter_form, report_type):
-    """Export report as Excel (simplified - returns CSV for now)"""
-    # For now, return CSV since we don't have Excel library installed
-    # In production, you would use openpyxl or xlsxwriter
-    return _export_csv(filter_form, report_type)
+    """Export report as an Excel workbook, streamed sheet by sheet"""
+    filename = f'{report_type}_report_{timezone.now().date()}.xlsx'
+    start_date, end_date = _export_date_range(filter_form)
+    
+    if report_type == 'attendance':
+        columns = ['date', 'class', 'admission_number', 'student_name', 'status', 'check_in', 'marked_by', 'remarks']
+        records = AttendanceRecord.objects.filter(
+            session_date__range=[start_date, end_date]
+        ).order_by(*RECORD_EXPORT_ORDERING)
+        sheets = [
+            ('Records', record_headers(columns), record_rows(records, columns)),
+            ('Summary', ['Metric', 'Value'], _attendance_summary_rows(
+                DailyAttendanceRollup.objects.filter(date__range=[start_date, end_date]), start_date, end_date
+            )),
+            ('By Class', ['Class', 'Instructor', 'Present', 'Absent', 'Late', 'Excused', 'Total', 'Attendance Rate %'],
+             _class_breakdown_rows(start_date, end_date)),
+        ]
+    else:
+        header, rows = _summary_export(filter_form, report_type, start_date, end_date)
+        sheets = [(report_type.title(), header, rows)]
+    
+    return xlsx_response(filename, sheets)
+
+# PDF table columns and relative widths per report type
+PDF_COLUMNS = {
+    'attendance': (['date', 'class', 'admission_number', 'student_name', 'status', 'check_in', 'marked_by'],
+                   [2, 2, 2, 4, 1.5, 1.5, 3]),
+    'student': (['date', 'class', 'admission_number', 'student_name', 'status', 'check_in', 'remarks'],
+                [2, 2, 2, 4, 1.5, 1.5, 4]),
+    'class': (['class', 'date', 'admission_number', 'student_name', 'status', 'check_in', 'remarks'],
+              [2, 2, 2, 4, 1.5, 1.5, 4]),
+}
+
+PDF_ORDERING = {
+    'attendance': ('session_date', 'class_session__class_code', 'student__admission_number'),
+    'student': ('student__admission_number', 'session_date'),
+    'class': ('class_session__class_code', 'session_date', 'student__admission_number'),
+}
+
+def _chart_series(rollups):
+    """Per-day status counts from a rollup queryset, for PDFReport.chart"""
+    series = []
+    for row in _daily_counts(rollups).order_by('date'):
+        series.append((row['date'].strftime('%d %b'), row))
+    return series
+
+def _pdf_querysets(filter_form, report_type, start_date, end_date):
+    """Title, records and rollups of a PDF export"""
+    records = AttendanceRecord.objects.filter(session_date__range=[start_date, end_date])
+    rollups = DailyAttendanceRollup.objects.filter(date__range=[start_date, end_date])
+    title = 'Attendance Report'
+    
+    if report_type == 'student':
+        title = 'Student Attendance Report'
+        student = filter_form.cleaned_data.get('student')
+        class_session = filter_form.cleaned_data.get('class_session')
+        if student:
+            title = f'{title} - {student.user.get_full_name()} ({student.admission_number})'
+            records = records.filter(student=student)
+            rollups = rollups.filter(student=student)
+        if class_session:
+            records = records.filter(class_session=class_session)
+            rollups = rollups.filter(class_session=class_session)
+    
+    elif report_type == 'class':
+        title = 'Class Attendance Register'
+        class_session = filter_form.cleaned_data.get('class_session')
+        instructor = filter_form.cleaned_data.get('instructor')
+        if class_session:
+            title = f'{title} - {class_session.class_code}'
+            records = records.filter(class_session=class_session)
+            rollups = rollups.filter(class_session=class_session)
+        if instructor:
+            records = records.filter(class_session__instructor=instructor)
+            rollups = rollups.filter(class_session__instructor=instructor)
+    
+    return title, records, rollups
+
+def _large_pdf(filter_form, report_type):
+    """Whether a PDF export has more record rows than are rendered during a request"""
+    _, records, _ = _pdf_querysets(filter_form, report_type, *_export_date_range(filter_form))
+    return records[:PDF_SYNC_MAX_ROWS + 1].count() > PDF_SYNC_MAX_ROWS
 
-def _export_pdf(filter_form, report_type, request):
+def _export_pdf(filter_form, report_type, include_charts=True, include_summary=True):
     """Export report as PDF"""
-    # This would require reportlab or similar library
-    # For now, return a message
-    messages.info(request, "PDF export feature will be implemented with reportlab library.")
-    return redirect(request.META.get('HTTP_REFERER', 'reports:dashboard'))
\ No newline at end of file
+    filename = f'{report_type}_report_{timezone.now().date()}.pdf'
+    start_date, end_date = _export_date_range(filter_form)
+    title, records, rollups = _pdf_querysets(filter_form, report_type, start_date, end_date)
+    
+    columns, weights = PDF_COLUMNS[report_type]
+    # One row past the table's limit tells it that rows were left out
+    records = records.order_by(*PDF_ORDERING[report_type])[:MAX_TABLE_ROWS + 1]
+    
+    def build(report):
+        if include_summary:
+            report.figures(_attendance_summary_rows(rollups, start_date, end_date)[2:])
+        if include_charts:
+            report.chart(_chart_series(rollups))
+        report.table(record_headers(columns), record_rows(records, columns), weights, MAX_TABLE_ROWS)
+    
+    subtitle = f'{start_date:%d %b %Y} - {end_date:%d %b %Y}, generated {timezone.now():%d %b %Y %H:%M}'
+    return pdf_response(filename, title, subtitle, build)
@@ -0,0 +1,202 @@
+# reports/xlsx.py
+"""
+Streaming XLSX writer.
+
+Workbooks are written part by part into a zip archive on a non-seekable
+sink and handed to the response as they are produced. Rows use inline
+strings instead of a shared string table, so neither the workbook nor the
+rows ever have to be held in memory.
+"""
+import re
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+ROWS_PER_FLUSH = 500
+
+EXCEL_EPOCH = datetime(1899, 12, 30)
+
+# Cell styles defined in styles.xml
+STYLE_DATE = 1
+STYLE_DATETIME = 2
+STYLE_HEADER = 3
+
+ILLEGAL_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+CONTENT_TYPES = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>
+{sheets}</Types>'''
+
+SHEET_CONTENT_TYPE = (
+    '<Override PartName="/xl/worksheets/sheet{index}.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>\n'
+)
+
+ROOT_RELS = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
+</Relationships>'''
+
+WORKBOOK = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<sheets>
+{sheets}</sheets>
+</workbook>'''
+
+WORKBOOK_SHEET = '<sheet name="{name}" sheetId="{index}" r:id="rId{index}"/>\n'
+
+WORKBOOK_RELS = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+{sheets}<Relationship Id="rId{styles}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>
+</Relationships>'''
+
+WORKBOOK_SHEET_REL = (
+    '<Relationship Id="rId{index}" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet{index}.xml"/>\n'
+)
+
+STYLES = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">
+<numFmts count="2"><numFmt numFmtId="164" formatCode="yyyy-mm-dd"/><numFmt numFmtId="165" formatCode="yyyy-mm-dd hh:mm:ss"/></numFmts>
+<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font><font><b/><sz val="11"/><name val="Calibri"/></font></fonts>
+<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>
+<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>
+<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>
+<cellXfs count="4">
+<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>
+<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>
+<xf numFmtId="165" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>
+<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>
+</cellXfs>
+</styleSheet>'''
+
+SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+SHEET_END = '</sheetData></worksheet>'
+
+
+def column_letter(index):
+    """Return the spreadsheet column letter for a zero-based index"""
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def _cell(ref, value, style=None):
+    if value is None or value == '':
+        return ''
+    if isinstance(value, bool):
+        return f'<c r="{ref}" t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float, Decimal)):
+        return f'<c r="{ref}"><v>{value}</v></c>'
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = timezone.make_naive(value)
+        serial = (value - EXCEL_EPOCH).total_seconds() / 86400
+        return f'<c r="{ref}" s="{STYLE_DATETIME}"><v>{serial}</v></c>'
+    if isinstance(value, date):
+        serial = (value - EXCEL_EPOCH.date()).days
+        return f'<c r="{ref}" s="{STYLE_DATE}"><v>{serial}</v></c>'
+
+    text = escape(ILLEGAL_XML_CHARS.sub('', str(value)))
+    style_attr = f' s="{style}"' if style else ''
+    return f'<c r="{ref}" t="inlineStr"{style_attr}><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+class _Sink:
+    """Write-only, non-seekable buffer drained by the response generator"""
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_xlsx(sheets):
+    """
+    Yield the bytes of an XLSX workbook.
+
+    sheets is a sequence of (name, header, rows) tuples; each rows iterable
+    is only consumed when its sheet is written.
+    """
+    sheets = list(sheets)
+    sink = _Sink()
+
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', CONTENT_TYPES.format(sheets=''.join(
+            SHEET_CONTENT_TYPE.format(index=index) for index in range(1, len(sheets) + 1)
+        )))
+        archive.writestr('_rels/.rels', ROOT_RELS)
+        archive.writestr('xl/workbook.xml', WORKBOOK.format(sheets=''.join(
+            WORKBOOK_SHEET.format(name=escape(name[:31], {'"': '&quot;'}), index=index)
+            for index, (name, _, _) in enumerate(sheets, start=1)
+        )))
+        archive.writestr('xl/_rels/workbook.xml.rels', WORKBOOK_RELS.format(
+            sheets=''.join(WORKBOOK_SHEET_REL.format(index=index) for index in range(1, len(sheets) + 1)),
+            styles=len(sheets) + 1,
+        ))
+        archive.writestr('xl/styles.xml', STYLES)
+        yield sink.drain()
+
+        for index, (name, header, rows) in enumerate(sheets, start=1):
+            columns = [column_letter(column) for column in range(len(header))]
+            with archive.open(f'xl/worksheets/sheet{index}.xml', 'w', force_zip64=True) as sheet:
+                sheet.write(SHEET_START.encode())
+                sheet.write((
+                    '<row r="1">'
+                    + ''.join(_cell(f'{letter}1', value, STYLE_HEADER) for letter, value in zip(columns, header))
+                    + '</row>'
+                ).encode())
+
+                buffered = []
+                for row_number, row in enumerate(rows, start=2):
+                    buffered.append(
+                        f'<row r="{row_number}">'
+                        + ''.join(
+                            _cell(f'{letter}{row_number}', value) for letter, value in zip(columns, row)
+                        )
+                        + '</row>'
+                    )
+                    if len(buffered) >= ROWS_PER_FLUSH:
+                        sheet.write(''.join(buffered).encode())
+                        buffered = []
+                        yield sink.drain()
+
+                sheet.write((''.join(buffered) + SHEET_END).encode())
+            yield sink.drain()
+
+    yield sink.drain()
+
+
+def xlsx_response(filename, sheets):
+    """Return a StreamingHttpResponse with an XLSX workbook"""
+    response = StreamingHttpResponse(
+        (chunk for chunk in stream_xlsx(sheets) if chunk), content_type=XLSX_CONTENT_TYPE
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
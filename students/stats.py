@@ -0,0 +1,112 @@
+# students/stats.py
+"""
+Per-class enrollment statistics.
+
+Attendance counts for every enrollment of a class are computed by the
+database in one annotated query instead of several queries per student;
+rates are derived from those counts for the rows actually displayed. When
+settings.ATTENDANCE_STATUS_ARRAYS is enabled the counts are read from the
+packed status arrays instead.
+"""
+from django.db.models import Count, Max, Q
+
+from attendance.status_arrays import period_status_counts, programme_trend
+
+ATTENDED_STATUSES = ('present', 'late', 'half_day')
+
+COUNT_FIELDS = ('present_count', 'late_count', 'absent_count', 'excused_count', 'half_day_count')
+
+
+def annotate_enrollment_stats(enrollments, class_obj, start_date, end_date):
+    """Annotate enrollments with per-status attendance counts and the last attendance date in a period"""
+    in_period = Q(
+        student__attendance_records__class_session=class_obj,
+        student__attendance_records__session_date__range=[start_date, end_date]
+    )
+
+    def status_count(status):
+        return Count(
+            'student__attendance_records',
+            filter=in_period & Q(student__attendance_records__status=status)
+        )
+
+    return enrollments.annotate(
+        present_count=status_count('present'),
+        late_count=status_count('late'),
+        absent_count=status_count('absent'),
+        excused_count=status_count('excused'),
+        half_day_count=status_count('half_day'),
+        last_attendance_date=Max(
+            'student__attendance_records__session_date',
+            filter=in_period & Q(student__attendance_records__status__in=ATTENDED_STATUSES)
+        ),
+    )
+
+
+def attendance_rates(total_sessions, present, late, half_day):
+    """Return the (attendance percentage, punctuality rate) for a set of counts"""
+    if total_sessions <= 0:
+        return 0, 0
+
+    # Half day counts as 0.5
+    attendance_percentage = round((present + half_day * 0.5) / total_sessions * 100, 1)
+
+    # Share of arrivals that were on time; late records are counted apart from present ones
+    on_time = present + half_day
+    punctuality_rate = round(on_time / (on_time + late) * 100, 1) if on_time + late > 0 else 0
+    return attendance_percentage, punctuality_rate
+
+
+def apply_attendance_rates(enrollments, total_sessions):
+    """Set attendance_percentage and punctuality_rate on annotated enrollments"""
+    for enrollment in enrollments:
+        enrollment.attendance_percentage, enrollment.punctuality_rate = attendance_rates(
+            total_sessions,
+            enrollment.present_count,
+            enrollment.late_count,
+            enrollment.half_day_count,
+        )
+
+
+def class_attendance_averages(counts, total_sessions):
+    """
+    Average attendance and punctuality over the students who attended at least once.
+
+    counts are (present, late, half_day) tuples, one per student.
+    """
+    rates = [
+        attendance_rates(total_sessions, present, late, half_day)
+        for present, late, half_day in counts
+    ]
+    rates = [rate for rate in rates if rate[0] > 0]
+    if not rates:
+        return 0, 0
+    return (
+        round(sum(rate[0] for rate in rates) / len(rates), 1),
+        round(sum(rate[1] for rate in rates) / len(rates), 1),
+    )
+
+
+def status_array_enrollment_stats(enrollments, class_obj, start_date, end_date):
+    """
+    annotate_enrollment_stats counterpart reading the packed status arrays.
+
+    Returns {student_id: counts} for every enrollment, with the COUNT_FIELDS,
+    last_attendance_date and the programme_trend figures; students without an
+    array get zero counts.
+    """
+    student_ids = list(enrollments.values_list('student_id', flat=True))
+    stats = period_status_counts(class_obj.id, start_date, end_date, student_ids)
+    empty = {
+        **{field: 0 for field in COUNT_FIELDS}, **programme_trend(b''), 'last_attendance_date': None,
+    }
+    return {student_id: stats.get(student_id, empty) for student_id in student_ids}
+
+
+def gender_counts(enrollments):
+    """Count enrollments per student gender in one aggregate"""
+    return enrollments.aggregate(
+        male_count=Count('id', filter=Q(student__gender='M')),
+        female_count=Count('id', filter=Q(student__gender='F')),
+        other_count=Count('id', filter=Q(student__gender='O')),
+    )
@@ -1,3 +1,137 @@
-from django.test import TestCase
+from datetime import date, time, timedelta
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from attendance.models import AttendanceRecord
+from tvet_attendance.testing import QueryBudgetTestMixin, create_class, create_course, create_session, create_student, create_user
+from .models import Enrollment
+from .stats import annotate_enrollment_stats, attendance_rates
+
+
+class EnrollmentStatsTests(TestCase):
+    """students_by_class computes every enrollment's counts in one query"""
+
+    def setUp(self):
+        self.today = date.today()
+        self.month_start = self.today.replace(day=1)
+        self.instructor = create_user('instructor', 'instructor')
+        self.course = create_course()
+        self.class_obj = create_class(self.course, self.instructor)
+        self.other_class = create_class(self.course, self.instructor)
+        self.students = [create_student(self.course, f'ADM{index:03}', self.class_obj) for index in range(3)]
+        self.sessions = [
+            create_session(self.class_obj, self.today, time(8), status='completed'),
+            create_session(self.class_obj, self.today, time(11), status='completed'),
+        ]
+
+    def mark(self, student, session, status):
+        AttendanceRecord.objects.create(session=session, student=student, status=status)
+
+    def test_counts_are_limited_to_the_class_and_period(self):
+        student = self.students[0]
+        self.mark(student, self.sessions[0], 'present')
+        self.mark(student, self.sessions[1], 'late')
+        self.mark(student, create_session(self.class_obj, self.month_start - timedelta(days=1)), 'present')
+        self.mark(student, create_session(self.other_class, self.today), 'present')
+
+        enrollment = annotate_enrollment_stats(
+            Enrollment.objects.filter(student=student, class_enrolled=self.class_obj),
+            self.class_obj, self.month_start, self.today
+        ).get()
+
+        self.assertEqual((enrollment.present_count, enrollment.late_count, enrollment.absent_count), (1, 1, 0))
+        self.assertEqual(enrollment.last_attendance_date, self.today)
+
+    def test_attendance_rates(self):
+        self.assertEqual(attendance_rates(4, 2, 1, 1), (62.5, 75.0))
+        self.assertEqual(attendance_rates(2, 0, 2, 0), (0.0, 0.0))
+        self.assertEqual(attendance_rates(0, 0, 0, 0), (0, 0))
+
+    def test_view_query_count_does_not_grow_with_the_class(self):
+        self.client.force_login(self.instructor)
+        url = reverse('students:students_by_class', args=[self.class_obj.id])
+
+        def render():
+            for student in self.students:
+                for session in self.sessions:
+                    AttendanceRecord.objects.update_or_create(
+                        session=session, student=student, defaults={'status': 'present'}
+                    )
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            return response, len(queries)
+
+        _, few = render()
+        for index in range(3, 10):
+            self.students.append(create_student(self.course, f'ADM{index:03}', self.class_obj))
+        response, many = render()
+
+        self.assertEqual(many, few)
+        self.assertEqual(response.context['avg_attendance'], 100.0)
+        self.assertEqual(
+            {enrollment.present_count for enrollment in response.context['enrollments']}, {2}
+        )
+
+
+# Budgeted views that fail before their query count means anything
+BROKEN_VIEWS = {
+    'students:bulk_import': 'students/bulk_import.html does not exist',
+    'students:update': 'students/student_update.html does not exist',
+    'students:enroll': 'enroll_student() does not accept the pk URL argument',
+    'students:add_student_to_class': 'student_register() does not accept the class_id URL argument',
+}
+
+
+class QueryBudgetTests(QueryBudgetTestMixin, TransactionTestCase):
+    """Budgeted student views run a fixed number of queries however many students there are"""
+
+    def setUp(self):
+        self.today = date.today()
+        self.admin = create_user('admin', 'admin', is_staff=True, is_superuser=True)
+        self.instructor = create_user('instructor', 'instructor')
+        self.course = create_course()
+        self.class_obj = create_class(self.course, self.instructor)
+        self.students = []
+        self.grow(3)
+
+    def grow(self, count):
+        """Enrol count more students and the first student in another class, then mark them all"""
+        start = len(self.students)
+        self.students += [
+            create_student(self.course, f'ADM{index:03}', self.class_obj) for index in range(start, start + count)
+        ]
+        other_class = create_class(self.course, self.instructor)
+        Enrollment.objects.create(student=self.students[0], course=self.course, class_enrolled=other_class)
+        session = create_session(self.class_obj, self.today, time(8 + start))
+        for student in self.students[start:]:
+            AttendanceRecord.objects.create(session=session, student=student, status='present')
+
+    def requests(self):
+        student = self.students[0]
+        return [
+            (self.admin, 'get', 'students:list', [], {}),
+            (self.admin, 'get', 'students:register', [], {}),
+            (self.admin, 'get', 'students:detail', [student.id], {}),
+            (self.instructor, 'post', 'students:toggle_status', [student.id], {}),
+            (student.user, 'get', 'students:student_dashboard', [], {}),
+            (self.instructor, 'get', 'students:students_by_class', [self.class_obj.id], {}),
+            (self.admin, 'get', 'students:add_existing_to_class', [self.class_obj.id], {}),
+        ]
+
+    def test_query_counts_do_not_grow_with_the_students(self):
+        few = self.budgeted_query_counts(self.requests())
+        self.grow(7)
+
+        self.assertEqual(self.budgeted_query_counts(self.requests()), few)
+
+    def test_every_budgeted_view_is_requested(self):
+        self.assertBudgetsCovered('students', self.requests(), BROKEN_VIEWS)
+
+    def test_broken_views(self):
+        for name, reason in BROKEN_VIEWS.items():
+            with self.subTest(view=name):
+                self.skipTest(reason)
@@ -1,9 +1,10 @@
 # students/views.py
 from django.shortcuts import render, redirect, get_object_or_404
+from django.conf import settings
 from django.contrib.auth.decorators import login_required, permission_required
 from django.contrib import messages
 from django.core.paginator import Paginator
-from django.db.models import Q
+from django.db.models import Q, Sum
 from django.http import JsonResponse, HttpResponse
 from django.utils import timezone
 from django.views.decorators.http import require_POST
@@ -12,10 +13,15 @@ import csv
 from io import TextIOWrapper
 
 from .models import Student, Enrollment, AcademicRecord
+from .stats import (
+    annotate_enrollment_stats, apply_attendance_rates, class_attendance_averages, gender_counts,
+    status_array_enrollment_stats
+)
 from .forms import StudentRegistrationForm, StudentUpdateForm, EnrollmentForm, BulkStudentImportForm
 from accounts.models import User
 from courses.models import Class 
 from attendance.models import AttendanceSession, AttendanceRecord, AttendanceSummary
+from attendance.status_arrays import TREND_WINDOW
 from datetime import timedelta
 
 # Custom decorator for instructor access
@@ -257,7 +263,7 @@ def student_dashboard(request):
         student = None
     
     # Get enrollments for the student
-    enrollments = Enrollment.objects.filter(student=student) if student else []
+    enrollments = Enrollment.objects.filter(student=student).select_related('course', 'class_enrolled') if student else []
     
     # Get academic records
     academic_records = AcademicRecord.objects.filter(student=student) if student else []
@@ -327,13 +333,6 @@ def students_by_class(request, class_id):
     enrollments = Enrollment.objects.filter(
         class_enrolled=class_obj,
         is_active=True
-    ).select_related(
-        'student', 
-        'student__user', 
-        'course'
-    ).prefetch_related(
-        'student__attendance_records',
-        'student__attendance_summaries'
     )
     
     # Apply filters
@@ -354,96 +353,63 @@ def students_by_class(request, class_id):
     
     # Get today's date
     today = timezone.now().date()
-    current_month = today.month
-    current_year = today.year
+    month_start = today.replace(day=1)
+    month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
     
-    # Calculate attendance statistics for each enrollment
-    for enrollment in enrollments:
-        student = enrollment.student
-        
-        # Get total sessions for this course in current month
-        total_sessions = AttendanceSession.objects.filter(
+    # Completed sessions for this class in the current month
+    total_sessions = AttendanceSession.objects.filter(
+        class_session=class_obj,
+        session_date__range=[month_start, month_end],
+        status='completed'
+    ).count()
+    
+    if settings.ATTENDANCE_STATUS_ARRAYS:
+        # Per-status counts and last attendance read from the packed status arrays
+        array_stats = status_array_enrollment_stats(enrollments, class_obj, month_start, month_end)
+        enrollment_stats = enrollments
+    else:
+        # Per-status counts and last attendance for every enrollment in one query
+        array_stats = None
+        enrollment_stats = annotate_enrollment_stats(enrollments, class_obj, month_start, month_end)
+    
+    # Pagination before any per-row work
+    paginator = Paginator(
+        enrollment_stats.select_related('student', 'student__user', 'course').order_by('-enrollment_date', 'pk'),
+        20
+    )
+    page_number = request.GET.get('page')
+    page_obj = paginator.get_page(page_number)
+    
+    # This month's summaries for the displayed students in one query
+    summaries = {
+        summary.student_id: summary
+        for summary in AttendanceSummary.objects.filter(
             class_session=class_obj,
-            session_date__month=current_month,
-            session_date__year=current_year,
-            status='completed'
-        ).count()
-        
-        # Get attendance records for this student in current month
-        attendance_records = AttendanceRecord.objects.filter(
-            student=student,
-            session__class_session=class_obj,
-            session__session_date__month=current_month,
-            session__session_date__year=current_year
+            period_type='monthly',
+            period_start=month_start,
+            student_id__in=[enrollment.student_id for enrollment in page_obj]
         )
-        
-        # Calculate statistics
-        if total_sessions > 0:
-            attended = attendance_records.filter(status='present').count()
-            late = attendance_records.filter(status='late').count()
-            absent = attendance_records.filter(status='absent').count()
-            excused = attendance_records.filter(status='excused').count()
-            half_day = attendance_records.filter(status='half_day').count()
-            
-            # Calculate attendance percentage
-            total_present_weighted = attended + (half_day * 0.5)  # Half day counts as 0.5
-            enrollment.attendance_percentage = round((total_present_weighted / total_sessions) * 100, 1)
-            
-            # Calculate punctuality rate (percentage of times student was on time when present)
-            total_present_actual = attended + half_day
-            if total_present_actual > 0:
-                enrollment.punctuality_rate = round(((total_present_actual - late) / total_present_actual) * 100, 1)
-            else:
-                enrollment.punctuality_rate = 0
-                
-            # Store other stats
-            enrollment.late_count = late
-            enrollment.absent_count = absent
-            enrollment.excused_count = excused
-            enrollment.half_day_count = half_day
-        else:
-            enrollment.attendance_percentage = 0
-            enrollment.punctuality_rate = 0
-            enrollment.late_count = 0
-            enrollment.absent_count = 0
-            enrollment.excused_count = 0
-            enrollment.half_day_count = 0
-        
-        # Get last attendance date
-        last_attendance = attendance_records.filter(
-            status__in=['present', 'late', 'half_day']
-        ).order_by('-session__session_date').first()
-        
-        if last_attendance:
-            enrollment.last_attendance_date = last_attendance.session.session_date
-        else:
-            enrollment.last_attendance_date = None
-        
-        # Get attendance summary if exists
-        try:
-            summary = AttendanceSummary.objects.get(
-                student=student,
-                class_session=class_obj,
-                period_type='monthly',
-                period_start__month=current_month,
-                period_start__year=current_year
-            )
-            enrollment.summary = summary
-        except AttendanceSummary.DoesNotExist:
-            enrollment.summary = None
+    }
+    
+    if array_stats is not None:
+        for enrollment in page_obj:
+            for name, value in array_stats[enrollment.student_id].items():
+                setattr(enrollment, name, value)
+    apply_attendance_rates(page_obj, total_sessions)
+    for enrollment in page_obj:
+        enrollment.summary = summaries.get(enrollment.student_id)
     
     # Statistics for the class
-    total_students = enrollments.count()
+    total_students = paginator.count
     
     # Today's attendance
-    today_sessions = AttendanceSession.objects.filter(
+    today_session = AttendanceSession.objects.filter(
         class_session=class_obj,
         session_date=today,
         status='completed'
-    )
+    ).first()
     
-    if today_sessions.exists():
-        today_session = today_sessions.first()
+    if today_session:
         present_today = today_session.total_present
         late_today = today_session.total_late
         absent_today = today_session.total_absent
@@ -453,23 +419,14 @@ def students_by_class(request, class_id):
         absent_today = 0
     
     # Gender counts
-    male_count = enrollments.filter(student__gender='male').count()
-    female_count = enrollments.filter(student__gender='female').count()
-    other_count = enrollments.filter(student__gender='other').count()
+    genders = gender_counts(enrollments)
     
     # Calculate average attendance for the class
-    total_attendance_percentage = 0
-    total_punctuality = 0
-    students_with_attendance = 0
-    
-    for enrollment in enrollments:
-        if enrollment.attendance_percentage > 0:
-            total_attendance_percentage += enrollment.attendance_percentage
-            total_punctuality += enrollment.punctuality_rate
-            students_with_attendance += 1
-    
-    avg_attendance = round(total_attendance_percentage / students_with_attendance, 1) if students_with_attendance > 0 else 0
-    avg_punctuality = round(total_punctuality / students_with_attendance, 1) if students_with_attendance > 0 else 0
+    if array_stats is not None:
+        counts = [(stats['present_count'], stats['late_count'], stats['half_day_count']) for stats in array_stats.values()]
+    else:
+        counts = enrollment_stats.values_list('present_count', 'late_count', 'half_day_count')
+    avg_attendance, avg_punctuality = class_attendance_averages(counts, total_sessions)
     
     # Get recent attendance sessions for this class
     recent_sessions = AttendanceSession.objects.filter(
@@ -478,19 +435,19 @@ def students_by_class(request, class_id):
     ).order_by('-session_date', '-start_time')[:5]
     
     # Get attendance trends (last 5 days)
+    present_by_date = dict(AttendanceSession.objects.filter(
+        class_session=class_obj,
+        session_date__range=[today - timedelta(days=4), today],
+        status='completed'
+    ).order_by().values('session_date').annotate(
+        present=Sum('total_present')
+    ).values_list('session_date', 'present'))
+    
     trend_data = []
     for i in range(5):
         date = today - timedelta(days=i)
-        sessions_on_date = AttendanceSession.objects.filter(
-            class_session=class_obj,
-            session_date=date,
-            status='completed'
-        )
-        
-        if sessions_on_date.exists():
-            total_present = sum(session.total_present for session in sessions_on_date)
-            total_students_on_date = total_students
-            attendance_rate = round((total_present / total_students_on_date) * 100, 1) if total_students_on_date > 0 else 0
+        if date in present_by_date:
+            attendance_rate = round((present_by_date[date] / total_students) * 100, 1) if total_students > 0 else 0
         else:
             attendance_rate = None
             
@@ -499,11 +456,6 @@ def students_by_class(request, class_id):
             'rate': attendance_rate
         })
     
-    # Pagination
-    paginator = Paginator(enrollments, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    
     context = {
         'class_obj': class_obj,
         'enrollments': page_obj,
@@ -511,9 +463,9 @@ def students_by_class(request, class_id):
         'present_today': present_today,
         'late_today': late_today,
         'absent_today': absent_today,
-        'male_count': male_count,
-        'female_count': female_count,
-        'other_count': other_count,
+        'male_count': genders['male_count'],
+        'female_count': genders['female_count'],
+        'other_count': genders['other_count'],
         'avg_attendance': avg_attendance,
         'avg_punctuality': avg_punctuality,
         'recent_sessions': recent_sessions,
@@ -524,6 +476,8 @@ def students_by_class(request, class_id):
         'is_paginated': paginator.num_pages > 1,
         'page_obj': page_obj,
         'today': today,
+        'status_arrays': array_stats is not None,
+        'trend_window': TREND_WINDOW,
     }
     
     return render(request, 'students/students_by_class.html', context)
@@ -571,7 +525,7 @@ def add_existing_students_to_class(request, class_id):
         is_active=True
     ).values_list('student_id', flat=True)
     
-    available_students = Student.objects.select_related('user').exclude(
+    available_students = Student.objects.select_related('user', 'course').exclude(
         id__in=enrolled_student_ids
     ).filter(status='active')
     
@@ -0,0 +1,115 @@
+# tvet_attendance/middleware.py
+import json
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+from functools import lru_cache, partial
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('tvet_attendance.queries')
+
+
+@lru_cache(maxsize=None)
+def load_query_budgets(path):
+    """Load a {url_name: max_queries} budget file"""
+    with open(path) as budget_file:
+        return json.load(budget_file)
+
+
+def query_budget(view_name):
+    """Return the declared query budget for a namespaced URL name, if any"""
+    if not view_name:
+        return None
+    return load_query_budgets(settings.QUERY_BUDGETS_FILE).get(view_name)
+
+
+class QueryStats:
+    """SQL query count and total database time for one request"""
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+@contextmanager
+def count_queries(stats):
+    """Route the queries of every database connection through stats"""
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(stats))
+        yield stats
+
+
+def _count_streaming(content, stats):
+    """Iterate a streaming body, counting the queries each chunk runs"""
+    iterator = iter(content)
+    while True:
+        with count_queries(stats):
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                return
+        yield chunk
+
+
+class QueryCountMiddleware:
+    """
+    Record the number of SQL queries and the database time of each request,
+    expose them in a Server-Timing header and log requests that exceed the
+    query budget declared for their URL.
+
+    Streaming responses (CSV/XLSX exports) run most of their queries while
+    the body is iterated, so they are counted until the response is closed;
+    their Server-Timing header only covers the queries run before streaming.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'QUERY_COUNT_ENABLED', False):
+            return self.get_response(request)
+
+        stats = QueryStats()
+        with count_queries(stats):
+            response = self.get_response(request)
+
+        view_name = request.resolver_match.view_name if request.resolver_match else None
+        budget = query_budget(view_name)
+
+        response['Server-Timing'] = (
+            f'db;desc="{stats.count} queries";dur={stats.duration * 1000:.2f}'
+        )
+        response.query_count = stats.count
+        response.query_budget = budget
+
+        if response.streaming:
+            response.streaming_content = _count_streaming(response.streaming_content, stats)
+            response._resource_closers.append(
+                partial(self.record, request, response, stats, view_name, budget)
+            )
+        else:
+            self.record(request, response, stats, view_name, budget)
+        return response
+
+    def record(self, request, response, stats, view_name, budget):
+        """Store the final query count on the response and log it"""
+        response.query_count = stats.count
+        if budget is not None and stats.count > budget:
+            logger.warning(
+                '%s %s (%s) ran %d queries, over its budget of %d',
+                request.method, request.path, view_name, stats.count, budget
+            )
+        else:
+            logger.debug(
+                '%s %s (%s) ran %d queries in %.2fms',
+                request.method, request.path, view_name, stats.count, stats.duration * 1000
+            )
@@ -3,6 +3,7 @@ Django settings for tvet_attendance project.
 """
 
 import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -39,6 +40,7 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
+    'tvet_attendance.middleware.QueryCountMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -46,6 +48,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'attendance.middleware.SessionStatsMiddleware',
 ]
 
 ROOT_URLCONF = 'tvet_attendance.urls'
@@ -111,6 +114,38 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Caches. LocMemCache is per process; use a shared backend (Redis, Memcached)
+# when running several application processes so invalidation reaches all of them.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tvet-default',
+    },
+    # Report results; least recently used entries are evicted beyond MAX_ENTRIES
+    'reports': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tvet-reports',
+        'TIMEOUT': 6 * 60 * 60,
+        'OPTIONS': {'MAX_ENTRIES': 200},
+    },
+    # Per (date, class) version stamps of the report cache. Report results are
+    # only cached when this is a shared backend; the file cache is shared by
+    # every process on this host. Across several hosts use e.g.
+    # {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://127.0.0.1:6379/1'}
+    'report_versions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(tempfile.gettempdir(), 'tvet-report-versions'),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+
+# Report exports are queued and generated by `manage.py run_report_workers`
+REPORT_EXPORTS_IN_BACKGROUND = True
+
+# Keep packed per-(student, class) status arrays for attendance analytics;
+# fill them with `manage.py rebuild_status_arrays` after enabling
+ATTENDANCE_STATUS_ARRAYS = False
+
 # Crispy Forms
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 CRISPY_TEMPLATE_PACK = "bootstrap5"
@@ -126,4 +161,9 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Login/Logout URLs
 
 # Email settings (for password reset - configure with your email provider)
-EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
\ No newline at end of file
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+
+# Query budgets: per-request SQL query counts and DB time are reported in a
+# Server-Timing header and checked against the per-URL budget file
+QUERY_COUNT_ENABLED = DEBUG
+QUERY_BUDGETS_FILE = os.path.join(BASE_DIR, 'tvet_attendance', 'query_budgets.json')
@@ -0,0 +1,136 @@
+# tvet_attendance/testing.py
+from datetime import date, time, timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from .middleware import load_query_budgets
+
+
+class QueryBudgetClient(Client):
+    """
+    Test client that fails when a response runs more queries than its URL's
+    budget. Streaming bodies are read (and the response closed) first so the
+    queries they run are counted too.
+    """
+    def request(self, **request):
+        response = super().request(**request)
+        if response.streaming:
+            content = b''.join(response.streaming_content)
+            response.streaming_content = [content]
+        budget = getattr(response, 'query_budget', None)
+        if budget is not None and response.query_count > budget:
+            raise AssertionError(
+                f'{request.get("REQUEST_METHOD", "GET")} {request.get("PATH_INFO")} ran '
+                f'{response.query_count} queries, over its budget of {budget}'
+            )
+        return response
+
+
+class QueryBudgetTestMixin:
+    """
+    Record query counts for every request made with self.client and fail the
+    test when a view exceeds the budget declared in QUERY_BUDGETS_FILE
+    """
+    client_class = QueryBudgetClient
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.enterClassContext(override_settings(QUERY_COUNT_ENABLED=True))
+
+    def budgeted_query_counts(self, requests):
+        """
+        Make each (user, method, url_name, args, data) request against cold
+        caches and return {(username, method, url_name): query count}
+        """
+        counts = {}
+        for user, method, name, args, data in requests:
+            key = (user.username, method, name)
+            with self.subTest(request=key):
+                for alias in caches:
+                    caches[alias].clear()
+                self.client.force_login(user)
+                response = getattr(self.client, method)(reverse(name, args=args), data)
+                self.assertLess(response.status_code, 400)
+                counts[key] = response.query_count
+        return counts
+
+    def assertBudgetsCovered(self, namespace, requests, broken=()):
+        """Every budgeted URL of namespace is requested or listed as broken"""
+        budgets = load_query_budgets(settings.QUERY_BUDGETS_FILE)
+        self.assertEqual(
+            {name for _, _, name, _, _ in requests} | set(broken),
+            {name for name in budgets if name.startswith(f'{namespace}:')}
+        )
+
+
+def create_user(username, user_type='student', **extra):
+    from accounts.models import User
+
+    return User.objects.create_user(
+        username=username, password='pass', user_type=user_type, account_status='approved', **extra
+    )
+
+
+def create_course(code='ICT101', **extra):
+    from courses.models import Course
+
+    return Course.objects.create(code=code, name=f'{code} Course', department='ICT', **extra)
+
+
+def create_class(course, instructor, code=None, **extra):
+    from courses.models import Class
+
+    today = date.today()
+    code = code or f'{course.code}-{Class.objects.count() + 1}'
+    fields = {
+        'name': f'{code} Class',
+        'academic_year': str(today.year),
+        'start_date': today - timedelta(days=60),
+        'end_date': today + timedelta(days=60),
+        'meeting_days': 'Monday',
+        'meeting_time': '8:00 AM - 10:00 AM',
+        'venue': 'Lab',
+        **extra,
+    }
+    return Class.objects.create(course=course, class_code=code, instructor=instructor, **fields)
+
+
+def create_student(course, admission_number, class_obj=None, gender='F'):
+    """A student, enrolled in class_obj when given"""
+    from students.models import Enrollment, Student
+
+    student = Student.objects.create(
+        user=create_user(admission_number.lower()),
+        admission_number=admission_number,
+        date_of_birth=date(2000, 1, 1),
+        gender=gender,
+        address='Kitui',
+        sub_county='Kitui Central',
+        emergency_contact_name='Parent',
+        emergency_contact_phone='0700000000',
+        emergency_contact_relationship='Parent',
+        year_of_admission=date.today().year,
+        course=course,
+    )
+    if class_obj is not None:
+        Enrollment.objects.create(student=student, course=course, class_enrolled=class_obj)
+    return student
+
+
+def create_session(class_obj, session_date, start=time(8), **extra):
+    from attendance.models import AttendanceSession
+
+    return AttendanceSession.objects.create(
+        class_session=class_obj,
+        instructor_id=extra.pop('instructor_id', class_obj.instructor_id),
+        session_date=session_date,
+        start_time=start,
+        end_time=time(start.hour + 2),
+        topic_covered='Topic',
+        venue='Lab',
+        **extra
+    )